@@ -6,13 +6,37 @@ Autor: Pedro Henrique + Gemini
 """
 
 import time
-import msvcrt
 import os
+import sys
+import csv
 import json
+import atexit
+import logging
+import logging.handlers
+import argparse
 import threading
 import queue
-import tkinter as tk
+import subprocess
+import itertools
+import math
+import re
+import unicodedata
+import xml.etree.ElementTree as ET
+from collections import Counter, deque
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+try:
+    import tkinter as tk
+except ImportError:  # servidores Linux sem Tk: apenas o modo CLI/headless fica disponível
+    tk = None
+
+try:
+    import requests
+except ImportError:  # sem requests o motor HTTP fica indisponível: tudo roda pelo Selenium
+    requests = None
 
 # Importações do Selenium
 from selenium import webdriver
@@ -21,27 +45,30 @@ from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.common.exceptions import StaleElementReferenceException
+from selenium.common.exceptions import StaleElementReferenceException, TimeoutException
 
 # --- CONSTANTES ---
 ARQUIVO_CONFIG = "config.json"
 ARQUIVO_DADOS = "dados.json"
+CAMINHO_LISTA = "/ntiss/cadastros/funcionario/lista.jsf"   # tela de Consulta de Funcionários
 
 # --- VARIÁVEIS DE CONTROLE ---
 solicitar_finalizacao = False
 medicos_cadastrados_sessao = {}  # {secretaria: [medico1, medico2, ...]}
 
 # --- THREADING / UI ---
-log_queue        = queue.Queue()
 _menu_escolha    = None
+_retomar_escolha = False    # retomar a última execução do modo escolhido (journal)
 _menu_event      = threading.Event()
 _pause_event     = threading.Event()
 _pause_event.set()          # inicia no estado "rodando"
 _dialog_result   = None
 _dialog_event    = threading.Event()
-_skip_event      = threading.Event()  # sinaliza "pular para o próximo" durante pausa
+_skip_geracao    = 0        # incrementado a cada "Próximo usuário" (cada worker consome uma vez)
+_skip_lock       = threading.Lock()
+_ctx_worker      = threading.local()  # contexto por thread: nome do worker, último skip consumido
 ui               = None     # instancia da FloatingUI (set no __main__)
+_saida_log       = sys.stdout  # no modo CLI vai para stderr (stdout fica com o resumo JSON)
 
 # --- CONFIGURAÇÃO ---
 def carregar_json(caminho):
@@ -50,16 +77,78 @@ def carregar_json(caminho):
         with open(caminho, "r", encoding="utf-8") as f: return json.load(f)
     except: return None
 
-CONF = carregar_json(ARQUIVO_CONFIG)
-if not CONF:
-    raise RuntimeError("Arquivo config.json não encontrado ou inválido. Configure antes de rodar.")
+def aplicar_configuracao(conf):
+    """Define as constantes globais a partir do dicionário de configuração."""
+    global CONF, URL_SISTEMA, TIMEOUT_AGUARDE, USUARIO_LOGIN, SENHA_LOGIN, NUM_WORKERS, WORKERS_HEADLESS, SEM_CSS
+    global PASTA_ESTADO, ARQUIVO_JOURNAL, ARQUIVO_CACHE_VINCULOS, CACHE_TTL_HORAS, CACHE_VERIFICAR_A_CADA
+    global FILTRO_LOGINS_MODO, ARQUIVO_TRACE, ARQUIVO_PLANO, PASTA_RESULTADOS, RELATORIOS_ATIVOS, RASTREAMENTO_ATIVO, SESSAO_MAX_FALHAS, SESSAO_MAX_RECUPERACOES
+    global MOTOR, WORKERS_HTTP, CHROMEDRIVER, ARQUIVO_CHROMEDRIVER, PERFIL_CHROME, REUSAR_SESSAO, PESQUISA_EM_LOTE, ARQUIVO_NAVEGACAO, LOTE_MEDICOS, SIMILARIDADE_NOMES, ACEITAR_NOMES_APROXIMADOS, LOG_NIVEL, LOG_BUFFER_PAINEL, LOG_ARQUIVO_MB, LOG_ARQUIVO_COPIAS, ARQUIVO_LOG
+    global ARQUIVO_LOCALIZADORES, TIMEOUT_FATOR, TIMEOUT_MINIMO, DISJUNTOR_LENTAS, DISJUNTOR_LENTO_S, DISJUNTOR_BACKOFF_S, DISJUNTOR_BACKOFF_MAX_S
+    CONF = conf
+    URL_SISTEMA = CONF.get("url_sistema")
+    TIMEOUT_AGUARDE = CONF.get("timeout_aguarde", 40)   # teto; cada etapa aprende o próprio timeout
+    TIMEOUT_FATOR = CONF.get("timeout_fator", 3.0)      # orçamento = p99 da etapa × fator
+    TIMEOUT_MINIMO = CONF.get("timeout_minimo", 5.0)
+    DISJUNTOR_LENTAS = CONF.get("disjuntor_lentas", 5)            # respostas lentas seguidas que abrem o disjuntor
+    DISJUNTOR_LENTO_S = CONF.get("disjuntor_lento_s", 10.0)       # espera a partir da qual a resposta é "lenta"
+    DISJUNTOR_BACKOFF_S = CONF.get("disjuntor_backoff_s", 15.0)   # 1ª pausa; dobra a cada reabertura
+    DISJUNTOR_BACKOFF_MAX_S = CONF.get("disjuntor_backoff_max_s", 300.0)
+    USUARIO_LOGIN = CONF.get("usuario", "")
+    SENHA_LOGIN = CONF.get("senha", "")
+    NUM_WORKERS = max(1, int(CONF.get("workers", 1) or 1))
+    WORKERS_HEADLESS = CONF.get("workers_headless", True)
+    MOTOR = CONF.get("motor", "selenium")   # "http": postbacks JSF direto, sem navegador (Selenium como fallback)
+    # sessões HTTP paralelas do motor http (todas logadas na mesma conta); None = mesmo número de `workers`
+    WORKERS_HTTP = max(1, int(CONF["workers_http"])) if CONF.get("workers_http") else None
+    SEM_CSS = CONF.get("sem_css", False)
+    CHROMEDRIVER = CONF.get("chromedriver")   # caminho fixo do chromedriver (pula o webdriver-manager)
+    PERFIL_CHROME = CONF.get("perfil_chrome")  # user-data-dir persistente (cache HTTP do PrimeFaces entre execuções)
+    REUSAR_SESSAO = CONF.get("reusar_sessao", True)   # cookies salvos: entra direto na lista, sem login
+    PASTA_ESTADO = CONF.get("pasta_estado", "estado_autotiss")
+    ARQUIVO_CHROMEDRIVER = os.path.join(PASTA_ESTADO, "chromedriver.json")
+    ARQUIVO_JOURNAL = os.path.join(PASTA_ESTADO, "journal.jsonl")
+    ARQUIVO_CACHE_VINCULOS = os.path.join(PASTA_ESTADO, "cache_vinculos.json")
+    ARQUIVO_LOCALIZADORES = os.path.join(PASTA_ESTADO, "localizadores.json")
+    ARQUIVO_NAVEGACAO = os.path.join(PASTA_ESTADO, "navegacao.json")
+    PESQUISA_EM_LOTE = CONF.get("pesquisa_em_lote", True)   # uma pesquisa pelo prefixo comum lista as secretarias da execução
+    CACHE_TTL_HORAS = CONF.get("cache_ttl_horas", 24)             # 0 desativa o cache
+    CACHE_VERIFICAR_A_CADA = CONF.get("cache_verificar_a_cada", 5)  # passadas do Vincular entre varreduras completas
+    # Como um login de logins_para_vincular casa com as opções do escolherLogins
+    # (mesmo filterMatchMode do PrimeFaces): "startsWith" (padrão) ou "contains"
+    FILTRO_LOGINS_MODO = CONF.get("filtro_logins_modo", "startsWith")
+    ARQUIVO_TRACE = os.path.join(PASTA_ESTADO, "trace.jsonl")
+    ARQUIVO_PLANO = os.path.join(PASTA_ESTADO, "plano.json")
+    PASTA_RESULTADOS = os.path.join(PASTA_ESTADO, "resultados")
+    RELATORIOS_ATIVOS = CONF.get("relatorios", True)   # CSV/JSON por execução em <pasta_estado>/resultados
+    RASTREAMENTO_ATIVO = CONF.get("rastreamento", True)   # spans por etapa (python -m autotiss relatorio)
+    SESSAO_MAX_FALHAS = CONF.get("sessao_max_falhas", 3)              # erros seguidos que disparam re-login
+    SESSAO_MAX_RECUPERACOES = CONF.get("sessao_max_recuperacoes", 3)  # por secretaria
+    LOTE_MEDICOS = max(1, int(CONF.get("lote_medicos", 1000) or 1000))   # nomes por lote ao ler CSV/JSONL
+    SIMILARIDADE_NOMES = CONF.get("similaridade_nomes", 0.85)   # nota mínima do casamento aproximado de nomes
+    # Casamentos "abreviado"/"aproximado" podem ser outra pessoa: por padrão vão para revisão
+    ACEITAR_NOMES_APROXIMADOS = CONF.get("aceitar_nomes_aproximados", False)
+    LOG_NIVEL = CONF.get("log_nivel", "DEBUG")        # DEBUG mostra tudo; INFO esconde "Pulando"/"Inativo"; WARNING só avisos/erros
+    LOG_BUFFER_PAINEL = max(100, int(CONF.get("log_buffer_painel", 2000) or 2000))   # linhas pendentes para o painel
+    LOG_ARQUIVO_MB = CONF.get("log_arquivo_mb", 5)    # tamanho de cada arquivo antes de rotacionar
+    LOG_ARQUIVO_COPIAS = CONF.get("log_arquivo_copias", 3)
+    ARQUIVO_LOG = os.path.join(PASTA_ESTADO, "autotiss.log") if CONF.get("log_arquivo", True) else None
 
-URL_SISTEMA = CONF.get("url_sistema")
-TIMEOUT_AGUARDE = CONF.get("timeout_aguarde", 40)
-USUARIO_LOGIN = CONF.get("usuario", "")
-SENHA_LOGIN = CONF.get("senha", "")
+# Sem config.json o módulo ainda pode ser importado (ex.: CLI com --config);
+# a validação acontece nos pontos de entrada.
+aplicar_configuracao(carregar_json(ARQUIVO_CONFIG) or {})
 
-# --- HELPERS ---
+# --- LOG ---
+# log() só classifica a mensagem (uma vez) e enfileira; console, arquivo rotativo e o
+# buffer do painel são alimentados por um QueueListener em thread própria. O painel lê
+# um ring buffer limitado e insere em lote a cada tick, então rajadas de milhares de
+# linhas não travam nem a UI nem o robô.
+
+NIVEIS_LOG = {"erro": logging.ERROR, "aviso": logging.WARNING, "ok": logging.INFO,
+              "sec": logging.INFO, "info": logging.INFO, "dim": logging.DEBUG}
+_logger = logging.getLogger("autotiss")
+_logger.propagate = False
+_buffer_painel = deque(maxlen=2000)   # (hora, mensagem, nível visual); redimensionado em configurar_log
+_ouvinte_log = None
 
 def _nivel_log(msg):
     """Detecta o nivel visual do log para colorir na UI."""
@@ -67,17 +156,92 @@ def _nivel_log(msg):
     if any(x in m for x in ("✅", "-> Sucesso", "+ Vinculado", "carregada", "Login enviado")): return "ok"
     if any(x in m for x in ("❌", "[ERRO CRÍTICO]", "[ERRO INTERNO]")): return "erro"
     if "🛑" in m: return "erro"
-    if any(x in m for x in ("[AVISO]", "[RETRY", "[JÁ CADASTRADO]", "não marcou")): return "aviso"
+    if any(x in m for x in ("[AVISO]", "[RETRY", "[JÁ CADASTRADO]", "[APROX]", "[REVISAR]", "não marcou")): return "aviso"
     if "[ERRO]" in m:       return "erro"
     if "=== SECRETARIA" in m: return "sec"
     if any(x in m for x in ("-> Inativo", "Pulando")): return "dim"
     return "info"
 
+class _HandlerConsole(logging.Handler):
+    """Escreve em _saida_log do momento (stdout, stderr no modo lote, devnull no benchmark)."""
+    def emit(self, record):
+        try: print(self.format(record), file=_saida_log)
+        except Exception: self.handleError(record)
+
+class _HandlerPainel(logging.Handler):
+    """Alimenta o ring buffer lido pelo FloatingUI._poll (as linhas mais antigas são descartadas)."""
+    def emit(self, record):
+        if ui:
+            _buffer_painel.append((datetime.fromtimestamp(record.created).strftime("%H:%M"),
+                                   record.getMessage(), getattr(record, "nivel_ui", "info")))
+
+class _HandlerArquivo(logging.handlers.RotatingFileHandler):
+    def _open(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.baseFilename)), exist_ok=True)
+        return super()._open()
+
+def configurar_log():
+    """(Re)monta o pipeline de log a partir da configuração atual."""
+    global _ouvinte_log, _buffer_painel
+    parar_log()
+    formato = logging.Formatter("[%(asctime)s] %(message)s", "%H:%M:%S")
+    destinos = [_HandlerConsole(), _HandlerPainel()]
+    if ARQUIVO_LOG:
+        destinos.append(_HandlerArquivo(ARQUIVO_LOG, maxBytes=int(LOG_ARQUIVO_MB * 1024 * 1024),
+                                        backupCount=LOG_ARQUIVO_COPIAS, encoding="utf-8", delay=True))
+        destinos[-1].setFormatter(logging.Formatter("%(asctime)s %(levelname)-7s %(message)s"))
+    destinos[0].setFormatter(formato)
+    if _buffer_painel.maxlen != LOG_BUFFER_PAINEL:
+        _buffer_painel = deque(_buffer_painel, maxlen=LOG_BUFFER_PAINEL)
+    fila = queue.SimpleQueue()
+    for h in _logger.handlers[:]:
+        _logger.removeHandler(h)
+    _logger.addHandler(logging.handlers.QueueHandler(fila))
+    nivel = logging.getLevelName(str(LOG_NIVEL).upper())
+    _logger.setLevel(nivel if isinstance(nivel, int) else logging.DEBUG)
+    _ouvinte_log = logging.handlers.QueueListener(fila, *destinos, respect_handler_level=False)
+    _ouvinte_log.start()
+
+def parar_log():
+    """Esvazia a fila do listener (console/arquivo) e fecha o arquivo."""
+    global _ouvinte_log
+    if _ouvinte_log:
+        _ouvinte_log.stop()
+        for h in _ouvinte_log.handlers:
+            h.close()
+        _ouvinte_log = None
+
+atexit.register(parar_log)
+
 def log(mensagem):
-    hora = datetime.now().strftime("%H:%M:%S")
-    print(f"[{hora}] {mensagem}")
-    if ui:
-        log_queue.put((mensagem, _nivel_log(mensagem)))
+    nivel = _nivel_log(mensagem)
+    nivel_num = NIVEIS_LOG[nivel]
+    if not _logger.isEnabledFor(nivel_num):
+        return
+    worker = getattr(_ctx_worker, "nome", None)
+    if worker:
+        corpo = mensagem.lstrip("\n")
+        mensagem = mensagem[:len(mensagem) - len(corpo)] + f"[{worker}] {corpo}"
+    _logger.log(nivel_num, mensagem, extra={"nivel_ui": nivel})
+
+configurar_log()
+
+# --- HELPERS ---
+
+def atualizar_status(**campos):
+    """Atualiza o painel. Dentro de um worker do pool, o progresso por médico é omitido
+    (o painel mostra o agregado) e secretaria/médico recebem o prefixo do worker.
+    Também define o contexto (secretaria/médico) dos spans de rastreamento."""
+    definir_contexto(**campos)
+    if not ui: return
+    worker = getattr(_ctx_worker, "nome", None)
+    if worker:
+        campos.pop("progresso", None)
+        for k in ("secretaria", "medico"):
+            if campos.get(k) not in (None, "—"):
+                campos[k] = f"[{worker}] {campos[k]}"
+    if campos:
+        ui.status(**campos)
 
 
 # =============================================================================
@@ -85,6 +249,7 @@ def log(mensagem):
 # =============================================================================
 
 class FloatingUI:
+    MAX_LINHAS = 250   # linhas mantidas no widget de log
     C = {
         "bg":       "#1e1e2e",
         "card":     "#2a2a3e",
@@ -152,12 +317,20 @@ class FloatingUI:
         self.lbl_sec  = self._row(card, "SECRETARIA")
         self.lbl_med  = self._row(card, "MÉDICO")
         self.lbl_prog = self._row(card, "PROGRESSO")
+        self.lbl_ntiss = self._row(card, "NTISS")
+        self.lbl_ntiss.config(text="🟢 normal")
+        self.var_retomar = tk.BooleanVar(value=False)
+        tk.Checkbutton(card, text="♻ Retomar última execução (pula o que já foi concluído)",
+                       variable=self.var_retomar, fg=C["dim"], bg=C["card"], bd=0,
+                       selectcolor=C["bar"], activebackground=C["card"], activeforeground=C["texto"],
+                       font=("Segoe UI", 7), anchor="w").pack(fill="x", pady=(3, 0))
 
         # ---- botões (empacotado ANTES do log para reservar espaço no bottom)
         self.bf = tk.Frame(self._corpo, bg=C["bg"])
         self.bf.pack(side="bottom", fill="x", padx=8, pady=8)
-        self.btn_v = self._btn(self.bf, "🔗 Vincular",  "#1e66f5", lambda: self._escolher(1))
-        self.btn_c = self._btn(self.bf, "➕ Cadastrar", "#40a02b", lambda: self._escolher(2))
+        # Vincular/Cadastrar só habilitam (habilitar_menu) quando o Chrome termina de abrir
+        self.btn_v = self._btn(self.bf, "🔗 Vincular",  "#1e66f5", lambda: self._escolher(1), state="disabled")
+        self.btn_c = self._btn(self.bf, "➕ Cadastrar", "#40a02b", lambda: self._escolher(2), state="disabled")
         self.btn_p = self._btn(self.bf, "⏸ Pausar",    "#df8e1d", self._toggle_pausa, state="disabled")
         self.btn_n = self._btn(self.bf, "⏭ Próximo usuário", "#585b70", self._skip, state="disabled")
         self.btn_n.pack_forget()  # visível apenas quando pausado
@@ -232,8 +405,9 @@ class FloatingUI:
 
     # ---------------------------------------------------------------- acoes
     def _escolher(self, op):
-        global _menu_escolha
+        global _menu_escolha, _retomar_escolha
         _menu_escolha = str(op)
+        _retomar_escolha = self.var_retomar.get()
         self.btn_v.config(state="disabled")
         self.btn_c.config(state="disabled")
         self.btn_p.config(state="normal")
@@ -264,8 +438,10 @@ class FloatingUI:
             log("▶️  Retomando execução...")
 
     def _skip(self):
-        """Pula a secretaria atual e retoma na próxima."""
-        _skip_event.set()
+        """Pula a secretaria atual (em todos os workers) e retoma na próxima."""
+        global _skip_geracao
+        with _skip_lock:
+            _skip_geracao += 1
         _pause_event.set()
         for b in (self.btn_v, self.btn_c, self.btn_p, self.btn_n, self.btn_s):
             b.pack_forget()
@@ -277,7 +453,6 @@ class FloatingUI:
     def _parar(self):
         global solicitar_finalizacao
         solicitar_finalizacao = True
-        _skip_event.clear()
         _pause_event.set()
         _menu_event.set()
         # restaura layout normal de botões
@@ -303,7 +478,17 @@ class FloatingUI:
             self.status(modo="—", secretaria="—", medico="—", progresso="—")
         self.root.after(0, _do)
 
-    def status(self, modo=None, secretaria=None, medico=None, progresso=None):
+    def falha_inicio(self, mensagem):
+        """Chama do thread do bot quando o Chrome ou o login falhou: mostra o erro no status
+        e troca os botões (que não seriam mais habilitados) por um Fechar."""
+        def _do():
+            for b in (self.btn_v, self.btn_c, self.btn_p, self.btn_n, self.btn_s):
+                b.pack_forget()
+            self._btn(self.bf, "✕ Fechar", "#d20f39", self.root.destroy)
+            self.status(modo="❌ Falha ao iniciar", ntiss=f"🔴 {mensagem}")
+        self.root.after(0, _do)
+
+    def status(self, modo=None, secretaria=None, medico=None, progresso=None, ntiss=None):
         """Atualiza os rótulos de status de forma thread-safe."""
         def _do():
             _trunc = lambda s, n: (s[:n-1] + "…") if len(s) > n else s
@@ -311,6 +496,9 @@ class FloatingUI:
             if secretaria is not None:  self.lbl_sec.config(text=_trunc(str(secretaria), 32))
             if medico is not None:      self.lbl_med.config(text=_trunc(str(medico), 32))
             if progresso is not None:   self.lbl_prog.config(text=str(progresso))
+            if ntiss is not None:
+                cor = self.C["vermelho"] if "🔴" in ntiss else self.C["amarelo"] if "🟡" in ntiss else self.C["texto"]
+                self.lbl_ntiss.config(text=_trunc(str(ntiss), 36), fg=cor)
         self.root.after(0, _do)
 
     def perguntar(self, titulo, pergunta):
@@ -374,43 +562,511 @@ class FloatingUI:
 
     # ----------------------------------------------------------- poll de logs
     def _poll(self):
-        try:
-            while True:
-                msg, nivel = log_queue.get_nowait()
-                self._write(msg, nivel)
-        except queue.Empty:
-            pass
+        # rajada maior que o painel: só as últimas MAX_LINHAS aparecem mesmo
+        lote = [_buffer_painel.popleft() for _ in range(len(_buffer_painel))][-self.MAX_LINHAS:]
+        if lote:
+            self._write(lote)
         self.root.after(100, self._poll)
 
-    def _write(self, msg, nivel):
+    def _write(self, lote):
+        """Um único insert (texto, tag, texto, tag...) por tick, depois um corte e um scroll."""
+        partes = []
+        for hora, msg, nivel in lote:
+            partes += [f"{hora} ", "hora", f"{msg}\n", nivel]
         self.txt.config(state="normal")
-        hora = datetime.now().strftime("%H:%M")
-        self.txt.insert("end", f"{hora} ", "hora")
-        self.txt.insert("end", f"{msg}\n", nivel)
+        self.txt.insert("end", *partes)
         lines = int(self.txt.index("end-1c").split(".")[0])
-        if lines > 250:
-            self.txt.delete("1.0", f"{lines - 250}.0")
+        if lines > self.MAX_LINHAS:
+            self.txt.delete("1.0", f"{lines - self.MAX_LINHAS}.0")
         self.txt.see("end")
         self.txt.config(state="disabled")
 
 
 def checar_pausa():
-    """Bloqueia enquanto pausado. Retorna True se o usuário clicou em Próximo."""
+    """Bloqueia enquanto pausado. Retorna True se o usuário clicou em Próximo.
+    Cada thread (worker) consome o "Próximo" uma única vez."""
     if not _pause_event.is_set():
         _pause_event.wait()  # aguarda Retomar ou Próximo
-    if _skip_event.is_set():
-        _skip_event.clear()
+    disjuntor.aguardar()     # NTISS lento: espera o backoff do disjuntor
+    with _skip_lock:
+        geracao = _skip_geracao
+    if getattr(_ctx_worker, "skip_visto", 0) != geracao:
+        _ctx_worker.skip_visto = geracao
+        _ctx_worker.pulou = True
         return True   # sinaliza: pular este item
     return False
 
+def descartar_skip_pendente():
+    """Marca como visto o "Próximo" já clicado: um clique durante o pool (que só os workers
+    consomem) não pode pular a primeira secretaria do próximo ciclo desta thread."""
+    with _skip_lock:
+        _ctx_worker.skip_visto = _skip_geracao
+
+
+# ==============================================================================
+# RASTREAMENTO (SPANS DE TEMPO POR ETAPA)
+# ==============================================================================
+# Cada etapa (login, pesquisa, abrir modal, checkbox, logins, salvar, voltar...) vira
+# uma linha JSONL em estado_autotiss/trace.jsonl com secretaria/médico, duração,
+# chamadas de WebDriver e tempo dormindo (sleeps explícitos) dentro do span.
+# `python -m autotiss relatorio` agrega: p50/p95/máx por etapa.
+
+class RastreadorSpans:
+    """Grava spans em JSONL (buffer em memória, flush em lote). Thread-safe."""
+
+    def __init__(self, caminho, ativo=True, lote=200):
+        self.caminho = caminho
+        self.ativo = ativo
+        self.lote = lote
+        self.sessao = datetime.now().strftime("%Y%m%d-%H%M%S")   # uma por processo/configuração
+        self._lock = threading.Lock()
+        self._buffer = []
+
+    def registrar(self, etapa, duracao, ok=True, chamadas=0, sono=0.0, **extra):
+        if not self.ativo: return
+        reg = {"ts": datetime.now().isoformat(timespec="milliseconds"), "sessao": self.sessao,
+               "exec": _execucao["id"], "w": getattr(_ctx_worker, "nome", None), "etapa": etapa,
+               "sec": getattr(_ctx_worker, "secretaria", None), "medico": getattr(_ctx_worker, "medico", None),
+               "nivel": getattr(_ctx_worker, "nivel", 0), "dur": round(duracao, 4), "ok": ok,
+               "calls": chamadas, "sono": round(sono, 4)}
+        base = getattr(_ctx_worker, "nivel_base", 0)
+        if base:
+            reg["base"] = base   # thread filha (ver _thread_filha): nível em que ela começou
+        reg.update(extra)
+        with self._lock:
+            self._buffer.append(json.dumps(reg, ensure_ascii=False))
+            if len(self._buffer) >= self.lote:
+                self._descarregar()
+
+    def _descarregar(self):
+        if not self._buffer: return
+        try:
+            os.makedirs(os.path.dirname(self.caminho) or ".", exist_ok=True)
+            with open(self.caminho, "a", encoding="utf-8") as f:
+                f.write("\n".join(self._buffer) + "\n")
+        except OSError as e:
+            print(f"[AVISO] Não foi possível gravar o trace: {e}", file=_saida_log)
+        self._buffer = []
+
+    def sincronizar(self):
+        with self._lock:
+            self._descarregar()
+
+def _contadores():
+    return getattr(_ctx_worker, "chamadas", 0), getattr(_ctx_worker, "sono", 0.0)
+
+def dormir(segundos):
+    """time.sleep contabilizado como tempo ocioso do span corrente."""
+    time.sleep(segundos)
+    _ctx_worker.sono = getattr(_ctx_worker, "sono", 0.0) + segundos
+
+def definir_contexto(**campos):
+    """Secretaria/médico corrente da thread (vai em cada span). Trocar de secretaria limpa o médico."""
+    if "secretaria" in campos:
+        _ctx_worker.secretaria = campos["secretaria"]
+        _ctx_worker.medico = None
+    if campos.get("medico") not in (None, "—"):
+        _ctx_worker.medico = campos["medico"]
+        _ctx_worker.inicio_medico = (time.perf_counter(),) + _contadores()
+
+class rastrear:
+    """Span como context manager: `with rastrear("vincular:salvar"): ...`.
+    Também serve de decorador de função inteira: `@rastrear("login")`."""
+
+    def __init__(self, etapa):
+        self.etapa = etapa
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        self.c0, self.s0 = _contadores()
+        _ctx_worker.nivel = getattr(_ctx_worker, "nivel", 0) + 1
+        return self
+
+    def __exit__(self, tipo, valor, tb):
+        _ctx_worker.nivel -= 1
+        c1, s1 = _contadores()
+        rastreador.registrar(self.etapa, time.perf_counter() - self.t0, ok=tipo is None,
+                             chamadas=c1 - self.c0, sono=s1 - self.s0)
+        return False
+
+    def __call__(self, funcao):
+        etapa = self.etapa
+        def _rastreada(*args, **kwargs):
+            with rastrear(etapa):
+                return funcao(*args, **kwargs)
+        _rastreada.__name__, _rastreada.__doc__ = funcao.__name__, funcao.__doc__
+        return _rastreada
+
+def _thread_filha(nivel, funcao, *args):
+    """Alvo de threading.Thread: os spans da thread nova ficam aninhados no span corrente
+    da thread que a criou (`nivel`) em vez de virarem raízes paralelas a ele."""
+    _ctx_worker.nivel = _ctx_worker.nivel_base = nivel
+    return funcao(*args)
+
+def registrar_span_medico(modo, status):
+    """Fecha o span do médico corrente (aberto em definir_contexto) ao registrar o resultado.
+    Retorna a duração do médico em segundos (None se não havia médico aberto)."""
+    inicio = getattr(_ctx_worker, "inicio_medico", None)
+    if not inicio: return None
+    _ctx_worker.inicio_medico = None
+    t0, c0, s0 = inicio
+    c1, s1 = _contadores()
+    duracao = time.perf_counter() - t0
+    rastreador.registrar(f"{modo}:medico", duracao, ok=status != "erro",
+                         chamadas=c1 - c0, sono=s1 - s0, status=status)
+    return duracao
+
+def instrumentar_driver(driver):
+    """Conta os round-trips de WebDriver por thread (WebElement também passa por driver.execute)."""
+    original = driver.execute
+    def execute(*args, **kwargs):
+        _ctx_worker.chamadas = getattr(_ctx_worker, "chamadas", 0) + 1
+        return original(*args, **kwargs)
+    driver.execute = execute
+    return driver
+
+def percentil(valores, p):
+    """Percentil pelo método nearest-rank (p em 0..100)."""
+    if not valores: return 0.0
+    ordenados = sorted(valores)
+    k = max(0, min(len(ordenados) - 1, math.ceil(p * len(ordenados) / 100.0) - 1))
+    return ordenados[k]
+
+def relatorio_spans(caminho, sessao=None, execucao=None):
+    """Agrega o trace por etapa. Sem filtros usa a última sessão gravada.
+    Retorna {"sessao", "etapas": {etapa: {...}}, "totais": {...}}."""
+    if not os.path.exists(caminho):
+        return None
+    spans = []
+    with open(caminho, "r", encoding="utf-8") as f:
+        for linha in f:
+            try: spans.append(json.loads(linha))
+            except ValueError: continue
+    if execucao:
+        spans = [s for s in spans if s.get("exec") == execucao]
+    else:
+        sessao = sessao or (spans[-1].get("sessao") if spans else None)
+        spans = [s for s in spans if s.get("sessao") == sessao]
+    if not spans:
+        return None
+    por_etapa = {}
+    for s in spans:
+        por_etapa.setdefault(s["etapa"], []).append(s)
+    etapas = {}
+    for etapa, lista in por_etapa.items():
+        duracoes = [s["dur"] for s in lista]
+        calls = sum(s.get("calls", 0) for s in lista)
+        etapas[etapa] = {"n": len(lista), "falhas": sum(1 for s in lista if not s.get("ok", True)),
+                         "p50": percentil(duracoes, 50), "p95": percentil(duracoes, 95), "max": max(duracoes),
+                         "total": round(sum(duracoes), 3), "calls": calls, "calls_por_span": round(calls / len(lista), 1),
+                         "sono": round(sum(s.get("sono", 0.0) for s in lista), 3)}
+    # Tempo só com spans de primeiro nível (ciclo, login...): os aninhados já estão contidos neles,
+    # e os workers do pool são filhos do ciclo. Chamadas e sono são contados por thread: somam
+    # as raízes de cada thread (nivel == base), senão os workers ficariam de fora.
+    raiz = [s for s in spans if s.get("nivel", 0) == 0]
+    raiz_thread = [s for s in spans if s.get("nivel", 0) == s.get("base", 0)]
+    totais = {"spans": len(spans), "medicos": sum(1 for s in spans if s["etapa"].endswith(":medico")),
+              "tempo_somado_s": round(sum(s["dur"] for s in raiz), 2),
+              "calls": sum(s.get("calls", 0) for s in raiz_thread),
+              "sono_s": round(sum(s.get("sono", 0.0) for s in raiz_thread), 2)}
+    return {"sessao": spans[-1].get("sessao"), "exec": execucao, "etapas": etapas, "totais": totais}
+
+rastreador = RastreadorSpans(ARQUIVO_TRACE, RASTREAMENTO_ATIVO)
+
+
+# --- ESPERAS ADAPTATIVAS ---
+# Esperam a condição exata do DOM (poll fino) em vez de um delay fixo. Em timeout não há
+# mais o delay fixo antigo: o timeout de cada etapa já é maior que ele, e dormir depois
+# só atrasava uma página que não respondeu. Quem chama trata o None (aviso, caminho
+# alternativo ou erro do médico) em vez de seguir como se a página tivesse carregado.
+
+POLL_ESPERA = 0.05
+POLL_AGUARDE = 0.025
+ESTATISTICAS_ESPERA = {}   # {etapa: {"n", "total", "max", "timeouts"}}
+_estatisticas_lock = threading.Lock()
 
-def esperar_aguarde_sumir(driver):
-    time.sleep(0.2)
+def _registrar_espera(etapa, duracao, estourou):
+    with _estatisticas_lock:
+        e = ESTATISTICAS_ESPERA.setdefault(etapa, {"n": 0, "total": 0.0, "max": 0.0, "timeouts": 0})
+        e["n"] += 1
+        e["total"] += duracao
+        e["max"] = max(e["max"], duracao)
+        if estourou:
+            e["timeouts"] += 1
+
+def esperar_condicao(driver, condicao, etapa, timeout=2.0):
+    """Espera condicao(driver) ser verdadeira. Retorna o valor da condição, ou None
+    logo que o timeout estoura — sem o delay fixo de antes; o None deve ser tratado."""
+    t0 = time.perf_counter()
     try:
-        WebDriverWait(driver, TIMEOUT_AGUARDE).until(
-            EC.invisibility_of_element_located((By.ID, "aguarde"))
-        )
-    except: pass
+        res = WebDriverWait(driver, timeout, poll_frequency=POLL_ESPERA,
+                            ignored_exceptions=(StaleElementReferenceException,)).until(condicao)
+        _registrar_espera(etapa, time.perf_counter() - t0, False)
+        return res
+    except TimeoutException:
+        _registrar_espera(etapa, time.perf_counter() - t0, True)
+        return None
+
+def log_estatisticas_espera(limite=10):
+    """Loga as etapas que mais consumiram tempo de espera e zera as estatísticas."""
+    with _estatisticas_lock:
+        itens = sorted(ESTATISTICAS_ESPERA.items(), key=lambda kv: kv[1]["total"], reverse=True)
+        ESTATISTICAS_ESPERA.clear()
+    if not itens: return
+    log("⏱ [ESPERAS] etapa: n | total | média | máx | timeouts")
+    for etapa, e in itens[:limite]:
+        log(f"   {etapa}: {e['n']} | {e['total']:.1f}s | {e['total'] / e['n']:.2f}s | {e['max']:.2f}s | {e['timeouts']}")
+
+# Garante vários checkboxes do PrimeFaces em uma única chamada: acha cada um (pelo
+# rótulo ou por seletor CSS), clica só os que estão no estado errado e confere a classe
+# logo após o clique. arguments[1] = true apenas lê (sem clicar).
+# Retorna {id: {encontrado, antes, ok}}.
+JS_GARANTIR_CHECKBOXES = """
+    var alvos = arguments[0], soLer = arguments[1];
+    var raiz = document.getElementById('formServico') || document;
+    var norm = function (t) { return (t || '').replace(/\\s+/g, ' ').trim().toLowerCase(); };
+    var labels = raiz.querySelectorAll('label');
+    var ativo = function (b) { return b.classList.contains('ui-state-active'); };
+    function caixaDoRotulo(padroes) {
+        padroes = padroes.map(norm);
+        for (var i = 0; i < labels.length; i++) {
+            var txt = norm(labels[i].textContent);
+            if (!padroes.every(function (p) { return txt.indexOf(p) >= 0; })) continue;
+            // mesma ordem do localizador original: pai, irmão anterior do pai; a linha (tr)
+            // só por último e só se tiver uma caixa (numa linha com as duas, pegaria a errada)
+            var pai = labels[i].parentElement, tr = labels[i].closest('tr'), box = null;
+            if (pai) box = pai.querySelector('.ui-chkbox-box');
+            if (!box && pai && pai.previousElementSibling) box = pai.previousElementSibling.querySelector('.ui-chkbox-box');
+            if (!box && tr) {
+                var caixas = tr.querySelectorAll('.ui-chkbox-box');
+                if (caixas.length === 1) box = caixas[0];
+            }
+            if (box) return box;
+        }
+        return null;
+    }
+    var res = {};
+    alvos.forEach(function (a) {
+        var box = a.seletor ? (raiz.querySelector(a.seletor) || document.querySelector(a.seletor)) : caixaDoRotulo(a.rotulo);
+        if (!box) { res[a.id] = {encontrado: false, antes: null, ok: false}; return; }
+        var antes = ativo(box);
+        if (antes !== a.marcado && !soLer) {
+            box.scrollIntoView({block: 'center'});
+            box.click();
+        }
+        res[a.id] = {encontrado: true, antes: antes, ok: ativo(box) === a.marcado};
+    });
+    return res;
+"""
+
+ALVO_VISUALIZA_OUTROS = {"id": "visualiza", "nome": "Visualiza transações de outros logins?",
+                         "rotulo": ["Visualiza transa", "outros"], "marcado": True}
+ALVO_CANCELA_OUTROS = {"id": "cancela", "nome": "Cancela/Exclui transações de outros logins?",
+                       "rotulo": ["Cancela", "outros"], "marcado": True}
+ALVO_TODAS_TRANSACOES = {"id": "todas", "nome": "Todas as transações",
+                         "seletor": "div.ui-datatable-scrollable-header .ui-chkbox-box", "marcado": True}
+
+def garantir_checkboxes(driver, alvos, etapa="checkboxes", tentativas=2):
+    """Deixa cada alvo no estado `marcado` pedido. Se a classe só mudar depois do AJAX,
+    espera a confirmação (só leitura) antes de clicar de novo.
+    Retorna {id: {"encontrado", "ok", "alterado"}} e loga o que mudou/falhou."""
+    res = driver.execute_script(JS_GARANTIR_CHECKBOXES, alvos, False) or {}
+    antes = {k: v["antes"] for k, v in res.items()}
+    pendentes = [a for a in alvos if res.get(a["id"], {}).get("encontrado") and not res[a["id"]]["ok"]]
+    for tentativa in range(tentativas):
+        if not pendentes: break
+        lido = esperar_condicao(driver, lambda d: (lambda r: r if all(v["ok"] for v in r.values()) else False)(
+                                    d.execute_script(JS_GARANTIR_CHECKBOXES, pendentes, True)),
+                                f"{etapa}:verificar", timeout=1.0)
+        if lido:
+            res.update(lido)
+            break
+        if tentativa + 1 < tentativas:
+            log(f"   [RETRY {tentativa+1}/{tentativas}] Checkbox não marcou: {', '.join(a['nome'] for a in pendentes)}")
+            res.update(driver.execute_script(JS_GARANTIR_CHECKBOXES, pendentes, False) or {})
+            pendentes = [a for a in pendentes if not res[a["id"]]["ok"]]
+    for a in alvos:
+        r = res.setdefault(a["id"], {"encontrado": False, "ok": False})
+        r["alterado"] = r["ok"] and antes.get(a["id"]) is not None and antes[a["id"]] != a["marcado"]
+        if not r["encontrado"]:
+            log(f"      [AVISO] Checkbox '{a['nome']}' não encontrado.")
+        elif not r["ok"]:
+            log(f"      [AVISO] Checkbox '{a['nome']}' não ficou {'marcado' if a['marcado'] else 'desmarcado'}.")
+        elif r["alterado"]:
+            log(f"      ✅ '{a['nome']}' {'marcado' if a['marcado'] else 'desmarcado'}.")
+    return res
+
+JS_LISTA_FILTRADA = """
+    var paineis = document.querySelectorAll(arguments[0]);
+    var norm = function (t) { return (t || '').normalize('NFD').replace(/[\u0300-\u036f]/g, '').toUpperCase(); };
+    var termo = norm(arguments[1]);
+    for (var p = 0; p < paineis.length; p++) {
+        var painel = paineis[p];
+        if (getComputedStyle(painel).display === 'none') continue;
+        var itens = painel.querySelectorAll('li');
+        for (var i = 0; i < itens.length; i++) {
+            var li = itens[i];
+            if (li.offsetParent === null) continue;
+            if (norm(li.textContent).indexOf(termo) < 0) return false;
+        }
+        return true;
+    }
+    return false;
+"""
+
+def cond_lista_filtrada(css_painel, termo):
+    """Condição: o painel visível só exibe itens que contêm `termo` (filtro aplicado)."""
+    return lambda d: d.execute_script(JS_LISTA_FILTRADA, css_painel, termo)
+
+def cond_painel_visivel(css_painel, visivel=True):
+    def _cond(d):
+        abertos = [p for p in d.find_elements(By.CSS_SELECTOR, css_painel) if p.is_displayed()]
+        return bool(abertos) == visivel
+    return _cond
+
+# Sonda instalada na página: conta requisições AJAX em andamento (jQuery/PrimeFaces).
+# É reinstalada automaticamente após navegações completas (window novo).
+JS_SONDA_AJAX = """
+    if (!window.__autotissAjax) {
+        var sonda = window.__autotissAjax = {pendentes: 0};
+        if (window.jQuery) {
+            jQuery(document).on('ajaxSend', function () { sonda.pendentes++; });
+            jQuery(document).on('ajaxComplete', function () { sonda.pendentes = Math.max(0, sonda.pendentes - 1); });
+        }
+    }
+    var pendentes = window.__autotissAjax.pendentes;
+    if (window.jQuery && jQuery.active) pendentes = Math.max(pendentes, jQuery.active);
+    var fila = window.PrimeFaces && PrimeFaces.ajax && PrimeFaces.ajax.Queue;
+    if (fila && fila.isEmpty && !fila.isEmpty()) pendentes = Math.max(pendentes, 1);
+    var ag = document.getElementById('aguarde');
+    var bloqueado = !!(ag && ag.getClientRects().length > 0 && getComputedStyle(ag).visibility !== 'hidden');
+    return [pendentes, bloqueado, document.readyState === 'complete'];
+"""
+
+# --- ORÇAMENTO DE TIMEOUT E DISJUNTOR (NTISS LENTO) ---
+# Cada etapa do #aguarde tem o próprio timeout, aprendido da latência recente
+# (p99 × timeout_fator, entre timeout_minimo e timeout_aguarde). Respostas lentas
+# seguidas abrem o disjuntor: os workers param de mandar requisições por um backoff
+# exponencial; passado o backoff, a primeira resposta decide se fecha ou reabre.
+
+class OrcamentoTimeouts:
+    """Timeout por etapa a partir das últimas `janela` durações observadas."""
+
+    def __init__(self, fator, minimo, maximo, amostras_min=20, janela=200):
+        self.fator = fator
+        self.minimo = minimo
+        self.maximo = maximo
+        self.amostras_min = amostras_min
+        self.janela = janela
+        self._lock = threading.Lock()
+        self._amostras = {}   # {etapa: deque de durações}
+
+    def registrar(self, etapa, duracao):
+        with self._lock:
+            self._amostras.setdefault(etapa, deque(maxlen=self.janela)).append(duracao)
+
+    def limite(self, etapa):
+        with self._lock:
+            amostras = list(self._amostras.get(etapa, ()))
+        if len(amostras) < self.amostras_min:
+            return self.maximo
+        return max(self.minimo, min(self.maximo, percentil(amostras, 99) * self.fator))
+
+class DisjuntorNTISS:
+    """Circuit breaker das esperas do NTISS (fechado → aberto → meio-aberto)."""
+
+    def __init__(self, limite_lentas, lento_s, backoff_s, backoff_max_s):
+        self.limite_lentas = limite_lentas
+        self.lento_s = lento_s
+        self.backoff_s = backoff_s
+        self.backoff_max_s = backoff_max_s
+        self._lock = threading.Lock()
+        self.lentas = 0          # respostas lentas seguidas
+        self.aberturas = 0       # aberturas seguidas (expoente do backoff)
+        self.total_aberturas = 0
+        self.pausado_ate = 0.0   # time.monotonic()
+        self.meio_aberto = False
+
+    def registrar(self, duracao, estourou):
+        lento = estourou or duracao >= self.lento_s
+        with self._lock:
+            if not lento:
+                self.lentas = 0
+                if self.meio_aberto:
+                    self.meio_aberto = False
+                    self.aberturas = 0
+                    log("✅ [DISJUNTOR] NTISS voltou a responder normalmente.")
+                    atualizar_status(ntiss="🟢 normal")
+                return
+            self.lentas += 1
+            if time.monotonic() < self.pausado_ate:
+                return   # já aberto (resposta de uma ação anterior à pausa)
+            if self.meio_aberto or self.lentas >= self.limite_lentas:
+                self._abrir(duracao)
+
+    def _abrir(self, duracao):
+        self.aberturas += 1
+        self.total_aberturas += 1
+        espera = min(self.backoff_max_s, self.backoff_s * 2 ** (self.aberturas - 1))
+        self.pausado_ate = time.monotonic() + espera
+        self.meio_aberto = True
+        self.lentas = 0
+        retorno = datetime.fromtimestamp(time.time() + espera).strftime("%H:%M:%S")
+        log(f"⚡ [DISJUNTOR] NTISS lento (última espera {duracao:.1f}s) — pausando os workers por {espera:.0f}s (até {retorno}).")
+        atualizar_status(ntiss=f"🔴 lento — pausado até {retorno}")
+
+    def aguardar(self):
+        """Bloqueia a thread enquanto o disjuntor estiver aberto."""
+        avisou = False
+        while not solicitar_finalizacao:
+            with self._lock:
+                restante = self.pausado_ate - time.monotonic()
+            if restante <= 0:
+                if avisou:
+                    atualizar_status(ntiss="🟡 testando (meio-aberto)")
+                return
+            avisou = True
+            dormir(min(restante, 0.5))
+
+orcamento_timeouts = OrcamentoTimeouts(TIMEOUT_FATOR, TIMEOUT_MINIMO, TIMEOUT_AGUARDE)
+disjuntor = DisjuntorNTISS(DISJUNTOR_LENTAS, DISJUNTOR_LENTO_S, DISJUNTOR_BACKOFF_S, DISJUNTOR_BACKOFF_MAX_S)
+
+def esperar_aguarde_sumir(driver, etapa="aguarde"):
+    """Espera o NTISS ficar ocioso: nenhuma requisição AJAX em andamento e #aguarde oculto.
+    Exige duas leituras ociosas seguidas (poll de 25 ms). O timeout é o orçamento aprendido
+    da etapa; a duração alimenta o orçamento e o disjuntor. Retorna o tempo esperado (s)."""
+    t0 = time.perf_counter()
+    orcamento = orcamento_timeouts.limite(etapa)
+    limite = t0 + orcamento
+    ociosas = 0
+    estourou = False
+    while True:
+        try:
+            pendentes, bloqueado, pronto = driver.execute_script(JS_SONDA_AJAX)
+        except Exception:
+            # Página em transição ou sonda indisponível: volta para a espera pelo #aguarde
+            try:
+                WebDriverWait(driver, max(0.1, limite - time.perf_counter()), poll_frequency=POLL_ESPERA).until(
+                    EC.invisibility_of_element_located((By.ID, "aguarde"))
+                )
+            except: estourou = True
+            break
+        if not pendentes and not bloqueado and pronto:
+            ociosas += 1
+            if ociosas >= 2: break
+        else:
+            ociosas = 0
+        if time.perf_counter() >= limite:
+            estourou = True
+            break
+        time.sleep(POLL_AGUARDE)
+    duracao = time.perf_counter() - t0
+    _registrar_espera(etapa, duracao, estourou)
+    orcamento_timeouts.registrar(etapa, duracao)
+    disjuntor.registrar(duracao, estourou)
+    if estourou:
+        log(f"   [AVISO] NTISS ainda ocupado após {duracao:.1f}s ({etapa}, orçamento {orcamento:.1f}s).")
+    return duracao
 
 def clicar_js(driver, elemento, nome="Elemento"):
     try: driver.execute_script("arguments[0].click();", elemento)
@@ -420,8 +1076,106 @@ def fechar_janelas_travadas(driver):
     try: webdriver.ActionChains(driver).send_keys(Keys.ESCAPE).perform()
     except: pass
 
+# ==============================================================================
+# LOCALIZADORES (REGISTRO CENTRAL)
+# ==============================================================================
+# Todas as alternativas de cada elemento ficam aqui, com caminhos rápidos (ID/CSS)
+# onde existem. `achar` testa todas as alternativas a cada poll, na ordem das que mais
+# funcionaram — uma alternativa que nunca casa não custa mais um timeout inteiro.
+# As estatísticas de acerto persistem em estado_autotiss/localizadores.json.
+# Parâmetros ({nome}) são preenchidos com str.format na chamada.
+
+LOCALIZADORES = {
+    "login:entrar": [
+        (By.ID, "botaoEntrar"),
+        (By.XPATH, "//span[contains(text(),'Entrar')]"),
+    ],
+    "pesquisa:campo_login": [
+        (By.XPATH, "//label[normalize-space()='Login']/following::input[@type='text'][1]"),
+        (By.XPATH, "//label[contains(text(),'Login')]/following::input[1]"),
+        (By.ID, "j_idt129"),   # id gerado pelo JSF: só como último recurso
+    ],
+    "pesquisa:botao": [
+        (By.XPATH, "//button[span[text()='Pesquisar']]"),
+        (By.CSS_SELECTOR, "button[title='Pesquisar']"),
+    ],
+    "voltar:cancelar": [
+        (By.XPATH, "//button[span[text()='Cancelar']][not(ancestor::div[contains(@class,'ui-dialog')])]"),
+        (By.ID, "j_idt221"),
+    ],
+    "servico:salvar": [
+        (By.XPATH, "//form[@id='formServico']//span[text()='Salvar']"),
+        (By.XPATH, "//span[text()='Salvar']"),
+    ],
+    "servico:cancelar": [
+        (By.XPATH, "//form[@id='formServico']//span[text()='Cancelar']"),
+    ],
+    "cadastrar:criar_servico": [
+        (By.XPATH, "//button[span[text()='Criar Serviço']]"),
+    ],
+    "cadastrar:item_prestador": [
+        (By.XPATH, "//div[contains(@id, 'prestadorFuncionario_panel')]//li[contains(translate(., 'abcdefghijklmnopqrstuvwxyzáàâãäéèêëíìîïóòôõöúùûüçÁÀÂÃÄÉÈÊËÍÌÎÏÓÒÔÕÖÚÙÛÜÇ', 'ABCDEFGHIJKLMNOPQRSTUVWXYZAAAAAEEEEIIIIOOOOOUUUUCAAAAAEEEEIIIIOOOOOUUUUC'), '{nome}')]"),
+    ],
+}
+
+class RegistroLocalizadores:
+    """Resolve elementos pelo nome lógico, aprendendo a ordem das alternativas."""
+
+    def __init__(self, caminho, definicoes=LOCALIZADORES):
+        self.caminho = caminho
+        self.definicoes = definicoes
+        self._lock = threading.Lock()
+        self._alterado = False
+        self._acertos = {}   # {chave: {valor do localizador: acertos}}
+        dados = carregar_json(caminho) if caminho else None
+        if isinstance(dados, dict):
+            self._acertos = {k: dict(v) for k, v in dados.items() if isinstance(v, dict)}
+
+    def _ordem(self, chave):
+        with self._lock:
+            acertos = self._acertos.get(chave, {})
+            return sorted(self.definicoes[chave], key=lambda loc: -acertos.get(loc[1], 0))
+
+    def _acerto(self, chave, valor):
+        with self._lock:
+            por_valor = self._acertos.setdefault(chave, {})
+            por_valor[valor] = por_valor.get(valor, 0) + 1
+            self._alterado = True
+
+    def buscar(self, driver, chave, clicavel=False, **params):
+        """Uma passada por todas as alternativas, sem esperar. Retorna o elemento ou None."""
+        for by, valor in self._ordem(chave):
+            for el in driver.find_elements(by, valor.format(**params) if params else valor):
+                if not clicavel or (el.is_displayed() and el.is_enabled()):
+                    self._acerto(chave, valor)
+                    return el
+        return None
+
+    def achar(self, driver, chave, timeout=4.0, clicavel=False, **params):
+        """Espera até alguma alternativa casar. Levanta TimeoutException se nenhuma casar."""
+        return WebDriverWait(driver, timeout, poll_frequency=POLL_ESPERA,
+                             ignored_exceptions=(StaleElementReferenceException,)).until(
+            lambda d: self.buscar(d, chave, clicavel, **params), f"localizador '{chave}' não encontrado")
+
+    def salvar(self):
+        with self._lock:
+            if not self._alterado or not self.caminho: return
+            dados = json.dumps(self._acertos, ensure_ascii=False, indent=1)
+            self._alterado = False
+        try:
+            os.makedirs(os.path.dirname(self.caminho) or ".", exist_ok=True)
+            tmp = self.caminho + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(dados)
+            os.replace(tmp, self.caminho)
+        except OSError as e:
+            log(f"[AVISO] Não foi possível salvar as estatísticas de localizadores: {e}")
+
+localizadores = RegistroLocalizadores(ARQUIVO_LOCALIZADORES)
+
 # --- FUNÇÃO DE LOGIN AUTOMÁTICO (NOVA) ---
 
+@rastrear("login")
 def realizar_login_automatico(driver):
     log("🔑 Iniciando Login Automático...")
     try:
@@ -434,25 +1188,21 @@ def realizar_login_automatico(driver):
         driver.find_element(By.ID, "senha").clear()
         driver.find_element(By.ID, "senha").send_keys(SENHA_LOGIN)
         
-        # Clica em Entrar
-        # Tenta pelo ID do botão 'botaoEntrar' (pai do span)
-        try:
-            btn = driver.find_element(By.ID, "botaoEntrar")
-            clicar_js(driver, btn, "Botão Entrar")
-        except:
-            # Fallback para o Span com texto
-            btn = driver.find_element(By.XPATH, "//span[contains(text(),'Entrar')]")
-            clicar_js(driver, btn, "Botão Entrar (Span)")
+        # Clica em Entrar (ID 'botaoEntrar' ou o span com o texto)
+        clicar_js(driver, localizadores.achar(driver, "login:entrar", timeout=5), "Botão Entrar")
             
-        esperar_aguarde_sumir(driver)
+        esperar_aguarde_sumir(driver, "aguarde:login")
         log("✅ Login enviado!")
+        return True
         
     except Exception as e:
         log(f"❌ Erro no login automático: {e}")
-        print("   -> Faça o login manualmente.")
+        log("   -> Faça o login manualmente.")
+        return False
 
 # --- FUNÇÕES DE NAVEGAÇÃO ---
 
+@rastrear("navegar_lista")
 def navegar_para_lista_funcionarios(driver):
     """Navega automaticamente até a tela de Consulta de Funcionários.
     Usa JS para clicar no link, sem depender do mouse físico (evita fechar o submenu acidentalmente).
@@ -464,7 +1214,7 @@ def navegar_para_lista_funcionarios(driver):
         link_funcionario = WebDriverWait(driver, 15).until(
             EC.presence_of_element_located((
                 By.XPATH,
-                "//a[contains(@href,'/ntiss/cadastros/funcionario/lista.jsf')]"
+                f"//a[contains(@href,'{CAMINHO_LISTA}')]"
             ))
         )
         driver.execute_script("arguments[0].click();", link_funcionario)
@@ -472,9 +1222,7 @@ def navegar_para_lista_funcionarios(driver):
 
         # Passo 2: Aguarda a página carregar completamente
         esperar_aguarde_sumir(driver)
-        WebDriverWait(driver, 20).until(
-            EC.presence_of_element_located((By.XPATH, "//button[span[text()='Pesquisar']]"))
-        )
+        localizadores.achar(driver, "pesquisa:botao", timeout=20)
 
         # Passo 3: Move o mouse para o centro do conteúdo principal (longe da área do menu)
         # Evita que o submenu 'Cadastros' reabra por hover acidental após o carregamento
@@ -490,427 +1238,3022 @@ def navegar_para_lista_funcionarios(driver):
         log(f"❌ Erro ao navegar para Funcionários: {e}")
         return False
 
-def navegar_pesquisar_secretaria(driver, login_secretaria):
-    log(f"🔍 [NAVEGAÇÃO] Pesquisando: {login_secretaria}")
-    if ui: ui.status(secretaria=login_secretaria, medico="—")
-    esperar_aguarde_sumir(driver)
+# --- SESSÃO SALVA (COOKIES) ---
+# Depois de chegar na lista, os cookies do NTISS vão para <pasta_estado>/sessao-<worker>.json.
+# Na próxima abertura o robô injeta esses cookies e abre a lista direto; só se o NTISS
+# rejeitar a sessão (voltar para o login) é que o login normal acontece.
+
+def _arquivo_sessao():
+    return os.path.join(PASTA_ESTADO, f"sessao-{getattr(_ctx_worker, 'nome', None) or 'principal'}.json")
+
+def salvar_sessao(driver):
+    """Grava os cookies da sessão logada (mesma URL/usuário) para a próxima execução."""
+    if not REUSAR_SESSAO:
+        return
     try:
-        try: campo = driver.find_element(By.ID, "j_idt129")
-        except: campo = driver.find_element(By.XPATH, "//label[contains(text(),'Login')]/following::input[1]")
-        campo.clear()
-        campo.send_keys(login_secretaria)
-        time.sleep(0.5)
-        
-        try: btn = driver.find_element(By.XPATH, "//button[span[text()='Pesquisar']]")
-        except: btn = driver.find_element(By.CSS_SELECTOR, "button[title='Pesquisar']")
-        clicar_js(driver, btn, "Pesquisar")
-        
-        esperar_aguarde_sumir(driver)
-        time.sleep(0.8)
-        
-        btn_lapis = WebDriverWait(driver, 5).until(EC.element_to_be_clickable((By.CSS_SELECTOR, "img[title='Alterar']")))
-        clicar_js(driver, btn_lapis, "Editar")
+        dados = {"url": URL_SISTEMA, "usuario": USUARIO_LOGIN, "cookies": driver.get_cookies(),
+                 "salvo_em": datetime.now().isoformat(timespec="seconds")}
+        caminho = _arquivo_sessao()
+        os.makedirs(PASTA_ESTADO, exist_ok=True)
+        with open(caminho + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(dados, f, ensure_ascii=False)
+        os.replace(caminho + ".tmp", caminho)
+    except Exception as e:
+        log(f"[AVISO] Não foi possível salvar a sessão: {e}")
+
+def restaurar_sessao(driver):
+    """Injeta os cookies salvos e abre a lista de Funcionários direto. True se o NTISS
+    aceitou a sessão (lista carregada); False se não há sessão salva ou ela foi rejeitada."""
+    if not REUSAR_SESSAO:
+        return False
+    salvo = carregar_json(_arquivo_sessao())
+    if not salvo or salvo.get("url") != URL_SISTEMA or salvo.get("usuario") != USUARIO_LOGIN or not salvo.get("cookies"):
+        return False
+    try:
+        driver.get(urljoin(URL_SISTEMA, "/favicon.ico"))   # add_cookie exige estar no domínio; o favicon é a página mais leve
+        for cookie in salvo["cookies"]:
+            cookie = {k: v for k, v in cookie.items() if k in ("name", "value", "path", "domain", "secure", "httpOnly", "expiry", "sameSite")}
+            try:
+                driver.add_cookie(cookie)
+            except Exception:
+                pass
+        driver.get(urljoin(URL_SISTEMA, CAMINHO_LISTA))
         esperar_aguarde_sumir(driver)
+        WebDriverWait(driver, 15, poll_frequency=POLL_ESPERA).until(
+            lambda d: d.find_elements(By.ID, "login") or localizadores.buscar(d, "pesquisa:botao"))
+        if driver.find_elements(By.ID, "login"):
+            log("   -> Sessão salva expirada; fazendo login.")
+            return False
+        log("✅ Sessão salva reaproveitada — login pulado, já na lista de Funcionários.")
         return True
+    except Exception as e:
+        log(f"   -> Sessão salva não serviu ({e.__class__.__name__}); fazendo login.")
+        return False
+
+def entrar_no_sistema(driver, tempos=None):
+    """Deixa o Chrome na lista de Funcionários: sessão salva primeiro, login normal se o
+    NTISS rejeitar. True se a lista abriu."""
+    with _medir(tempos, "sessão salva"):
+        if restaurar_sessao(driver):
+            return True
+    with _medir(tempos, "página"):
+        driver.get(URL_SISTEMA)
+    if USUARIO_LOGIN and SENHA_LOGIN:
+        with _medir(tempos, "login"):
+            realizar_login_automatico(driver)
+    else:
+        log("[AVISO] Usuário/Senha não configurados no JSON. Faça login manual.")
+    with _medir(tempos, "lista"):
+        ok = navegar_para_lista_funcionarios(driver)
+    if ok:
+        salvar_sessao(driver)
+    return ok
+
+# --- NAVEGAÇÃO ATÉ A SECRETARIA ---
+# A edição da secretaria abre por postback (lápis da linha na pesquisa), sem URL própria.
+# Para não pesquisar de novo a cada secretaria, a pesquisa usa o prefixo comum das
+# secretarias da execução (uma pesquisa lista todas) e, depois do Cancelar, os resultados
+# continuam na tela: a próxima secretaria abre direto pelo lápis da linha dela. O termo
+# que achou cada login fica em <pasta_estado>/navegacao.json; login que não aparece na
+# pesquisa ampla (ex.: resultado paginado) passa a ser pesquisado pelo próprio login.
+
+PREFIXO_MINIMO = 4   # prefixo comum mais curto que isso listaria secretarias demais
+
+class CacheNavegacao:
+    """Termo de pesquisa que encontrou cada login de secretaria + prefixo da execução corrente."""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.prefixo = None
+        self._lock = threading.Lock()
+        self._alterado = False
+        dados = carregar_json(caminho) if caminho else None
+        self._termos = {k: v for k, v in dados.items() if isinstance(v, str)} if isinstance(dados, dict) else {}
+
+    def preparar(self, secretarias):
+        """Define o prefixo comum das secretarias da execução (None se curto ou desativado)."""
+        prefixo = os.path.commonprefix(list(secretarias)) if PESQUISA_EM_LOTE and len(secretarias) > 1 else ""
+        self.prefixo = prefixo if len(prefixo) >= PREFIXO_MINIMO else None
+        if self.prefixo:
+            log(f"🔎 [NAVEGAÇÃO] Secretarias serão abertas a partir da pesquisa por '{self.prefixo}'.")
+
+    def termos(self, login):
+        """Termos a pesquisar, em ordem: o que achou o login antes (senão o prefixo da
+        execução) e, por último, o próprio login."""
+        with self._lock:
+            primeiro = self._termos.get(login)
+        if primeiro is None and self.prefixo and login.startswith(self.prefixo):
+            primeiro = self.prefixo
+        return [t for t in (primeiro, login) if t] if primeiro != login else [login]
+
+    def achou(self, login, termo):
+        with self._lock:
+            if self._termos.get(login) != termo:
+                self._termos[login] = termo
+                self._alterado = True
+
+    def falhou(self, login, termo):
+        """A pesquisa por `termo` não trouxe o login. Se era o prefixo, o filtro de Login do
+        NTISS pode não casar por prefixo: desliga o prefixo no resto da execução, para não
+        pagar uma pesquisa extra (e o timeout) em cada secretaria."""
+        with self._lock:
+            if termo == self._termos.get(login):
+                del self._termos[login]   # termo guardado que deixou de funcionar
+                self._alterado = True
+            if termo == self.prefixo:
+                self.prefixo = None
+                log(f"🔎 [NAVEGAÇÃO] Pesquisa por '{termo}' não trouxe {login}: "
+                    f"secretarias serão pesquisadas pelo próprio login nesta execução.")
+
+    def salvar(self):
+        with self._lock:
+            if not self._alterado or not self.caminho: return
+            dados = json.dumps(self._termos, ensure_ascii=False, indent=1)
+            self._alterado = False
+        try:
+            os.makedirs(os.path.dirname(self.caminho) or ".", exist_ok=True)
+            tmp = self.caminho + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(dados)
+            os.replace(tmp, self.caminho)
+        except OSError as e:
+            log(f"[AVISO] Não foi possível salvar o cache de navegação: {e}")
+
+navegacao = CacheNavegacao(ARQUIVO_NAVEGACAO)
+
+# Clica no lápis da linha da secretaria nos resultados visíveis da pesquisa: célula igual
+# ao login; com arguments[1] (logo após pesquisar pelo próprio login), sem igual, a única
+# linha que contém o login. true se clicou.
+JS_ABRIR_SECRETARIA = """
+    var alvo = arguments[0].toUpperCase(), aceitaContem = arguments[1];
+    var botoes = document.querySelectorAll("img[title='Alterar']");
+    var contem = [];
+    for (var i = 0; i < botoes.length; i++) {
+        if (!botoes[i].getClientRects().length) continue;   // view oculta
+        var tr = botoes[i].closest('tr');
+        if (!tr) continue;
+        var tds = tr.querySelectorAll('td');
+        for (var j = 0; j < tds.length; j++) {
+            if ((tds[j].innerText || '').trim().toUpperCase() === alvo) { botoes[i].click(); return true; }
+        }
+        if ((tr.innerText || '').toUpperCase().indexOf(alvo) >= 0) contem.push(botoes[i]);
+    }
+    if (aceitaContem && contem.length === 1) { contem[0].click(); return true; }
+    return false;
+"""
+
+@rastrear("pesquisar_secretaria")
+def navegar_pesquisar_secretaria(driver, login_secretaria):
+    """Abre a edição da secretaria: direto pelo lápis se ela já está nos resultados da
+    pesquisa na tela; senão pesquisa pelos termos de navegacao.termos e abre."""
+    atualizar_status(secretaria=login_secretaria, medico="—")
+    esperar_aguarde_sumir(driver)
+    try:
+        # resultados antigos ou de uma pesquisa ampla: só a célula igual ao login vale
+        # ('77.hu_sec1' não pode abrir '77.hu_sec100')
+        if driver.execute_script(JS_ABRIR_SECRETARIA, login_secretaria, False):
+            log(f"↪ [NAVEGAÇÃO] {login_secretaria}: aberta direto dos resultados da pesquisa.")
+            esperar_aguarde_sumir(driver, "aguarde:abrir_secretaria")
+            return True
+        for termo in navegacao.termos(login_secretaria):
+            log(f"🔍 [NAVEGAÇÃO] Pesquisando: {termo}")
+            campo = localizadores.achar(driver, "pesquisa:campo_login", timeout=5)
+            campo.clear()
+            campo.send_keys(termo)
+            clicar_js(driver, localizadores.achar(driver, "pesquisa:botao"), "Pesquisar")
+            esperar_aguarde_sumir(driver, "aguarde:pesquisar")
+            contem = termo == login_secretaria
+            if esperar_condicao(driver, lambda d: d.execute_script(JS_ABRIR_SECRETARIA, login_secretaria, contem),
+                                "pesquisa:resultado", timeout=2.0):
+                navegacao.achou(login_secretaria, termo)
+                esperar_aguarde_sumir(driver, "aguarde:abrir_secretaria")
+                return True
+            navegacao.falhou(login_secretaria, termo)
+        log(f"   [AVISO] '{login_secretaria}' não encontrado.")
+        return False
     except:
         log(f"   [AVISO] '{login_secretaria}' não encontrado/erro.")
         return False
 
+@rastrear("voltar_pesquisa")
 def voltar_para_pesquisa(driver):
     log("🔙 [NAVEGAÇÃO] Voltando...")
     try:
         fechar_janelas_travadas(driver)
         esperar_aguarde_sumir(driver)
-        xpath_cancelar = "//button[span[text()='Cancelar']][not(ancestor::div[contains(@class,'ui-dialog')])]"
-        try:
-            btn = WebDriverWait(driver, 3).until(EC.element_to_be_clickable((By.XPATH, xpath_cancelar)))
-            clicar_js(driver, btn, "Cancelar Voltar")
-        except:
-            try: driver.find_element(By.ID, "j_idt221").click()
-            except: pass
+        try: clicar_js(driver, localizadores.achar(driver, "voltar:cancelar", timeout=3, clicavel=True), "Cancelar Voltar")
+        except TimeoutException: pass
         esperar_aguarde_sumir(driver)
     except: pass
 
 # ==============================================================================
-# MODO 1: VINCULAR (Mantido V28)
+# SESSÃO (WATCHDOG / RECUPERAÇÃO)
 # ==============================================================================
+# Sessão expirada ou redirect inesperado faz todo médico seguinte falhar queimando
+# TIMEOUT_AGUARDE. O vigia só olha o DOM depois de um erro (custo zero no caminho
+# feliz); se a sessão caiu — ou após SESSAO_MAX_FALHAS erros seguidos — refaz o login,
+# volta à secretaria corrente e devolve os médicos que falharam para serem refeitos.
+
+JS_ESTADO_SESSAO = """
+    var vis = function (el) { return !!(el && el.getClientRects().length); };
+    if (vis(document.getElementById('login')) && vis(document.getElementById('senha'))) return 'tela de login';
+    if (location.href.indexOf('/cadastros/funcionario/') < 0) return 'URL inesperada: ' + location.href;
+    return null;
+"""
 
-def verificar_status_medico(driver, botao_lapis):
+def diagnosticar_sessao(driver):
+    """Retorna o motivo se a sessão não está utilizável (login visível, URL errada), ou None."""
     try:
-        linha = botao_lapis.find_element(By.XPATH, "./ancestor::tr")
-        if any(img.is_displayed() for img in linha.find_elements(By.CSS_SELECTOR, "img[src*='inativar.png']")): return True 
-        if any(img.is_displayed() for img in linha.find_elements(By.CSS_SELECTOR, "img[src*='ativar.png']")): return False 
-        if "Sim" in linha.text: return True 
-        return False
-    except: return True 
+        return driver.execute_script(JS_ESTADO_SESSAO)
+    except Exception as e:
+        return f"navegador sem resposta ({type(e).__name__})"
 
-def executar_logica_vincular_logins(driver, lista_logins, filtro_medicos=None):
-    global solicitar_finalizacao
-    if filtro_medicos is not None:
-        log(f"   [VINCULAR] Filtro ativo: {len(filtro_medicos)} médico(s) alvo.")
+def recuperar_sessao(driver, secretaria=None, motivo=""):
+    """Refaz login (se preciso), abre a lista de Funcionários e reentra na secretaria."""
+    log(f"🩺 [SESSÃO] {motivo or 'sessão instável'} — recuperando...")
     try:
-        botoes = driver.find_elements(By.CSS_SELECTOR, "img[title='Alterar']")
-        if not botoes: return []
-        total_proc = len(botoes) - 1 if len(botoes) > 1 else len(botoes)
-        log(f"   [VINCULAR] Processando {total_proc} médicos...")
-        if ui: ui.status(progresso=f"0 / {total_proc}")
+        fechar_janelas_travadas(driver)
+        if diagnosticar_sessao(driver) != "tela de login":
+            driver.get(URL_SISTEMA)
+            esperar_aguarde_sumir(driver, "aguarde:recuperar")
+        if diagnosticar_sessao(driver) == "tela de login":
+            if not (USUARIO_LOGIN and SENHA_LOGIN):
+                log("   [ERRO] Sessão expirada e sem usuário/senha no config.json para refazer o login.")
+                return False
+            if not realizar_login_automatico(driver):
+                return False
+        if not navegar_para_lista_funcionarios(driver):
+            return False
+        salvar_sessao(driver)
+        if secretaria and not navegar_pesquisar_secretaria(driver, secretaria):
+            return False
+        log("✅ [SESSÃO] Recuperada.")
+        return True
+    except Exception as e:
+        log(f"   [ERRO] Falha ao recuperar a sessão: {e}")
+        return False
 
-        # Rastreia quais médicos do filtro foram encontrados na tela
-        encontrados = set()
+class VigiaSessao:
+    """Acompanha os resultados do loop de médicos de uma secretaria (via registrar_resultado,
+    na mesma thread) e decide quando recuperar a sessão."""
 
-        for i in range(total_proc):
-            if solicitar_finalizacao:
-                log("🛑 Processo interrompido pelo usuário")
-                return []
-            if checar_pausa():
-                log("   ⏭ Secretaria pulada pelo usuário.")
-                return []  # sai da função → main loop passa para a próxima secretaria
-            try:
-                botoes = driver.find_elements(By.CSS_SELECTOR, "img[title='Alterar']")
-                if i >= len(botoes): break
-                botao = botoes[i]
+    def __init__(self, driver, secretaria):
+        self.driver = driver
+        self.secretaria = secretaria
+        self.atual = None
+        self.falhas = []        # itens da sequência corrente de erros
+        self.refeitos = set()   # cada item é refeito no máximo uma vez
+        self.recuperacoes = 0
+        _ctx_worker.vigia = self
 
-                # Extrai nome do médico da linha para log/status
-                nome_medico = f"Médico {i+1}"
-                try:
-                    linha_tr = botao.find_element(By.XPATH, "./ancestor::tr")
-                    celulas = linha_tr.find_elements(By.TAG_NAME, "td")
-                    if celulas:
-                        nome_medico = celulas[0].text.strip() or nome_medico
-                except: pass
+    def item(self, item):
+        self.atual = item
 
-                log(f"   --- [{i+1}/{total_proc}] {nome_medico} ---")
-                if ui: ui.status(medico=nome_medico, progresso=f"{i+1} / {total_proc}")
+    def resultado(self, status):
+        if status == "erro":
+            if self.atual is not None and self.atual not in self.falhas:
+                self.falhas.append(self.atual)
+        else:
+            self.falhas = []
 
-                # Filtra por nome se filtro_medicos foi fornecido
-                if filtro_medicos is not None:
-                    try:
-                        linha_txt = botao.find_element(By.XPATH, "./ancestor::tr").text.upper()
-                        match = next((m for m in filtro_medicos if m.upper() in linha_txt), None)
-                        if match is None:
-                            log("   -> Pulando (não está na lista para vincular).")
-                            continue
-                        encontrados.add(match.upper())
-                    except: pass
+    def percorrer(self, itens):
+        """Itera os itens chamando verificar() antes de cada um e uma última vez no fim — erros
+        nos últimos médicos também disparam a recuperação e o refazer. `itens` pode ser um
+        gerador: é consumido sob demanda, e os itens a refazer vêm depois dele. self.total é
+        o tamanho conhecido da fila (None para gerador). Sessão irrecuperável: para com
+        self.abandonou = True."""
+        self.total = len(itens) if hasattr(itens, "__len__") else None
+        self.abandonou = False
+        fonte, refazer_fila, fim = iter(itens), deque(), object()
+        while True:
+            refazer = self.verificar()
+            if refazer is None:
+                self.abandonou = True
+                return
+            refazer_fila.extend(refazer)
+            if self.total is not None:
+                self.total += len(refazer)
+            item = next(fonte, fim)
+            if item is fim:
+                if not refazer_fila:
+                    return
+                item = refazer_fila.popleft()
+            self.item(item)
+            yield item
 
-                if not verificar_status_medico(driver, botao):
-                    log("   -> Inativo.")
-                    continue
-                
-                driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", botao)
-                time.sleep(0.3)
-                try: botao.click()
-                except: clicar_js(driver, botao, "Lapis")
-                esperar_aguarde_sumir(driver)
+    def progresso(self, index):
+        """"3 / 10" para a barra de status; só "3" se o total ainda não é conhecido."""
+        return f"{index+1} / {self.total}" if self.total is not None else f"{index+1}"
 
-                try:
-                    houve_alt = False
-
-                    # --- Garante "Visualiza transações de outros logins?" ativado ---
-                    xpaths_viz = [
-                        "//tr[.//label[contains(text(), 'Visualiza transa') and contains(text(), 'outros')]]//div[contains(@class, 'ui-chkbox-box')]",
-                        "//label[contains(text(), 'Visualiza transa') and contains(text(), 'outros')]/..//div[contains(@class, 'ui-chkbox-box')]",
-                    ]
-                    chk_encontrado = False
-                    for xp in xpaths_viz:
-                        try:
-                            chk_viz = WebDriverWait(driver, 4).until(EC.element_to_be_clickable((By.XPATH, xp)))
-                            chk_encontrado = True
-                            if "ui-state-active" not in (chk_viz.get_attribute("class") or ""):
-                                driver.execute_script("arguments[0].scrollIntoView({block:'center'});", chk_viz)
-                                time.sleep(0.2)
-                                clicar_js(driver, chk_viz, "Visualiza transações outros logins")
-                                time.sleep(0.4)
-                                chk_viz2 = driver.find_element(By.XPATH, xp)
-                                if "ui-state-active" in (chk_viz2.get_attribute("class") or ""):
-                                    log("      ✅ 'Visualiza transações de outros logins?' ativado.")
-                                    houve_alt = True
-                                else:
-                                    log("      [AVISO] Não foi possível ativar 'Visualiza transações de outros logins?'.")
-                            break
-                        except:
-                            continue
-                    if not chk_encontrado:
-                        log("      [AVISO] Checkbox 'Visualiza transações' não encontrado neste médico.")
-
-                    # --- Garante "Cancela/Exclui transações de outros logins?" ativado ---
-                    JS_FIND_CE = """
-                        var form = document.getElementById('formServico');
-                        if (!form) return [null, 'form nao encontrado', ''];
-                        var labels = form.querySelectorAll('label');
-                        for (var lbl of labels) {
-                            var txt = (lbl.textContent || '').trim();
-                            if (txt.indexOf('Cancela') >= 0 && txt.indexOf('outros') >= 0) {
-                                var parent = lbl.parentElement;
-                                if (parent) {
-                                    var box = parent.querySelector('.ui-chkbox-box');
-                                    if (box) return [box, txt, 'parent-div'];
-                                }
-                                if (parent && parent.previousElementSibling) {
-                                    var box = parent.previousElementSibling.querySelector('.ui-chkbox-box');
-                                    if (box) return [box, txt, 'prev-parent'];
-                                }
-                            }
-                        }
-                        return [null, 'nao encontrado', ''];
-                    """
-                    res_ce = driver.execute_script(JS_FIND_CE)
-                    chk_ce = res_ce[0] if res_ce else None
-                    if chk_ce:
-                        if "ui-state-active" not in (chk_ce.get_attribute("class") or ""):
-                            driver.execute_script("arguments[0].scrollIntoView({block:'center'});", chk_ce)
-                            time.sleep(0.2)
-                            clicar_js(driver, chk_ce, "Cancela/Exclui outros")
-                            time.sleep(0.4)
-                            chk_ce2 = driver.execute_script(JS_FIND_CE)[0]
-                            if chk_ce2 and "ui-state-active" in (chk_ce2.get_attribute("class") or ""):
-                                log("      ✅ 'Cancela/Exclui transações de outros logins?' marcado.")
-                                houve_alt = True
-                            else:
-                                log("      [AVISO] Checkbox 'Cancela/Exclui' não marcou após clique.")
+    def verificar(self):
+        """Chamado no início de cada médico (ver percorrer). Retorna a lista de itens a refazer (normalmente
+        vazia) ou None se a sessão não pôde ser recuperada (abandona a secretaria)."""
+        if not self.falhas:
+            return []
+        motivo = diagnosticar_sessao(self.driver)
+        if not motivo:
+            if len(self.falhas) < SESSAO_MAX_FALHAS:
+                return []
+            motivo = f"{len(self.falhas)} falhas seguidas"
+        if self.recuperacoes >= SESSAO_MAX_RECUPERACOES:
+            log(f"   [ERRO] {motivo} após {self.recuperacoes} recuperação(ões) — abandonando a secretaria.")
+            _ctx_worker.sessao_perdida = True
+            return None
+        self.recuperacoes += 1
+        if not recuperar_sessao(self.driver, self.secretaria, motivo):
+            _ctx_worker.sessao_perdida = True
+            return None
+        refazer = [x for x in self.falhas if x not in self.refeitos]
+        self.refeitos.update(refazer)
+        self.falhas = []
+        if refazer:
+            log(f"   ♻ Refazendo {len(refazer)} médico(s) que falharam antes da recuperação.")
+        return refazer
 
-                    # --- Vincula logins / marca todos se lista estiver vazia ---
-                    try:
-                        div = WebDriverWait(driver, 5).until(EC.presence_of_element_located((By.CSS_SELECTOR, "div[id$=':escolherLogins']")))
-                        try: div.find_element(By.CSS_SELECTOR, ".ui-selectcheckboxmenu-trigger").click()
-                        except: driver.execute_script("arguments[0].click();", div)
-                        time.sleep(1.0)
-
-                        if lista_logins:
-                            # Pesquisa cada login e marca individualmente
-                            campo = driver.find_element(By.CSS_SELECTOR, "div.ui-selectcheckboxmenu-filter-container input")
-                            for login in lista_logins:
-                                campo.clear()
-                                campo.send_keys(login)
-                                time.sleep(1.0)
-                                try:
-                                    chk = driver.find_element(By.CSS_SELECTOR, "div.ui-selectcheckboxmenu-header .ui-chkbox-box")
-                                    if "ui-state-active" not in chk.get_attribute("class"):
-                                        chk.click()
-                                        houve_alt = True
-                                        log(f"      + Vinculado: {login}")
-                                except: pass
-                        else:
-                            # Sem logins configurados: marca o select-all (header) se não estiver marcado
-                            try:
-                                chk_all = driver.find_element(By.CSS_SELECTOR, "div.ui-selectcheckboxmenu-header .ui-chkbox-box")
-                                if "ui-state-active" not in (chk_all.get_attribute("class") or ""):
-                                    chk_all.click()
-                                    houve_alt = True
-                            except Exception as e:
-                                log(f"      [AVISO] Não encontrou checkbox select-all: {e}")
+# ==============================================================================
+# ENTRADA DE MÉDICOS (LISTA, CSV OU JSONL)
+# ==============================================================================
+# medicos_para_cadastrar / medicos_para_vincular podem ser a lista no próprio dados.json
+# ou o caminho de uma exportação do RH (.csv ou .jsonl). Arquivos são lidos em streaming
+# e em lotes de `lote_medicos`: o que fica em memória é o índice da tela da secretaria
+# (limitado), nunca o arquivo inteiro.
 
-                        try: driver.find_element(By.CSS_SELECTOR, "a.ui-selectcheckboxmenu-close").click()
-                        except: pass
-                        time.sleep(0.5)
-                    except Exception as e:
-                        log(f"      [AVISO] Dropdown escolherLogins não encontrado: {e}")
+COLUNAS_NOME = ("NOME", "MEDICO", "NOME MEDICO", "NOME_MEDICO", "PRESTADOR")
+COLUNAS_SECRETARIA = ("SECRETARIA", "LOGIN SECRETARIA", "LOGIN_SECRETARIA")
 
-                    # --- Salva se houve alteração, cancela caso contrário ---
-                    if houve_alt:
-                        log("      💾 Salvando alterações...")
-                        try:
-                            clicar_js(driver, driver.find_element(By.XPATH, "//form[@id='formServico']//span[text()='Salvar']"), "Salvar")
-                        except Exception as e:
-                            log(f"      [ERRO] Botão Salvar não encontrado: {e}")
-                            fechar_janelas_travadas(driver)
-                    else:
-                        log("      ↩ Sem alterações, cancelando...")
-                        try:
-                            clicar_js(driver, driver.find_element(By.XPATH, "//form[@id='formServico']//span[text()='Cancelar']"), "Cancelar")
-                        except Exception as e:
-                            log(f"      [AVISO] Botão Cancelar não encontrado, usando ESC: {e}")
-                            fechar_janelas_travadas(driver)
-                    esperar_aguarde_sumir(driver)
-                except Exception as e:
-                    log(f"      [ERRO INTERNO] {e}")
-                    fechar_janelas_travadas(driver)
-            except Exception as e:
-                log(f"   [ERRO] Médico {i+1}: {e}")
-                fechar_janelas_travadas(driver)
+def normalizar_nome(texto):
+    """Caixa alta, sem acentos e com espaços colapsados — chave dos índices de médicos."""
+    t = unicodedata.normalize("NFKD", str(texto or ""))
+    return " ".join("".join(c for c in t if not unicodedata.combining(c)).upper().split())
 
-        # Retorna médicos do filtro que não foram encontrados na tela
-        if filtro_medicos is not None:
-            nao_encontrados = [m for m in filtro_medicos if m.upper() not in encontrados]
-            if nao_encontrados:
-                log(f"   [VINCULAR] {len(nao_encontrados)} médico(s) não encontrado(s) na secretaria.")
-            return nao_encontrados
-        return []
-    except: pass
-    return []
+class FonteMedicos:
+    """Lista de médicos vinda do dados.json (lista inline ou arquivo CSV/JSONL).
+    Cada iteração relê o arquivo; linhas com coluna de secretaria valem só para ela."""
 
-# ==============================================================================
-# MODO 2: CADASTRAR SERVIÇOS (Mantido V28)
-# ==============================================================================
+    def __init__(self, valor, base="."):
+        self.lista = None
+        self.caminho = None
+        if isinstance(valor, str) and valor.strip():
+            self.caminho = valor if os.path.isabs(valor) else os.path.join(base, valor)
+        else:
+            self.lista = [m for m in (valor or []) if m]
 
-def selecionar_item_otimizado(driver, nome_medico, timeout=3):
-    nome_upper = nome_medico.upper()
-    xpath = f"//div[contains(@id, 'prestadorFuncionario_panel')]//li[contains(translate(., 'abcdefghijklmnopqrstuvwxyz', 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'), '{nome_upper}')]"
-    try:
-        item = WebDriverWait(driver, timeout).until(EC.visibility_of_element_located((By.XPATH, xpath)))
-        item.click()
-        return True
-    except: return False
+    def __bool__(self):
+        return bool(self.caminho) or bool(self.lista)
 
-def garantir_checkbox(driver, texto_label, tentativas=3):
-    listas = [
-        f"//tr[.//label[contains(text(), '{texto_label}')]]//div[contains(@class, 'ui-chkbox-box')]",
-        f"//label[contains(text(), '{texto_label}')]/..//div[contains(@class, 'ui-chkbox-box')]"
-    ]
-    for xpath in listas:
-        for tentativa in range(tentativas):
-            try:
-                chk = WebDriverWait(driver, 4).until(EC.element_to_be_clickable((By.XPATH, xpath)))
-                classes = chk.get_attribute("class") or ""
-                if "ui-state-active" in classes:
-                    return True  # já estava marcado
-                driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", chk)
-                time.sleep(0.2)
-                clicar_js(driver, chk, texto_label)
-                time.sleep(0.4)
-                # Verifica se foi realmente marcado
-                chk_apos = driver.find_element(By.XPATH, xpath)
-                if "ui-state-active" in (chk_apos.get_attribute("class") or ""):
-                    return True
-                log(f"   [RETRY {tentativa+1}/{tentativas}] Checkbox '{texto_label}' não marcou, tentando novamente...")
-                time.sleep(0.3)
-            except:
-                time.sleep(0.3)
-                continue
-    log(f"   [AVISO] Não foi possível marcar checkbox '{texto_label}' após {tentativas} tentativas.")
-    return False
+    def __str__(self):
+        return os.path.basename(self.caminho) if self.caminho else f"{len(self.lista)} médico(s)"
 
-def executar_logica_cadastrar_servicos(driver, medicos):
-    global solicitar_finalizacao
-    log(f"   [CADASTRAR] Iniciando lista de {len(medicos)} médicos...")
-    modal_aberto = False
-    cadastrados_agora = []
-    
-    for index, nome_medico in enumerate(medicos):
-        if solicitar_finalizacao:
-            log("🛑 Processo interrompido pelo usuário")
-            if modal_aberto:
-                try:
-                    btn_cancelar = driver.find_element(By.XPATH, "//form[@id='formServico']//span[text()='Cancelar']")
-                    clicar_js(driver, btn_cancelar, "Cancelar Modal")
-                    esperar_aguarde_sumir(driver)
-                except: fechar_janelas_travadas(driver)
+    def _registros(self):
+        """(nome, secretaria ou None) na ordem do arquivo."""
+        if self.lista is not None:
+            for m in self.lista:
+                yield m, None
             return
-        log(f"   --- [{index+1}/{len(medicos)}] {nome_medico} ---")
-        if ui: ui.status(medico=nome_medico, progresso=f"{index+1} / {len(medicos)}")
-        checar_pausa()
-        try:
-            if not modal_aberto:
-                try:
-                    btn_criar = WebDriverWait(driver, 5).until(EC.element_to_be_clickable((By.XPATH, "//button[span[text()='Criar Serviço']]")))
-                    clicar_js(driver, btn_criar, "Criar Serviço")
-                    esperar_aguarde_sumir(driver)
-                    modal_aberto = True
-                except:
-                    log("      [ERRO] Não consegui abrir o modal 'Criar Serviço'.")
-                    continue
+        with open(self.caminho, "r", encoding="utf-8-sig", errors="replace", newline="") as f:
+            if self.caminho.lower().endswith((".jsonl", ".ndjson")):
+                for linha in f:
+                    try: reg = json.loads(linha)
+                    except ValueError: continue
+                    if isinstance(reg, str):
+                        yield reg, None
+                    elif isinstance(reg, dict):
+                        reg = {normalizar_nome(k): v for k, v in reg.items()}
+                        nome = next((reg[c] for c in COLUNAS_NOME if reg.get(c)), None)
+                        yield nome, next((reg[c] for c in COLUNAS_SECRETARIA if reg.get(c)), None)
+                return
+            amostra = f.read(4096)
+            f.seek(0)
+            try: dialeto = csv.Sniffer().sniff(amostra, delimiters=";,\t|")
+            except csv.Error: dialeto = csv.excel
+            leitor = csv.reader(f, dialeto)
+            cabecalho = [normalizar_nome(c) for c in next(leitor, [])]
+            i_nome = next((cabecalho.index(c) for c in COLUNAS_NOME if c in cabecalho), None)
+            i_sec = next((cabecalho.index(c) for c in COLUNAS_SECRETARIA if c in cabecalho), None)
+            if i_nome is None:   # sem cabeçalho conhecido: primeira coluna é o nome
+                f.seek(0)
+                leitor, i_nome = csv.reader(f, dialeto), 0
+            for row in leitor:
+                if len(row) > i_nome:
+                    yield row[i_nome], (row[i_sec] if i_sec is not None and len(row) > i_sec else None)
 
-            try:
-                driver.find_element(By.CSS_SELECTOR, "div[id$=':prestadorFuncionario'] .ui-selectonemenu-trigger").click()
-                campo_filtro = WebDriverWait(driver, 3).until(EC.visibility_of_element_located((By.CSS_SELECTOR, "div[id$=':prestadorFuncionario_panel'] input")))
-                campo_filtro.clear()
-                campo_filtro.send_keys(nome_medico.upper())
-                time.sleep(1.0)
-                
-                encontrou = selecionar_item_otimizado(driver, nome_medico, timeout=3)
-                if not encontrou:
-                    log("      [JÁ CADASTRADO] Médico não apareceu na lista.")
-                    try: driver.find_element(By.TAG_NAME, 'body').click() 
-                    except: pass
-                    continue 
+    def para(self, secretaria=None):
+        """Nomes que valem para `secretaria` (sem coluna de secretaria = todas). A coluna é
+        comparada sem diferença de caixa, acentos e espaços ("77.HU_Sec001 " = "77.hu_sec001")."""
+        alvo = normalizar_nome(secretaria) if secretaria is not None else None
+        for nome, sec in self._registros():
+            nome = (nome or "").strip()
+            if nome and (not sec or alvo is None or normalizar_nome(sec) == alvo):
+                yield nome
 
-                try: WebDriverWait(driver, 10).until(EC.visibility_of_element_located((By.CSS_SELECTOR, "div.ui-datatable")))
-                except: pass
-                time.sleep(0.6)  # aguarda checkboxes renderizarem após o datatable
-
-                garantir_checkbox(driver, "Visualiza transações")
-
-                # Garante "Cancela/Exclui transações de outros logins?" via JS (mais confiável)
-                JS_FIND_CE = """
-                    var form = document.getElementById('formServico');
-                    if (!form) return [null, ''];
-                    var labels = form.querySelectorAll('label');
-                    for (var lbl of labels) {
-                        var txt = (lbl.textContent || '').trim();
-                        if (txt.indexOf('Cancela') >= 0 && txt.indexOf('outros') >= 0) {
-                            var parent = lbl.parentElement;
-                            if (parent) {
-                                var box = parent.querySelector('.ui-chkbox-box');
-                                if (box) return [box, txt];
-                            }
-                            if (parent && parent.previousElementSibling) {
-                                var box = parent.previousElementSibling.querySelector('.ui-chkbox-box');
-                                if (box) return [box, txt];
-                            }
-                        }
-                    }
-                    return [null, 'nao encontrado'];
-                """
-                res_ce = driver.execute_script(JS_FIND_CE)
-                chk_ce = res_ce[0] if res_ce else None
-                if chk_ce:
-                    if "ui-state-active" not in (chk_ce.get_attribute("class") or ""):
-                        driver.execute_script("arguments[0].scrollIntoView({block:'center'});", chk_ce)
-                        time.sleep(0.2)
-                        clicar_js(driver, chk_ce, "Cancela/Exclui outros")
-                        time.sleep(0.4)
-                        chk_ce2 = driver.execute_script(JS_FIND_CE)[0]
-                        if chk_ce2 and "ui-state-active" in (chk_ce2.get_attribute("class") or ""):
-                            log("      ✅ 'Cancela/Exclui transações de outros logins?' marcado.")
-                        else:
-                            log("      [AVISO] Checkbox 'Cancela/Exclui' não marcou após clique.")
-                else:
-                    log("      [AVISO] Checkbox 'Cancela/Exclui' não encontrado.")
-                
-                try:
-                    chk_todas = driver.find_element(By.XPATH, "//div[contains(@class, 'ui-datatable-scrollable-header')]//div[contains(@class, 'ui-chkbox-box')]")
-                    if "ui-state-active" not in chk_todas.get_attribute("class"):
-                        clicar_js(driver, chk_todas, "Check Todas")
-                except: pass
-                
-                btn_salvar = driver.find_element(By.XPATH, "//span[text()='Salvar']")
-                clicar_js(driver, btn_salvar, "Salvar")
-                esperar_aguarde_sumir(driver)
-                log("      -> Sucesso (Cadastrado).")
-                cadastrados_agora.append(nome_medico)
-                modal_aberto = False
-                
-            except Exception as e:
-                log(f"      [ERRO INTERNO] {e}")
-                fechar_janelas_travadas(driver)
-                modal_aberto = False
+    def lotes(self, secretaria=None, tamanho=None):
+        """Mesmos nomes de `para`, agrupados em listas de até `tamanho` (lote_medicos)."""
+        lote = []
+        for nome in self.para(secretaria):
+            lote.append(nome)
+            if len(lote) >= (tamanho or LOTE_MEDICOS):
+                yield lote
+                lote = []
+        if lote:
+            yield lote
 
-        except Exception as e:
-            log(f"      [ERRO CRÍTICO] {e}")
-            fechar_janelas_travadas(driver)
-            modal_aberto = False
+def indexar_palavras(textos):
+    """Índice sequência de palavras normalizada -> posições dos textos que a contêm.
+    Cada nome procurado vira uma consulta O(1), em vez de varrer todos os textos."""
+    indice = {}
+    for i, texto in enumerate(textos):
+        palavras = normalizar_nome(texto).split()
+        for a in range(len(palavras)):
+            for b in range(a + 1, len(palavras) + 1):
+                indice.setdefault(" ".join(palavras[a:b]), set()).add(i)
+    return indice
 
-    if modal_aberto:
-        log("   Finalizando lista, fechando modal restante...")
-        try:
-            btn_cancelar = driver.find_element(By.XPATH, "//form[@id='formServico']//span[text()='Cancelar']")
-            clicar_js(driver, btn_cancelar, "Cancelar Modal Final")
-            esperar_aguarde_sumir(driver)
-        except: fechar_janelas_travadas(driver)
-    return cadastrados_agora
+PARTICULAS_NOME = {"DA", "DAS", "DE", "DI", "DO", "DOS", "DU", "E"}
 
-# ==============================================================================
-# MAIN
-# ==============================================================================
+def distancia_edicao(a, b, limite):
+    """Levenshtein com corte: devolve limite + 1 assim que a distância passa do limite."""
+    if abs(len(a) - len(b)) > limite:
+        return limite + 1
+    anterior = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        atual = [i]
+        for j, cb in enumerate(b, 1):
+            atual.append(min(anterior[j] + 1, atual[j - 1] + 1, anterior[j - 1] + (ca != cb)))
+        if min(atual) > limite:
+            return limite + 1
+        anterior = atual
+    return anterior[-1]
+
+def _palavras_nome(chave):
+    """Palavras significativas de um nome já normalizado (sem partículas nem pontuação)."""
+    palavras = [p.strip(".,;-'") for p in chave.split()]
+    return [p for p in palavras if p and p not in PARTICULAS_NOME]
+
+def _abreviacao_casa(curto, longo):
+    """True se cada palavra de `curto` casa, na ordem, com uma de `longo`: igual ou
+    inicial/abreviação ('J', 'J.', 'CONC.'). Palavras do meio de `longo` podem faltar."""
+    j = 0
+    for p in curto:
+        while j < len(longo) and not (longo[j] == p or (len(p) < len(longo[j]) and longo[j].startswith(p))):
+            j += 1
+        if j == len(longo):
+            return False
+        j += 1
+    return True
+
+class IndiceNomes:
+    """Índice dos nomes de uma secretaria (linhas da tabela ou lista de prestadores),
+    montado uma vez e consultado para cada nome procurado. Camadas, da mais para a menos
+    confiável — as seguintes só rodam se as anteriores não acharam nada:
+    exato (1.0) > contém as palavras em sequência (0.95) > mesmas palavras em outra
+    ordem (0.9) > abreviações/iniciais (0.85) > aproximado por distância de edição."""
+
+    CAMADAS_MULTIPLAS = ("exato", "contem", "ordem")   # empate aqui = várias linhas do mesmo nome
+
+    @staticmethod
+    def revisar(camada):
+        """True se o casamento não deve ser usado sem revisão: ambíguo ou, sem
+        aceitar_nomes_aproximados, abreviado/aproximado (o nome vizinho pode ser de outro médico)."""
+        if camada is None or camada in IndiceNomes.CAMADAS_MULTIPLAS:
+            return False
+        return camada == "ambiguo" or not ACEITAR_NOMES_APROXIMADOS
+
+    def __init__(self, nomes, textos=None, similaridade=None):
+        self.nomes = list(nomes)
+        self.similaridade = similaridade or SIMILARIDADE_NOMES
+        self._exato, self._ordenado, self._por_palavra, self._por_prefixo = {}, {}, {}, {}
+        self._palavras = []
+        for i, nome in enumerate(self.nomes):
+            chave = normalizar_nome(nome)
+            palavras = _palavras_nome(chave)
+            self._palavras.append(palavras)
+            self._exato.setdefault(chave, []).append(i)
+            self._ordenado.setdefault(" ".join(sorted(palavras)), []).append(i)
+            for p in set(palavras):
+                self._por_palavra.setdefault(p, set()).add(i)
+                self._por_prefixo.setdefault(p[:3], set()).add(i)
+        self._contem = indexar_palavras(textos if textos is not None else self.nomes)
+
+    def buscar(self, nome, limite=5):
+        """Candidatos ordenados: [(posição, nota, camada)], melhor primeiro."""
+        chave = normalizar_nome(nome)
+        palavras = _palavras_nome(chave)
+        if not palavras:
+            return []
+        achados = {}
+        def _somar(posicoes, nota, camada):
+            for i in posicoes:
+                if achados.get(i, (0.0,))[0] < nota:
+                    achados[i] = (nota, camada)
+        _somar(self._exato.get(chave, ()), 1.0, "exato")
+        _somar(self._contem.get(chave, ()), 0.95, "contem")
+        _somar(self._ordenado.get(" ".join(sorted(palavras)), ()), 0.9, "ordem")
+        if not achados:
+            # candidatos: linhas com todas as palavras inteiras conhecidas da consulta
+            conhecidas = [self._por_palavra[p] for p in palavras if p in self._por_palavra]
+            candidatos = set.intersection(*conhecidas) if conhecidas else set()
+            _somar((i for i in candidatos
+                    if _abreviacao_casa(palavras, self._palavras[i])
+                    or (any(len(p) == 1 for p in self._palavras[i]) and _abreviacao_casa(self._palavras[i], palavras))),
+                   0.85, "abreviado")
+        if not achados:
+            # candidatos: os que mais compartilham prefixos de palavra; prefixos muito
+            # comuns (SILVA, SANTOS...) só contam se forem tudo o que a consulta tem
+            alvo = " ".join(sorted(palavras))
+            listas = sorted((self._por_prefixo.get(p[:3], set()) for p in set(palavras)), key=len)
+            teto = max(50, len(self.nomes) // 10)
+            contagem = Counter()
+            for posicoes in [l for l in listas if len(l) <= teto] or listas[:1]:
+                contagem.update(posicoes)
+            for i, _ in contagem.most_common(20):
+                outro = " ".join(sorted(self._palavras[i]))
+                maior = max(len(alvo), len(outro))
+                corte = int((1 - self.similaridade) * maior)
+                dist = distancia_edicao(alvo, outro, corte)
+                if dist <= corte:
+                    _somar((i,), round(1 - dist / maior, 3), "aproximado")
+        ranking = sorted(achados.items(), key=lambda kv: (-kv[1][0], kv[0]))
+        return [(i, nota, camada) for i, (nota, camada) in ranking[:limite]]
+
+    def correspondencia(self, nome):
+        """(posições, nota, camada) do melhor casamento; camada None se nada casou e
+        "ambiguo" se dois nomes diferentes empataram numa camada aproximada."""
+        ranking = self.buscar(nome, limite=len(self.nomes) or 1)
+        if not ranking:
+            return [], 0.0, None
+        _, nota, camada = ranking[0]
+        empatados = [i for i, n, _ in ranking if n == nota]
+        if camada in self.CAMADAS_MULTIPLAS:
+            return empatados, nota, camada
+        if len({normalizar_nome(self.nomes[i]) for i in empatados}) > 1:
+            return empatados, nota, "ambiguo"
+        return empatados, nota, camada
+
+    def descrever(self, nome, posicoes, nota, camada):
+        """Linha de log para casamentos fora das camadas exatas."""
+        alvos = ", ".join(f"'{self.nomes[i]}'" for i in posicoes[:3])
+        if camada == "ambiguo":
+            return f"      [AVISO] '{nome}' é ambíguo ({nota:.2f}): {alvos}. Revise o nome na entrada."
+        if self.revisar(camada):
+            return f"      [REVISAR] '{nome}' ≈ {alvos} ({camada}, {nota:.2f}): não processado. Revise o nome na entrada."
+        return f"      [APROX] '{nome}' ≈ {alvos} ({camada}, {nota:.2f})"
+
+def fonte_medicos(valor, base="."):
+    """Aceita FonteMedicos, lista ou caminho de arquivo."""
+    return valor if isinstance(valor, FonteMedicos) else FonteMedicos(valor, base)
+
+def carregar_dados(caminho):
+    """carregar_json do dados.json, com as listas de médicos convertidas em FonteMedicos
+    (caminhos relativos à pasta do dados.json)."""
+    dados = carregar_json(caminho)
+    if not isinstance(dados, dict):
+        return dados
+    base = os.path.dirname(os.path.abspath(caminho))
+    for chave in ("medicos_para_cadastrar", "medicos_para_vincular"):
+        dados[chave] = fonte_medicos(dados.get(chave), base)
+        if dados[chave].caminho and not os.path.exists(dados[chave].caminho):
+            log(f"[ERRO] Arquivo de médicos não encontrado: {dados[chave].caminho}")
+            return None
+    return dados
+
+# ==============================================================================
+# JOURNAL (CHECKPOINT / RETOMADA)
+# ==============================================================================
+
+MODOS = {'1': "vincular", '2': "cadastrar"}
+
+class JournalExecucao:
+    """Journal append-only (JSONL) com o resultado de cada (modo, secretaria, médico).
+
+    Cada execução começa com um evento "inicio" com id próprio; a retomada relê apenas
+    os registros da última execução daquele modo. O fsync é feito em lote (a cada
+    `lote` registros ou `intervalo` segundos) para não pesar no loop principal.
+    """
+    # Status que não precisam ser refeitos numa retomada ("erro" é sempre refeito)
+    CONCLUIDOS = {"vinculado", "sem_alteracao", "cadastrado", "ja_cadastrado", "inativo", "secretaria_concluida"}
+
+    def __init__(self, caminho, lote=20, intervalo=2.0):
+        self.caminho = caminho
+        self.lote = lote
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        self._arquivo = None
+        self._pendentes = 0
+        self._ultimo_sync = time.monotonic()
+
+    def _gravar(self, registro):
+        linha = json.dumps(registro, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._arquivo is None:
+                os.makedirs(os.path.dirname(self.caminho) or ".", exist_ok=True)
+                self._arquivo = open(self.caminho, "a", encoding="utf-8")
+            self._arquivo.write(linha)
+            self._pendentes += 1
+            if self._pendentes >= self.lote or time.monotonic() - self._ultimo_sync >= self.intervalo:
+                self._sincronizar()
+
+    def _sincronizar(self):
+        self._arquivo.flush()
+        os.fsync(self._arquivo.fileno())
+        self._pendentes = 0
+        self._ultimo_sync = time.monotonic()
+
+    def sincronizar(self):
+        with self._lock:
+            if self._arquivo is not None and self._pendentes:
+                self._sincronizar()
+
+    def iniciar(self, id_execucao, modo):
+        self._gravar({"ts": datetime.now().isoformat(timespec="seconds"), "evento": "inicio",
+                      "exec": id_execucao, "modo": modo})
+
+    def registrar(self, id_execucao, modo, secretaria, medico, status, detalhe=""):
+        reg = {"ts": datetime.now().isoformat(timespec="seconds"), "exec": id_execucao,
+               "modo": modo, "sec": secretaria, "medico": medico, "status": status}
+        if detalhe:
+            reg["detalhe"] = str(detalhe)[:300]
+        self._gravar(reg)
+
+    def ultima_execucao(self, modo):
+        """Retorna (id, {(modo, sec, medico): status mais recente}) da última execução do modo."""
+        self.sincronizar()
+        if not os.path.exists(self.caminho):
+            return None, {}
+        id_exec, estado = None, {}
+        with open(self.caminho, "r", encoding="utf-8") as f:
+            for linha in f:
+                try: reg = json.loads(linha)
+                except ValueError: continue  # última linha truncada por queda
+                if reg.get("evento") == "inicio":
+                    if reg.get("modo") == modo:
+                        id_exec, estado = reg.get("exec"), {}
+                elif id_exec is not None and reg.get("exec") == id_exec:
+                    estado[(reg.get("modo"), reg.get("sec"), reg.get("medico"))] = reg.get("status")
+        return id_exec, estado
+
+journal = JournalExecucao(ARQUIVO_JOURNAL)
+# execução corrente, estado da retomada, totais e médicos com erro pendente por secretaria
+# (inclui o auto-cadastro feito dentro do Vincular)
+_execucao = {"id": None, "retomada": {}, "contagem": Counter(), "falhas": {}}
+_contagem_lock = threading.Lock()
+
+def _chave_medico(nome):
+    return normalizar_nome(nome) or None
+
+def iniciar_execucao(modo, retomar=False):
+    """Abre uma execução no journal. Na retomada reaproveita o id da última execução
+    do modo e carrega o que já foi concluído."""
+    _execucao["contagem"] = Counter()
+    _execucao["falhas"] = {}
+    resultados.iniciar(None, modo)
+    if retomar:
+        id_exec, estado = journal.ultima_execucao(modo)
+        if id_exec:
+            _execucao.update(id=id_exec, retomada=estado)
+            resultados.id = id_exec
+            feitos = sum(1 for k, st in estado.items() if k[2] and st in JournalExecucao.CONCLUIDOS)
+            log(f"♻ [RETOMADA] Execução {id_exec}: {feitos} médico(s) já concluído(s) serão pulados.")
+            return
+        log("[AVISO] Nenhuma execução anterior encontrada no journal — iniciando do zero.")
+    id_exec = datetime.now().strftime("%Y%m%d-%H%M%S")
+    _execucao.update(id=id_exec, retomada={})
+    resultados.id = id_exec
+    journal.iniciar(id_exec, modo)
+
+def registrar_resultado(modo, secretaria, medico, status, detalhe=""):
+    journal.registrar(_execucao["id"], modo, secretaria, _chave_medico(medico), status, detalhe)
+    duracao = None
+    if medico:
+        duracao = registrar_span_medico(modo, status)
+        vigia = getattr(_ctx_worker, "vigia", None)
+        if vigia:
+            vigia.resultado(status)
+    with _contagem_lock:
+        if medico:
+            chave = status
+        else:
+            chave = "secretarias_concluidas" if status == "secretaria_concluida" else f"secretarias_{status}"
+        _execucao["contagem"][chave] += 1
+        if medico:   # um médico refeito com sucesso (vigia, fallback do motor HTTP) deixa de contar
+            falhas = _execucao["falhas"].setdefault(secretaria, set())
+            if status == "erro":
+                falhas.add((modo, _chave_medico(medico)))
+            elif status in JournalExecucao.CONCLUIDOS:
+                falhas.discard((modo, _chave_medico(medico)))
+    resultados.registrar(modo, secretaria, medico, status, detalhe, duracao)
+
+def concluir_secretaria(modo, secretaria):
+    """Registra secretaria_concluida só se nenhum médico dela ficou com erro nesta
+    execução — senão a retomada pularia a secretaria inteira e os erros nunca seriam refeitos."""
+    with _contagem_lock:
+        falhas = len(_execucao["falhas"].get(secretaria, ()))
+    if falhas:
+        log(f"   [AVISO] {falhas} médico(s) com erro em '{secretaria}': a secretaria fica para a retomada.")
+    else:
+        registrar_resultado(modo, secretaria, None, "secretaria_concluida")
+
+def ja_concluido(modo, secretaria, medico=None):
+    """True se o item foi concluído na execução que está sendo retomada."""
+    return _execucao["retomada"].get((modo, secretaria, _chave_medico(medico))) in JournalExecucao.CONCLUIDOS
+
+# ==============================================================================
+# RESULTADOS (RELATÓRIOS POR EXECUÇÃO)
+# ==============================================================================
+# Resultado e tempo de cada médico/secretaria da execução corrente. Ao final de cada
+# ciclo vira estado_autotiss/resultados/<início>-<modo>.csv (uma linha por médico) e
+# .json (contagem por status, duração por secretaria, médicos/hora por worker e por
+# hora do dia) — base para dimensionar workers e janelas de execução.
+
+class ResultadosExecucao:
+    CAMPOS_CSV = ("ts", "modo", "secretaria", "medico", "status", "duracao_s", "worker", "detalhe")
+    ALTERACOES = ("vinculado", "cadastrado")
+
+    def __init__(self, pasta, ativo=True):
+        self.pasta = pasta
+        self.ativo = ativo
+        self._lock = threading.Lock()
+        self.iniciar(None, None)
+
+    def iniciar(self, id_execucao, modo):
+        with self._lock:
+            self.id, self.modo, self.inicio = id_execucao, modo, time.time()
+            self.medicos = []
+            self.secretarias = {}   # {sec: {"inicio", "fim", "status"}}
+
+    def iniciar_secretaria(self, secretaria):
+        with self._lock:
+            self.secretarias.setdefault(secretaria, {"inicio": time.time(), "fim": None, "status": None})
+
+    def registrar(self, modo, secretaria, medico, status, detalhe="", duracao=None):
+        agora = time.time()
+        with self._lock:
+            if medico:
+                self.medicos.append({"ts": agora, "modo": modo, "secretaria": secretaria, "medico": medico,
+                                     "status": status, "duracao_s": round(duracao, 3) if duracao is not None else None,
+                                     "worker": getattr(_ctx_worker, "nome", None) or "", "detalhe": str(detalhe or "")[:300]})
+            elif secretaria:
+                sec = self.secretarias.setdefault(secretaria, {"inicio": agora, "fim": None, "status": None})
+                sec.update(fim=agora, status=status)
+
+    @staticmethod
+    def _por_hora(n, segundos):
+        return round(n / segundos * 3600, 1) if segundos > 0 else 0.0
+
+    def resumo(self):
+        with self._lock:
+            medicos, secretarias, inicio = list(self.medicos), dict(self.secretarias), self.inicio
+        fim = time.time()
+        duracao = fim - inicio
+        tempos = [m["duracao_s"] for m in medicos if m["duracao_s"] is not None]
+        por_sec, por_worker, por_hora = {}, {}, {}
+        for m in medicos:
+            s = por_sec.setdefault(m["secretaria"], {"medicos": 0, "por_status": Counter()})
+            s["medicos"] += 1
+            s["por_status"][m["status"]] += 1
+            w = por_worker.setdefault(m["worker"] or "principal", {"medicos": 0, "alterados": 0})
+            w["medicos"] += 1
+            w["alterados"] += m["status"] in self.ALTERACOES
+            h = por_hora.setdefault(datetime.fromtimestamp(m["ts"]).strftime("%H"), {"medicos": 0, "soma_s": 0.0})
+            h["medicos"] += 1
+            h["soma_s"] += m["duracao_s"] or 0.0
+        for sec, info in secretarias.items():
+            s = por_sec.setdefault(sec, {"medicos": 0, "por_status": Counter()})
+            dur = (info["fim"] or fim) - info["inicio"]
+            s.update(status=info["status"], duracao_s=round(dur, 1), medicos_por_hora=self._por_hora(s["medicos"], dur))
+        for s in por_sec.values():
+            s["por_status"] = dict(s["por_status"])
+        for w in por_worker.values():
+            w["medicos_por_hora"] = self._por_hora(w["medicos"], duracao)
+        alterados = sum(1 for m in medicos if m["status"] in self.ALTERACOES)
+        return {
+            "execucao": self.id,
+            "modo": self.modo,
+            "inicio": datetime.fromtimestamp(inicio).isoformat(timespec="seconds"),
+            "fim": datetime.fromtimestamp(fim).isoformat(timespec="seconds"),
+            "duracao_s": round(duracao, 1),
+            "workers": NUM_WORKERS,
+            "medicos": len(medicos),
+            "medicos_por_hora": self._por_hora(len(medicos), duracao),
+            "alterados_por_hora": self._por_hora(alterados, duracao),
+            "por_status": dict(Counter(m["status"] for m in medicos)),
+            "duracao_medico_s": {"p50": round(percentil(tempos, 50), 2), "p95": round(percentil(tempos, 95), 2),
+                                 "media": round(sum(tempos) / len(tempos), 2) if tempos else 0.0},
+            "secretarias": por_sec,
+            "por_worker": por_worker,
+            "por_hora_do_dia": {h: {"medicos": v["medicos"], "duracao_media_s": round(v["soma_s"] / v["medicos"], 2)}
+                                for h, v in sorted(por_hora.items())},
+        }
+
+    def exportar(self, extra=None):
+        """Grava CSV + JSON da execução corrente. Retorna (csv, json) ou None."""
+        if not self.ativo or not self.modo:
+            return None
+        resumo = self.resumo()
+        if extra:
+            resumo["ciclo"] = extra
+        base = os.path.join(self.pasta, f"{datetime.fromtimestamp(self.inicio).strftime('%Y%m%d-%H%M%S')}-{self.modo}")
+        with self._lock:
+            linhas = list(self.medicos)
+        try:
+            os.makedirs(self.pasta, exist_ok=True)
+            with open(base + ".csv", "w", encoding="utf-8-sig", newline="") as f:
+                escritor = csv.DictWriter(f, self.CAMPOS_CSV, delimiter=";")
+                escritor.writeheader()
+                for m in linhas:
+                    escritor.writerow(dict(m, ts=datetime.fromtimestamp(m["ts"]).isoformat(timespec="seconds")))
+            with open(base + ".json", "w", encoding="utf-8") as f:
+                json.dump(resumo, f, ensure_ascii=False, indent=1)
+        except OSError as e:
+            log(f"[AVISO] Não foi possível gravar o relatório da execução: {e}")
+            return None
+        log(f"📊 [RELATÓRIO] {resumo['medicos']} médico(s) em {resumo['duracao_s'] / 60:.1f} min "
+            f"({resumo['medicos_por_hora']}/h) → {base}.csv / .json")
+        return base + ".csv", base + ".json"
+
+resultados = ResultadosExecucao(PASTA_RESULTADOS, RELATORIOS_ATIVOS)
+
+# ==============================================================================
+# CACHE DE ESTADO DO VÍNCULO (IDEMPOTÊNCIA)
+# ==============================================================================
+
+class CacheEstadoVinculo:
+    """Último estado verificado de cada (secretaria, médico) no Vincular: checkboxes
+    'Visualiza'/'Cancela' e logins vinculados. Médicos já completos para o alvo atual
+    são pulados sem abrir o modal.
+
+    Invalidação: TTL (`cache_ttl_horas`), erro no médico, e uma varredura completa
+    (sem consultar o cache, só gravando) a cada `cache_verificar_a_cada` passadas.
+    """
+
+    def __init__(self, caminho, ttl_horas, verificar_a_cada):
+        self.caminho = caminho
+        self.ttl = float(ttl_horas or 0) * 3600
+        self.verificar_a_cada = int(verificar_a_cada or 0)
+        self._lock = threading.Lock()
+        self._alterado = False
+        self.varredura = False   # True durante uma passada de verificação
+        dados = carregar_json(caminho) or {}
+        self._entradas = dados.get("entradas", {})
+        self._passadas = dados.get("passadas_desde_verificacao", 0)
+
+    @staticmethod
+    def _chave(secretaria, medico):
+        return f"{secretaria}|{_chave_medico(medico)}"
+
+    @staticmethod
+    def _cobre(entrada, lista_logins):
+        """Completo = cada login alvo tem opção marcada e nenhuma opção que casa com ele
+        ficou desmarcada (o Vincular marca todas as que casam: 'joao' não é coberto só por 'joao2')."""
+        if not (entrada.get("viz") and entrada.get("ce")):
+            return False
+        if not lista_logins:
+            return bool(entrada.get("todos"))
+        vinculados, desmarcados = entrada.get("logins", []), entrada.get("desmarcados")
+        if desmarcados is None:   # entrada gravada sem as opções desmarcadas: confere no NTISS
+            return False
+        return all(any(login_corresponde(v, login) for v in vinculados)
+                   and not any(login_corresponde(d, login) for d in desmarcados) for login in lista_logins)
+
+    def iniciar_passada(self):
+        """Conta uma passada do Vincular; a cada N passadas faz uma varredura de verificação."""
+        with self._lock:
+            self._passadas += 1
+            self.varredura = bool(self.verificar_a_cada) and self._passadas >= self.verificar_a_cada
+            if self.varredura:
+                self._passadas = 0
+            self._alterado = True
+        if self.ttl and self.varredura:
+            log("🔎 [CACHE] Passada de verificação: todos os médicos serão conferidos.")
+
+    def completo(self, secretaria, medico, lista_logins):
+        if not self.ttl or self.varredura:
+            return False
+        with self._lock:
+            entrada = self._entradas.get(self._chave(secretaria, medico))
+        if not entrada or time.time() - entrada.get("ts", 0) > self.ttl:
+            return False
+        return self._cobre(entrada, lista_logins)
+
+    def atualizar(self, secretaria, medico, viz, ce, logins, desmarcados):
+        with self._lock:
+            self._entradas[self._chave(secretaria, medico)] = {
+                "viz": bool(viz), "ce": bool(ce), "logins": sorted(logins or []),
+                "desmarcados": sorted(desmarcados or []), "todos": bool(logins) and not desmarcados,
+                "ts": time.time(),
+            }
+            self._alterado = True
+
+    def invalidar(self, secretaria, medico):
+        with self._lock:
+            if self._entradas.pop(self._chave(secretaria, medico), None) is not None:
+                self._alterado = True
+
+    def salvar(self):
+        with self._lock:
+            if not self._alterado:
+                return
+            agora = time.time()
+            if self.ttl:  # descarta entradas vencidas
+                self._entradas = {k: v for k, v in self._entradas.items() if agora - v.get("ts", 0) <= self.ttl}
+            conteudo = {"passadas_desde_verificacao": self._passadas, "entradas": self._entradas}
+            self._alterado = False
+        try:
+            os.makedirs(os.path.dirname(self.caminho) or ".", exist_ok=True)
+            tmp = self.caminho + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(conteudo, f, ensure_ascii=False)
+            os.replace(tmp, self.caminho)
+        except Exception as e:
+            log(f"[AVISO] Não foi possível salvar o cache de vínculos: {e}")
+
+cache_vinculos = CacheEstadoVinculo(ARQUIVO_CACHE_VINCULOS, CACHE_TTL_HORAS, CACHE_VERIFICAR_A_CADA)
+
+def login_corresponde(rotulo, login):
+    """Regra de casamento login × opção do escolherLogins (ver FILTRO_LOGINS_MODO)."""
+    r, l = rotulo.upper(), login.upper()
+    return l in r if FILTRO_LOGINS_MODO == "contains" else r.startswith(l)
+
+# ==============================================================================
+# MODO 1: VINCULAR (Mantido V28)
+# ==============================================================================
+
+# A tabela de médicos é o primeiro datatable do PrimeFaces com linhas (tr[data-ri]) que
+# têm lápis; o lápis de "Dados da secretaria", numa tabela à parte, fica de fora. Sem
+# datatable, vale a tabela do primeiro lápis. Os JS abaixo começam por este localizador.
+JS_TABELA_MEDICOS = """
+    function tabelaMedicos() {
+        var tabelas = document.querySelectorAll('div.ui-datatable');
+        for (var t = 0; t < tabelas.length; t++)
+            if (tabelas[t].querySelector("tr[data-ri] img[title='Alterar']")) return tabelas[t];
+        var primeiro = document.querySelector("img[title='Alterar']");
+        return primeiro ? primeiro.closest('table') : null;
+    }
+"""
+
+# Lê a página corrente da tabela de médicos em uma única chamada: índice, nome (1ª célula),
+# status ativo/inativo (mesma regra dos ícones inativar/ativar ou "Sim" na linha), texto
+# da linha e a chave da linha (data-rk/data-ri) para re-localizar o lápis depois.
+JS_SNAPSHOT_MEDICOS = JS_TABELA_MEDICOS + """
+    function visivel(el) { return el.getClientRects().length > 0 && getComputedStyle(el).visibility !== 'hidden'; }
+    var tabela = tabelaMedicos();
+    var botoes = tabela ? tabela.querySelectorAll("img[title='Alterar']") : [];
+    var linhas = [];
+    for (var i = 0; i < botoes.length; i++) {
+        var tr = botoes[i].closest('tr');
+        var linha = {indice: i, nome: '', ativo: true, texto: '', chave: null};
+        if (tr) {
+            var td = tr.querySelector('td');
+            linha.nome = td ? (td.innerText || '').trim() : '';
+            linha.texto = tr.innerText || '';
+            linha.chave = tr.getAttribute('data-rk') || tr.getAttribute('data-ri');
+            var imgs = tr.querySelectorAll("img[src*='ativar.png']");
+            var inativar = false, ativar = false;
+            for (var j = 0; j < imgs.length; j++) {
+                if (!visivel(imgs[j])) continue;
+                if (imgs[j].src.indexOf('inativar.png') >= 0) inativar = true; else ativar = true;
+            }
+            linha.ativo = inativar ? true : (ativar ? false : linha.texto.indexOf('Sim') >= 0);
+        }
+        linhas.push(linha);
+    }
+    return linhas;
+"""
+
+# Re-localiza o lápis de uma linha do snapshot na página corrente: pela chave (data-rk),
+# estável entre páginas e re-renderizações; sem chave, pelo nome.
+JS_BOTAO_MEDICO = JS_TABELA_MEDICOS + """
+    var chave = arguments[0], nome = arguments[1];
+    var tabela = tabelaMedicos();
+    var botoes = tabela ? tabela.querySelectorAll("img[title='Alterar']") : [];
+    for (var i = 0; i < botoes.length; i++) {
+        var tr = botoes[i].closest('tr'), td = tr && tr.querySelector('td');
+        if (chave) {
+            if (tr && (tr.getAttribute('data-rk') || tr.getAttribute('data-ri')) === chave) return botoes[i];
+        } else if (nome && td && (td.innerText || '').trim() === nome) {
+            return botoes[i];
+        }
+    }
+    return null;
+"""
+
+# Lê (e opcionalmente aciona) o paginador do datatable de médicos. arguments[0]: 'ler',
+# 'maximo' (maior opção de linhas por página; "*" = todas), 'primeira', 'proxima' ou
+# 'ir' (arguments[1] = página, 0-based: link direto se visível, senão um passo na direção).
+# Retorna null sem tabela, {paginada: false} sem paginador, ou o estado lido ANTES da ação
+# (pagina, tem_proxima, linhas_por_pagina, primeira = chave da 1ª linha) + mudou.
+JS_PAGINADOR_MEDICOS = JS_TABELA_MEDICOS + """
+    var acao = arguments[0], alvo = arguments[1];
+    var tabela = tabelaMedicos();
+    if (!tabela) return null;
+    var pag = tabela.querySelector('.ui-paginator') || (tabela.parentNode && tabela.parentNode.querySelector('.ui-paginator'));
+    if (!pag) return {paginada: false};
+    function desabilitado(el) { return !el || el.classList.contains('ui-state-disabled'); }
+    var ativa = pag.querySelector('.ui-paginator-page.ui-state-active');
+    var prox = pag.querySelector('.ui-paginator-next'), ant = pag.querySelector('.ui-paginator-prev');
+    var rpp = pag.querySelector('select.ui-paginator-rpp-options');
+    var tr = tabela.querySelector('tr[data-ri]');
+    var info = {paginada: true, pagina: ativa ? parseInt(ativa.textContent, 10) - 1 : 0,
+                tem_proxima: !desabilitado(prox), linhas_por_pagina: rpp ? rpp.value : null,
+                primeira: tr ? (tr.getAttribute('data-rk') || tr.getAttribute('data-ri')) : null, mudou: false};
+    function clicar(el) { if (desabilitado(el)) return false; el.click(); return true; }
+    if (acao === 'maximo' && rpp) {
+        var maior = null, maiorN = -1;
+        for (var i = 0; i < rpp.options.length; i++) {
+            var v = rpp.options[i].value, n = v === '*' ? Infinity : parseInt(v, 10);
+            if (!isNaN(n) && n > maiorN) { maior = v; maiorN = n; }
+        }
+        if (maior !== null && maior !== rpp.value) {
+            rpp.value = maior;
+            rpp.dispatchEvent(new Event('change', {bubbles: true}));
+            info.mudou = true;
+        }
+    } else if (acao === 'primeira' && info.pagina > 0) {
+        info.mudou = clicar(pag.querySelector('.ui-paginator-first')) || clicar(ant);
+    } else if (acao === 'proxima') {
+        info.mudou = clicar(prox);
+    } else if (acao === 'ir' && alvo !== info.pagina) {
+        var links = pag.querySelectorAll('.ui-paginator-page');
+        for (var i = 0; i < links.length; i++) {
+            if (parseInt(links[i].textContent, 10) - 1 === alvo) { info.mudou = clicar(links[i]); return info; }
+        }
+        info.mudou = clicar(alvo > info.pagina ? prox : ant);
+    }
+    return info;
+"""
+
+def paginador_medicos(driver, acao="ler", alvo=None):
+    """Estado do paginador da tabela de médicos (ver JS_PAGINADOR_MEDICOS); None em erro."""
+    try: return driver.execute_script(JS_PAGINADOR_MEDICOS, acao, alvo)
+    except Exception as e:
+        log(f"   [AVISO] Falha ao ler o paginador da tabela de médicos: {e}")
+        return None
+
+def _mudar_pagina(driver, acao, alvo=None):
+    """Aciona o paginador e espera a tabela trocar (página, 1ª linha ou linhas por página).
+    Retorna o estado novo, ou None se a ação não mudou nada."""
+    antes = paginador_medicos(driver, acao, alvo)
+    if not antes or not antes.get("mudou"):
+        return None
+    esperar_aguarde_sumir(driver, "aguarde:paginar")
+    marca = (antes["pagina"], antes["primeira"], antes["linhas_por_pagina"])
+    def trocou(d):
+        agora = paginador_medicos(d)
+        return agora if agora and (agora["pagina"], agora["primeira"], agora["linhas_por_pagina"]) != marca else None
+    return esperar_condicao(driver, trocou, "medicos:paginar", timeout=5.0) or paginador_medicos(driver)
+
+def ir_para_pagina(driver, pagina):
+    """Leva a tabela de médicos até `pagina` (0-based). True se chegou."""
+    for _ in range(50):   # link direto quando visível; senão anda um passo por vez
+        estado = paginador_medicos(driver)
+        if not estado or not estado.get("paginada"):
+            return False
+        if estado["pagina"] == pagina:
+            return True
+        if _mudar_pagina(driver, "ir", pagina) is None:
+            return False
+    return False
+
+def snapshot_medicos(driver):
+    """Lê a tabela de médicos inteira: põe o paginador no máximo de linhas por página e
+    percorre todas as páginas, uma chamada por página (ver JS_SNAPSHOT_MEDICOS). Cada
+    linha leva "pagina" e a chave data-rk, e o índice passa a ser a posição na secretaria.
+    Deixa a tabela na 1ª página."""
+    try:
+        estado = paginador_medicos(driver)
+        if not estado or not estado.get("paginada"):
+            return driver.execute_script(JS_SNAPSHOT_MEDICOS) or []
+        estado = _mudar_pagina(driver, "maximo") or estado
+        if estado["pagina"] != 0:
+            estado = _mudar_pagina(driver, "primeira") or estado
+        linhas, chaves, paginas = [], set(), set()
+        while estado and estado["pagina"] not in paginas:
+            paginas.add(estado["pagina"])
+            for linha in driver.execute_script(JS_SNAPSHOT_MEDICOS) or []:
+                if linha["chave"] is not None and linha["chave"] in chaves:
+                    continue   # a mesma linha em duas páginas (tabela mudou durante a leitura)
+                chaves.add(linha["chave"])
+                linha["pagina"] = estado["pagina"]
+                linha["indice"] = len(linhas)
+                linhas.append(linha)
+            if not estado["tem_proxima"]:
+                break
+            estado = _mudar_pagina(driver, "proxima")
+        if len(paginas) > 1:
+            log(f"   [TABELA] {len(linhas)} médicos em {len(paginas)} página(s) de {estado and estado['linhas_por_pagina']}.")
+            _mudar_pagina(driver, "primeira")
+        return linhas
+    except Exception as e:
+        log(f"   [AVISO] Falha ao ler a tabela de médicos: {e}")
+        return []
+
+def botao_medico(driver, linha):
+    """Lápis da linha do snapshot; se ela está em outra página, vai até a página dela."""
+    botao = driver.execute_script(JS_BOTAO_MEDICO, linha.get("chave"), linha["nome"])
+    if botao is None and linha.get("pagina") is not None and ir_para_pagina(driver, linha["pagina"]):
+        botao = driver.execute_script(JS_BOTAO_MEDICO, linha.get("chave"), linha["nome"])
+    return botao
+
+# Marca, em uma única chamada, as opções do escolherLogins (painel já aberto).
+# arguments[0]: logins alvo (vazio = todas as opções, via select-all do header)
+# arguments[1]: true para casar por "contains", false para "startsWith"
+# Retorna {por_login: {login: {encontrados, marcados, falhas}}, marcados: [rótulos ativos], desmarcados: [demais rótulos]}
+JS_VINCULAR_LOGINS = """
+    var alvos = arguments[0] || [], contem = arguments[1];
+    var paineis = document.querySelectorAll('div.ui-selectcheckboxmenu-panel'), painel = null;
+    for (var p = 0; p < paineis.length; p++) {
+        if (getComputedStyle(paineis[p]).display !== 'none') { painel = paineis[p]; break; }
+    }
+    if (!painel) return null;
+    function ativo(box) { return box.classList.contains('ui-state-active'); }
+    function rotulo(li) { return (li.getAttribute('data-label') || li.textContent || '').trim(); }
+    var itens = painel.querySelectorAll('li.ui-selectcheckboxmenu-item');
+    var porLogin = {};
+    if (!alvos.length) {
+        function pendentes() {
+            var n = 0;
+            for (var i = 0; i < itens.length; i++) {
+                var b = itens[i].querySelector('.ui-chkbox-box');
+                if (b && !ativo(b)) n++;
+            }
+            return n;
+        }
+        var antes = pendentes();
+        var header = painel.querySelector('.ui-selectcheckboxmenu-header .ui-chkbox-box');
+        porLogin['*'] = {encontrados: itens.length, marcados: 0, falhas: 0};
+        if (antes && header && !ativo(header)) {
+            header.click();
+            var depois = pendentes();
+            porLogin['*'].marcados = antes - depois;
+            porLogin['*'].falhas = depois;
+        }
+    } else {
+        for (var a = 0; a < alvos.length; a++) porLogin[alvos[a]] = {encontrados: 0, marcados: 0, falhas: 0};
+        for (var i = 0; i < itens.length; i++) {
+            var box = itens[i].querySelector('.ui-chkbox-box');
+            if (!box) continue;
+            var txt = rotulo(itens[i]).toUpperCase();
+            var casou = [];
+            for (var a = 0; a < alvos.length; a++) {
+                var alvo = alvos[a].toUpperCase();
+                if (contem ? txt.indexOf(alvo) >= 0 : txt.indexOf(alvo) === 0) casou.push(alvos[a]);
+            }
+            if (!casou.length) continue;
+            var mudou = false;
+            if (!ativo(box)) { box.click(); mudou = true; }
+            for (var c = 0; c < casou.length; c++) {
+                var r = porLogin[casou[c]];
+                r.encontrados++;
+                if (mudou) { if (ativo(box)) r.marcados++; else r.falhas++; }
+            }
+        }
+    }
+    var marcados = [], desmarcados = [];
+    for (var i = 0; i < itens.length; i++) {
+        var b = itens[i].querySelector('.ui-chkbox-box');
+        if (b) (ativo(b) ? marcados : desmarcados).push(rotulo(itens[i]));
+    }
+    return {por_login: porLogin, marcados: marcados, desmarcados: desmarcados};
+"""
+
+def vincular_logins_em_lote(driver, lista_logins):
+    """Marca as opções de lista_logins (ou todas, se vazia) no escolherLogins já aberto.
+    Retorna (houve_alteracao, [rótulos marcados, rótulos desmarcados]) ou (False, None)."""
+    res = driver.execute_script(JS_VINCULAR_LOGINS, list(lista_logins or []), FILTRO_LOGINS_MODO == "contains")
+    if not res:
+        log("      [AVISO] Painel do escolherLogins não está aberto.")
+        return False, None
+    houve_alt = False
+    for login, r in res["por_login"].items():
+        nome = login if login != "*" else "todos os logins"
+        if r["marcados"]:
+            houve_alt = True
+            log(f"      + Vinculado: {nome} ({r['marcados']} opção(ões))")
+        if r["falhas"]:
+            log(f"      [AVISO] {r['falhas']} opção(ões) de '{nome}' não marcou após clique.")
+        if not r["encontrados"] and login != "*":
+            log(f"      [AVISO] Login '{login}' não encontrado no escolherLogins.")
+    return houve_alt, [res["marcados"], res["desmarcados"]]
+
+# Resultado do Salvar do formServico: {erro: mensagens} se o NTISS mostrou erro de
+# validação, {erro: ''} se o diálogo fechou limpo, null enquanto ele continua aberto.
+JS_RESULTADO_SALVAR = """
+    var erros = document.querySelectorAll('.ui-messages-error, .ui-message-error');
+    var msgs = [];
+    for (var i = 0; i < erros.length; i++) {
+        if (erros[i].offsetParent) msgs.push((erros[i].innerText || '').trim() || 'validação do formulário');
+    }
+    if (msgs.length) return {erro: msgs.join('; ')};
+    var f = document.getElementById('formServico');
+    return (f && f.offsetParent) ? null : {erro: ''};
+"""
+
+def confirmar_salvar(driver, etapa="vincular:confirmar_salvar", timeout=3.0):
+    """None se o diálogo fechou sem mensagem de erro; senão o motivo (como _salvar_http)."""
+    res = esperar_condicao(driver, lambda d: d.execute_script(JS_RESULTADO_SALVAR), etapa, timeout=timeout)
+    if res is None:
+        return "diálogo continuou aberto após o Salvar"
+    return res.get("erro") or None
+
+def casar_filtro(linhas, filtro_medicos, secretaria=None):
+    """Cruza o filtro (lido em lotes) com o índice de nomes da tela, montado uma vez.
+    Retorna (alvos {linha: nome do filtro}, não encontrados, a revisar)."""
+    indice = IndiceNomes([l["nome"] or l["texto"] for l in linhas], textos=[l["texto"] for l in linhas])
+    alvos, nao_encontrados, revisar = {}, [], []
+    for lote in fonte_medicos(filtro_medicos).lotes(secretaria):
+        for m in lote:
+            achadas, nota, camada = indice.correspondencia(m)
+            if camada is None:
+                nao_encontrados.append(m)
+                continue
+            if camada not in IndiceNomes.CAMADAS_MULTIPLAS:
+                log(indice.descrever(m, achadas, nota, camada))
+                if IndiceNomes.revisar(camada):
+                    revisar.append(m)
+                    continue   # nem vincula nem cadastra um nome que pode ser de outro médico
+            for j in achadas:
+                alvos.setdefault(j, m)
+    return alvos, nao_encontrados, revisar
+
+def executar_logica_vincular_logins(driver, lista_logins, filtro_medicos=None, secretaria=None):
+    global solicitar_finalizacao
+    if filtro_medicos is not None:
+        filtro_medicos = fonte_medicos(filtro_medicos)
+        log(f"   [VINCULAR] Filtro ativo: {filtro_medicos}.")
+    try:
+        linhas = snapshot_medicos(driver)
+        if not linhas: return []
+        total_proc = len(linhas)
+        log(f"   [VINCULAR] Processando {total_proc} médicos...")
+        atualizar_status(progresso=f"0 / {total_proc}")
+
+        alvos, nao_encontrados = None, []
+        if filtro_medicos is not None:
+            alvos, nao_encontrados, _ = casar_filtro(linhas, filtro_medicos, secretaria)
+
+        vigia = VigiaSessao(driver, secretaria)
+        for i in vigia.percorrer(range(total_proc)):   # a fila cresce se o vigia devolver médicos para refazer
+            if solicitar_finalizacao:
+                log("🛑 Processo interrompido pelo usuário")
+                return []
+            if checar_pausa():
+                log("   ⏭ Secretaria pulada pelo usuário.")
+                return []  # sai da função → main loop passa para a próxima secretaria
+            linha = linhas[i]
+            nome_medico = linha["nome"] or f"Médico {i+1}"
+            try:
+                log(f"   --- [{i+1}/{total_proc}] {nome_medico} ---")
+                atualizar_status(medico=nome_medico, progresso=f"{i+1} / {total_proc}")
+
+                # Filtra por nome se filtro_medicos foi fornecido
+                if alvos is not None and i not in alvos:
+                    log("   -> Pulando (não está na lista para vincular).")
+                    continue
+
+                if ja_concluido("vincular", secretaria, nome_medico):
+                    log("   -> Já concluído (retomada).")
+                    continue
+
+                if not linha["ativo"]:
+                    log("   -> Inativo.")
+                    registrar_resultado("vincular", secretaria, nome_medico, "inativo")
+                    continue
+
+                if cache_vinculos.completo(secretaria, nome_medico, lista_logins):
+                    log("   -> Já configurado (cache), sem abrir o modal.")
+                    registrar_resultado("vincular", secretaria, nome_medico, "sem_alteracao", "cache")
+                    continue
+
+                # Só agora re-localiza o lápis da linha que será aberta (trocando de página se preciso)
+                botao = botao_medico(driver, linha)
+                if botao is None:
+                    log("   [ERRO] Linha do médico não encontrada na tabela (re-renderizada?).")
+                    registrar_resultado("vincular", secretaria, nome_medico, "erro", "linha não encontrada")
+                    continue
+
+                with rastrear("vincular:abrir_modal"):
+                    driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", botao)
+                    try: botao.click()
+                    except: clicar_js(driver, botao, "Lapis")
+                    esperar_aguarde_sumir(driver, "aguarde:abrir_medico")
+
+                try:
+                    estado_logins = None
+
+                    # --- Garante "Visualiza" e "Cancela/Exclui transações de outros logins?" (uma chamada) ---
+                    with rastrear("vincular:checkboxes"):
+                        chks = garantir_checkboxes(driver, [ALVO_VISUALIZA_OUTROS, ALVO_CANCELA_OUTROS], "vincular:checkboxes")
+                    viz_ok, ce_ok = chks["visualiza"]["ok"], chks["cancela"]["ok"]
+                    houve_alt = any(c["alterado"] for c in chks.values())
+
+                    # --- Vincula logins / marca todos se lista estiver vazia ---
+                    try:
+                        with rastrear("vincular:logins"):
+                            div = WebDriverWait(driver, 5).until(EC.presence_of_element_located((By.CSS_SELECTOR, "div[id$=':escolherLogins']")))
+                            try: div.find_element(By.CSS_SELECTOR, ".ui-selectcheckboxmenu-trigger").click()
+                            except: driver.execute_script("arguments[0].click();", div)
+                            if esperar_condicao(driver, cond_painel_visivel("div.ui-selectcheckboxmenu-panel"),
+                                                "vincular:abrir_logins", timeout=2.0) is None:
+                                # as opções já estão no DOM; o resultado é conferido pelo estado devolvido
+                                log("      [AVISO] Painel de logins não abriu; marcando pelas opções do DOM.")
+
+                            # Lê todas as opções e marca as necessárias em uma única chamada
+                            # (lista vazia = select-all do header)
+                            alterou_logins, estado_logins = vincular_logins_em_lote(driver, lista_logins)
+                            houve_alt = houve_alt or alterou_logins
+
+                            try: driver.find_element(By.CSS_SELECTOR, "a.ui-selectcheckboxmenu-close").click()
+                            except: pass
+                            if esperar_condicao(driver, cond_painel_visivel("div.ui-selectcheckboxmenu-panel", visivel=False),
+                                                "vincular:fechar_logins", timeout=1.0) is None:
+                                # não bloqueia o Salvar, que é conferido por confirmar_salvar
+                                log("      [AVISO] Painel de logins continuou aberto.")
+                    except Exception as e:
+                        log(f"      [AVISO] Dropdown escolherLogins não encontrado: {e}")
+
+                    # --- Salva se houve alteração, cancela caso contrário ---
+                    detalhe = ""
+                    with rastrear("vincular:salvar"):
+                        if houve_alt:
+                            log("      💾 Salvando alterações...")
+                            try:
+                                clicar_js(driver, localizadores.achar(driver, "servico:salvar", timeout=2), "Salvar")
+                                esperar_aguarde_sumir(driver, "aguarde:salvar")
+                                detalhe = confirmar_salvar(driver) or ""
+                                status_final = "erro" if detalhe else "vinculado"
+                                if detalhe:
+                                    log(f"      [ERRO] NTISS recusou o Salvar: {detalhe}")
+                                    fechar_modal_servico(driver, "Cancelar")
+                            except Exception as e:
+                                log(f"      [ERRO] Botão Salvar não encontrado: {e}")
+                                fechar_janelas_travadas(driver)
+                                status_final, detalhe = "erro", e
+                        else:
+                            log("      ↩ Sem alterações, cancelando...")
+                            status_final = "sem_alteracao"
+                            try:
+                                clicar_js(driver, localizadores.achar(driver, "servico:cancelar", timeout=2), "Cancelar")
+                            except Exception as e:
+                                log(f"      [AVISO] Botão Cancelar não encontrado, usando ESC: {e}")
+                                fechar_janelas_travadas(driver)
+                            esperar_aguarde_sumir(driver)
+                    registrar_resultado("vincular", secretaria, nome_medico, status_final, detalhe)
+                    # só entra no cache o que o NTISS confirmou (Salvar fechou o diálogo sem erro)
+                    if status_final != "erro" and estado_logins:
+                        cache_vinculos.atualizar(secretaria, nome_medico, viz_ok, ce_ok, *estado_logins)
+                    else:
+                        cache_vinculos.invalidar(secretaria, nome_medico)
+                except Exception as e:
+                    log(f"      [ERRO INTERNO] {e}")
+                    fechar_janelas_travadas(driver)
+                    registrar_resultado("vincular", secretaria, nome_medico, "erro", e)
+                    cache_vinculos.invalidar(secretaria, nome_medico)
+            except Exception as e:
+                log(f"   [ERRO] Médico {i+1}: {e}")
+                fechar_janelas_travadas(driver)
+                registrar_resultado("vincular", secretaria, nome_medico, "erro", e)
+                cache_vinculos.invalidar(secretaria, nome_medico)
+        if vigia.abandonou:
+            return []
+
+        # Retorna médicos do filtro que não foram encontrados na tela
+        if filtro_medicos is not None:
+            if nao_encontrados:
+                log(f"   [VINCULAR] {len(nao_encontrados)} médico(s) não encontrado(s) na secretaria.")
+            return nao_encontrados
+        return []
+    except: pass
+    return []
+
+# ==============================================================================
+# MODO 2: CADASTRAR SERVIÇOS (Mantido V28)
+# ==============================================================================
+
+def selecionar_item_otimizado(driver, nome_medico, timeout=3):
+    rotulos = driver.execute_script(JS_LISTAR_PRESTADORES)
+    if rotulos:
+        rotulo, _ = localizar_prestador(IndiceNomes(rotulos), nome_medico)
+        return bool(rotulo) and bool(driver.execute_script(JS_SELECIONAR_PRESTADOR, rotulo))
+    try:
+        localizadores.achar(driver, "cadastrar:item_prestador", timeout, clicavel=True, nome=normalizar_nome(nome_medico)).click()
+        return True
+    except: return False
+
+JS_LISTAR_PRESTADORES = """
+    var painel = document.querySelector("div[id$=':prestadorFuncionario_panel']");
+    if (!painel) return null;
+    var itens = painel.querySelectorAll('li');
+    var rotulos = [];
+    for (var i = 0; i < itens.length; i++) {
+        if (itens[i].classList.contains('ui-state-disabled')) continue;
+        var txt = (itens[i].getAttribute('data-label') || itens[i].textContent || '').trim();
+        if (txt) rotulos.push(txt);
+    }
+    return rotulos;
+"""
+
+# Seleciona o item pelo rótulo exato; o clique no <li> dispara o change/AJAX do selectOneMenu
+# mesmo com o painel fechado ou com itens escondidos por um filtro anterior.
+JS_SELECIONAR_PRESTADOR = """
+    var painel = document.querySelector("div[id$=':prestadorFuncionario_panel']");
+    if (!painel) return false;
+    var itens = painel.querySelectorAll('li');
+    for (var i = 0; i < itens.length; i++) {
+        var txt = (itens[i].getAttribute('data-label') || itens[i].textContent || '').trim();
+        if (txt === arguments[0]) { itens[i].click(); return true; }
+    }
+    return false;
+"""
+
+JS_MODAL_SERVICO_VISIVEL = "var f = document.getElementById('formServico'); return !!(f && f.offsetParent);"
+
+def ler_prestadores(driver):
+    """Lê todos os rótulos do prestadorFuncionario_panel num único execute_script.
+    Se o painel for lazy (itens só após abrir), abre/fecha o dropdown uma vez.
+    Retorna [] se o painel existe e está vazio (todos já cadastrados) e None se não há painel."""
+    rotulos = driver.execute_script(JS_LISTAR_PRESTADORES)
+    if rotulos:
+        return rotulos
+    try:
+        trigger = driver.find_element(By.CSS_SELECTOR, "div[id$=':prestadorFuncionario'] .ui-selectonemenu-trigger")
+        trigger.click()
+        esperar_aguarde_sumir(driver, "aguarde:ler_prestadores")   # carga lazy dos itens, sem espera fixa
+        rotulos = driver.execute_script(JS_LISTAR_PRESTADORES)
+        trigger.click()
+    except Exception:
+        pass
+    return rotulos
+
+def localizar_prestador(indice, nome_medico):
+    """Rótulo do item para `nome_medico` no IndiceNomes da lista de prestadores.
+    Retorna (rótulo ou None, camada) — rótulo None também quando IndiceNomes.revisar(camada)."""
+    achados, nota, camada = indice.correspondencia(nome_medico)
+    if camada and camada not in IndiceNomes.CAMADAS_MULTIPLAS:
+        log(indice.descrever(nome_medico, achados, nota, camada))
+    if camada is None or IndiceNomes.revisar(camada):
+        return None, camada
+    return indice.nomes[achados[0]], camada
+
+def selecionar_prestador_digitando(driver, nome_medico):
+    """Caminho antigo (filtro digitado). Usado só quando a lista não pôde ser lida/selecionada via JS."""
+    driver.find_element(By.CSS_SELECTOR, "div[id$=':prestadorFuncionario'] .ui-selectonemenu-trigger").click()
+    campo_filtro = WebDriverWait(driver, 3).until(EC.visibility_of_element_located((By.CSS_SELECTOR, "div[id$=':prestadorFuncionario_panel'] input")))
+    campo_filtro.clear()
+    campo_filtro.send_keys(nome_medico.upper())
+    if esperar_condicao(driver, cond_lista_filtrada("div[id$=':prestadorFuncionario_panel']", nome_medico),
+                        "cadastrar:filtro_prestador", timeout=2.0) is None:
+        # sem filtro aplicado a lista vem inteira: selecionar_item_otimizado casa o nome nela
+        log("      [AVISO] Filtro de prestadores não respondeu; procurando na lista inteira.")
+    return selecionar_item_otimizado(driver, nome_medico, timeout=3)
+
+@rastrear("cadastrar:abrir_modal")
+def abrir_modal_servico(driver):
+    try:
+        clicar_js(driver, localizadores.achar(driver, "cadastrar:criar_servico", timeout=5, clicavel=True), "Criar Serviço")
+        esperar_aguarde_sumir(driver, "aguarde:abrir_modal")
+        return True
+    except Exception:
+        log("      [ERRO] Não consegui abrir o modal 'Criar Serviço'.")
+        return False
+
+def fechar_modal_servico(driver, rotulo="Cancelar Modal"):
+    try:
+        clicar_js(driver, localizadores.achar(driver, "servico:cancelar", timeout=2), rotulo)
+        esperar_aguarde_sumir(driver)
+    except: fechar_janelas_travadas(driver)
+
+def executar_logica_cadastrar_servicos(driver, medicos, secretaria=None):
+    global solicitar_finalizacao
+    medicos = fonte_medicos(medicos)
+    log(f"   [CADASTRAR] Iniciando lista de {medicos}...")
+    cadastrados_agora = []
+
+    # Nomes lidos em lotes; os já concluídos (retomada) ficam de fora sem ir para a memória
+    concluidos = 0
+    def _pendentes():
+        nonlocal concluidos
+        for lote in medicos.lotes(secretaria):
+            for m in lote:
+                if ja_concluido("cadastrar", secretaria, m):
+                    concluidos += 1
+                else:
+                    yield m
+    pendentes = _pendentes()
+    primeiro = next(pendentes, None)
+    if primeiro is None:
+        if concluidos:
+            log(f"      -> {concluidos} já concluídos (retomada).")
+        return cadastrados_agora
+    pendentes = itertools.chain([primeiro], pendentes)
+
+    modal_aberto = abrir_modal_servico(driver)
+    if not modal_aberto:
+        motivo = diagnosticar_sessao(driver)
+        if motivo and recuperar_sessao(driver, secretaria, motivo):
+            modal_aberto = abrir_modal_servico(driver)
+    if not modal_aberto:
+        for nome_medico in pendentes:
+            registrar_resultado("cadastrar", secretaria, nome_medico, "erro", "modal Criar Serviço")
+        return cadastrados_agora
+
+    # Lê a lista de prestadores uma vez por secretaria e decide tudo antes do loop:
+    # quem não está na lista já tem serviço cadastrado. A fila fica limitada ao
+    # tamanho da lista, por maior que seja o arquivo de entrada.
+    rotulos = ler_prestadores(driver)
+    if rotulos is None:
+        log("   [AVISO] Lista de prestadores não encontrada; usando o filtro digitado por médico.")
+        fila = ((m, None) for m in pendentes)   # sob demanda: o arquivo pode ser grande
+    else:
+        indice = IndiceNomes(rotulos)
+        fila, ja_cadastrados = [], 0
+        for nome_medico in pendentes:
+            rotulo, camada = localizar_prestador(indice, nome_medico)
+            if rotulo:
+                fila.append((nome_medico, rotulo))
+            elif IndiceNomes.revisar(camada):
+                registrar_resultado("cadastrar", secretaria, nome_medico, "erro", f"nome a revisar na lista de prestadores ({camada})")
+            else:
+                ja_cadastrados += 1
+                log(f"      [JÁ CADASTRADO] {nome_medico} não está na lista de prestadores.")
+                registrar_resultado("cadastrar", secretaria, nome_medico, "ja_cadastrado")
+        log(f"   [CADASTRAR] {len(rotulos)} prestadores na lista -> {len(fila)} a cadastrar, "
+            f"{ja_cadastrados} já cadastrados.")
+
+    vigia = VigiaSessao(driver, secretaria)
+    for index, (nome_medico, rotulo) in enumerate(vigia.percorrer(fila)):
+        if solicitar_finalizacao:
+            log("🛑 Processo interrompido pelo usuário")
+            if modal_aberto:
+                fechar_modal_servico(driver)
+            return
+        log(f"   --- [{vigia.progresso(index)}] {nome_medico} ---")
+        atualizar_status(medico=nome_medico, progresso=vigia.progresso(index))
+        checar_pausa()
+        try:
+            if not modal_aberto:
+                if not abrir_modal_servico(driver):
+                    registrar_resultado("cadastrar", secretaria, nome_medico, "erro", "modal Criar Serviço")
+                    continue
+                modal_aberto = True
+
+            try:
+                with rastrear("cadastrar:selecionar"):
+                    encontrou = bool(rotulo) and driver.execute_script(JS_SELECIONAR_PRESTADOR, rotulo)
+                    if not encontrou:
+                        encontrou = selecionar_prestador_digitando(driver, nome_medico)
+                if not encontrou:
+                    log("      [JÁ CADASTRADO] Médico não apareceu na lista.")
+                    registrar_resultado("cadastrar", secretaria, nome_medico, "ja_cadastrado")
+                    try: driver.find_element(By.TAG_NAME, 'body').click() 
+                    except: pass
+                    continue 
+
+                with rastrear("cadastrar:render"):
+                    try: WebDriverWait(driver, 10).until(EC.visibility_of_element_located((By.CSS_SELECTOR, "div.ui-datatable")))
+                    except: pass
+                    # aguarda checkboxes renderizarem após o datatable
+                    if esperar_condicao(driver, lambda d: d.find_elements(By.XPATH, "//form[@id='formServico']//label[contains(text(), 'Visualiza transa')]"),
+                                        "cadastrar:render_checkboxes", timeout=2.0) is None:
+                        # salvar agora criaria o serviço sem as permissões: vira erro (refeito na retomada)
+                        raise RuntimeError("checkboxes do serviço não renderizaram")
+
+                with rastrear("cadastrar:checkboxes"):
+                    garantir_checkboxes(driver, [ALVO_VISUALIZA_OUTROS, ALVO_CANCELA_OUTROS, ALVO_TODAS_TRANSACOES],
+                                        "cadastrar:checkboxes")
+
+                with rastrear("cadastrar:salvar"):
+                    clicar_js(driver, localizadores.achar(driver, "servico:salvar", timeout=2), "Salvar")
+                    esperar_aguarde_sumir(driver, "aguarde:salvar")
+                log("      -> Sucesso (Cadastrado).")
+                registrar_resultado("cadastrar", secretaria, nome_medico, "cadastrado")
+                cadastrados_agora.append(nome_medico)
+                # Se o sistema mantiver o diálogo aberto após salvar, reaproveita para o próximo médico
+                modal_aberto = bool(driver.execute_script(JS_MODAL_SERVICO_VISIVEL))
+                
+            except Exception as e:
+                log(f"      [ERRO INTERNO] {e}")
+                fechar_janelas_travadas(driver)
+                modal_aberto = False
+                registrar_resultado("cadastrar", secretaria, nome_medico, "erro", e)
+
+        except Exception as e:
+            log(f"      [ERRO CRÍTICO] {e}")
+            fechar_janelas_travadas(driver)
+            modal_aberto = False
+            registrar_resultado("cadastrar", secretaria, nome_medico, "erro", e)
+    if concluidos:   # contados ao consumir `pendentes`
+        log(f"      -> {concluidos} já concluídos (retomada).")
+    if vigia.abandonou:
+        return cadastrados_agora
+
+    if modal_aberto:
+        log("   Finalizando lista, fechando modal restante...")
+        fechar_modal_servico(driver, "Cancelar Modal Final")
+    return cadastrados_agora
+
+# ==============================================================================
+# NAVEGADOR / POOL DE WORKERS
+# ==============================================================================
+
+_chromedriver_path = None
+_chromedriver_lock = threading.Lock()
+
+class TemposInicio:
+    """Cronometra as etapas da inicialização (podem correr em threads diferentes) e loga
+    o resumo do tempo até o robô ficar pronto."""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self._etapas = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def medir(self, etapa):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._etapas.append((etapa, time.perf_counter() - t0))
+
+    def resumo(self):
+        with self._lock:
+            partes = " · ".join(f"{etapa} {dur:.2f}s" for etapa, dur in self._etapas)
+        log(f"⏱ [INÍCIO] {partes} → pronto em {time.perf_counter() - self.inicio:.2f}s")
+
+def _medir(tempos, etapa):
+    return tempos.medir(etapa) if tempos else nullcontext()
+
+def _versao_chrome_local():
+    """Major do Chrome instalado (ex.: "126"), lido do registro/binário sem tocar a rede; None se não achar."""
+    if sys.platform.startswith("win"):
+        try:
+            import winreg
+        except ImportError:
+            return None
+        for raiz in (winreg.HKEY_CURRENT_USER, winreg.HKEY_LOCAL_MACHINE):
+            try:
+                with winreg.OpenKey(raiz, r"Software\Google\Chrome\BLBeacon") as chave:
+                    return str(winreg.QueryValueEx(chave, "version")[0]).split(".")[0]
+            except OSError:
+                continue
+        return None
+    if sys.platform == "darwin":
+        binarios = ["/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"]
+    else:
+        binarios = ["google-chrome", "google-chrome-stable", "chromium", "chromium-browser"]
+    for binario in binarios:
+        try:
+            saida = subprocess.run([binario, "--version"], capture_output=True, text=True, timeout=5).stdout
+        except Exception:
+            continue
+        m = re.search(r"(\d+)\.\d+", saida or "")
+        if m:
+            return m.group(1)
+    return None
+
+def _resolver_chromedriver():
+    """config "chromedriver" > cache local (mesmo major do Chrome, sem rede) > webdriver-manager.
+    Se o webdriver-manager falhar (ex.: offline), ainda tenta o binário do cache."""
+    if CHROMEDRIVER:
+        return CHROMEDRIVER
+    versao = _versao_chrome_local()
+    cache = carregar_json(ARQUIVO_CHROMEDRIVER) or {}
+    caminho = cache.get("caminho")
+    em_cache = bool(caminho) and os.path.isfile(caminho)
+    if em_cache and (versao is None or cache.get("chrome") == versao):
+        return caminho
+    try:
+        from webdriver_manager.chrome import ChromeDriverManager   # import tardio: só quando precisa baixar/checar
+        novo = ChromeDriverManager().install()
+    except Exception as e:
+        if em_cache:
+            log(f"[AVISO] webdriver-manager falhou ({e}); usando o chromedriver em cache ({caminho}).")
+            return caminho
+        raise
+    try:
+        os.makedirs(PASTA_ESTADO, exist_ok=True)
+        tmp = ARQUIVO_CHROMEDRIVER + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"caminho": novo, "chrome": versao,
+                       "resolvido_em": datetime.now().isoformat(timespec="seconds")}, f, ensure_ascii=False)
+        os.replace(tmp, ARQUIVO_CHROMEDRIVER)
+    except OSError as e:
+        log(f"[AVISO] Não foi possível gravar o cache do chromedriver: {e}")
+    return novo
+
+def _caminho_chromedriver():
+    """Resolve o chromedriver uma única vez por processo (compartilhado pelos workers)."""
+    global _chromedriver_path
+    with _chromedriver_lock:
+        if _chromedriver_path is None:
+            _chromedriver_path = _resolver_chromedriver()
+        return _chromedriver_path
+
+def _pasta_perfil(headless):
+    """user-data-dir do Chrome. O Chrome trava a pasta enquanto usa, então cada worker tem
+    a sua; o headless também (as prefs sem imagens/CSS não vazam para o Chrome visível)."""
+    pasta = os.path.abspath(PERFIL_CHROME)
+    if headless:
+        pasta += "-headless"
+    nome = getattr(_ctx_worker, "nome", None)
+    return f"{pasta}-{nome}" if nome else pasta
+
+def criar_driver(headless=False, sem_css=None, tempos=None):
+    """Cria o Chrome. Em headless as imagens não são carregadas; `sem_css` (padrão: config
+    "sem_css") também bloqueia folhas de estilo — mais rápido, mas só use se as telas
+    funcionarem sem CSS. `tempos` (TemposInicio) cronometra chromedriver e abertura."""
+    if sem_css is None:
+        sem_css = SEM_CSS
+    with _medir(tempos, "chromedriver"):
+        caminho = _caminho_chromedriver()
+    options = webdriver.ChromeOptions()
+    if PERFIL_CHROME:
+        options.add_argument(f"--user-data-dir={_pasta_perfil(headless)}")
+    if headless:
+        options.add_argument("--headless=new")
+        options.add_argument("--window-size=1920,1080")
+        options.add_argument("--disable-gpu")
+        options.add_argument("--no-sandbox")
+        options.add_argument("--disable-dev-shm-usage")
+        prefs = {"profile.managed_default_content_settings.images": 2}
+        if sem_css:
+            prefs["profile.managed_default_content_settings.stylesheets"] = 2
+        options.add_experimental_option("prefs", prefs)
+    with _medir(tempos, "chrome"):
+        driver = instrumentar_driver(webdriver.Chrome(service=Service(caminho), options=options))
+        if not headless:
+            driver.maximize_window()
+    return driver
+
+@rastrear("secretaria")
+def processar_secretaria(driver, op, sec, dados):
+    """Pesquisa a secretaria, executa o modo escolhido e volta para a pesquisa.
+    Com dados["plano"] (apply), executa só as ações planejadas para a secretaria.
+    Retorna a lista de médicos cadastrados agora (modo 2) ou None."""
+    modo = MODOS[op]
+    _ctx_worker.sessao_perdida = False
+    descartar_skip_pendente()
+    resultados.iniciar_secretaria(sec)
+    if not navegar_pesquisar_secretaria(driver, sec):
+        motivo = diagnosticar_sessao(driver)
+        if not (motivo and recuperar_sessao(driver, sec, motivo)):
+            registrar_resultado(modo, sec, None, "erro", "secretaria não encontrada")
+            return None
+    _ctx_worker.pulou = False
+    cadastrados = None
+    acoes = (dados.get("plano") or {}).get(sec)
+    if op == '1':
+        if acoes is None:
+            filtro_json = dados.get("medicos_para_vincular") or None
+            nao_encontrados = executar_logica_vincular_logins(driver, dados.get("logins_para_vincular", []), filtro_medicos=filtro_json, secretaria=sec)
+        else:
+            nao_encontrados = acoes.get("cadastrar", [])
+            if acoes.get("vincular"):
+                executar_logica_vincular_logins(driver, dados.get("logins_para_vincular", []), filtro_medicos=acoes["vincular"], secretaria=sec)
+        if nao_encontrados and not solicitar_finalizacao:
+            log(f"   [AUTO-CADASTRO] {len(nao_encontrados)} médico(s) não encontrado(s) → iniciando Cadastro...")
+            cadastrados_agora = executar_logica_cadastrar_servicos(driver, nao_encontrados, secretaria=sec)
+            if cadastrados_agora and not solicitar_finalizacao:
+                log(f"   [AUTO-VINCULAR] Vinculando {len(cadastrados_agora)} médico(s) recém-cadastrado(s)...")
+                executar_logica_vincular_logins(driver, dados.get("logins_para_vincular", []), filtro_medicos=cadastrados_agora, secretaria=sec)
+    elif op == '2':
+        medicos = acoes.get("cadastrar", []) if acoes is not None else dados.get("medicos_para_cadastrar", [])
+        cadastrados = executar_logica_cadastrar_servicos(driver, medicos, secretaria=sec)
+    voltar_para_pesquisa(driver)
+    if _ctx_worker.sessao_perdida:
+        registrar_resultado(modo, sec, None, "erro", "sessão perdida")
+    elif not solicitar_finalizacao and not _ctx_worker.pulou:
+        concluir_secretaria(modo, sec)
+    return cadastrados
+
+def _progresso_pool(estado):
+    """Progresso agregado do pool. Vai direto ao painel: atualizar_status omite o
+    progresso quando chamado de dentro de um worker."""
+    if ui:
+        ui.status(progresso=f"{estado['concluidas']} / {estado['total']} secretarias · {estado['ativos']} worker(s)")
+
+def abrir_chrome(headless=None, tempos=None):
+    """Chrome logado e já na lista de Funcionários; None se a lista não abriu."""
+    driver = criar_driver(headless=WORKERS_HEADLESS if headless is None else headless, tempos=tempos)
+    if not entrar_no_sistema(driver, tempos):
+        log("[ERRO] Worker não conseguiu abrir a lista de Funcionários, encerrando.")
+        driver.quit()
+        return None
+    return driver
+
+@rastrear("worker")
+def _worker_pool(num, op, dados, fila, estado, tarefa, ao_concluir, abrir):
+    """Worker do pool: abre a própria sessão (Chrome ou HTTP) com `abrir()` e consome secretarias da fila."""
+    _ctx_worker.nome = f"W{num}"
+    descartar_skip_pendente()
+    driver = None
+    try:
+        driver = abrir()
+        if driver is None:
+            return
+        while not solicitar_finalizacao:
+            _pause_event.wait()  # não pega secretaria nova enquanto pausado
+            disjuntor.aguardar()
+            if solicitar_finalizacao:
+                break
+            try:
+                idx, sec = fila.get_nowait()
+            except queue.Empty:
+                break
+            log(f"\n=== SECRETARIA [{idx}/{estado['total']}]: {sec} ===")
+            resultado = tarefa(driver, op, sec, dados)
+            with estado["lock"]:
+                estado["concluidas"] += 1
+                ao_concluir(sec, resultado)
+                _progresso_pool(estado)
+    except Exception as e:
+        log(f"[ERRO CRÍTICO] Worker encerrado: {e}")
+    finally:
+        with estado["lock"]:
+            estado["ativos"] -= 1
+            _progresso_pool(estado)
+        if driver:
+            try: driver.quit()
+            except: pass
+
+def _guardar_cadastrados(sec, cadastrados):
+    if cadastrados:
+        medicos_cadastrados_sessao[sec] = cadastrados
+
+def executar_pool_secretarias(op, dados, secretarias, tarefa=processar_secretaria, ao_concluir=_guardar_cadastrados,
+                              abrir=abrir_chrome, workers=None):
+    """Distribui as secretarias entre `workers` (padrão NUM_WORKERS) sessões independentes
+    criadas por `abrir()`. `tarefa(sessao, op, sec, dados)` roda para cada secretaria;
+    `ao_concluir(sec, retorno)` é chamado sob o lock do pool. Retorna as secretarias
+    que ficaram na fila (todos os workers encerraram antes)."""
+    fila = queue.Queue()
+    for item in enumerate(secretarias, 1):
+        fila.put(item)
+    n = min(workers or NUM_WORKERS, len(secretarias))
+    estado = {"lock": threading.Lock(), "concluidas": 0, "total": len(secretarias), "ativos": n}
+    log(f"👥 [POOL] {n} worker(s) para {len(secretarias)} secretaria(s).")
+    atualizar_status(secretaria="(pool)", medico="—")
+    _progresso_pool(estado)
+    nivel = getattr(_ctx_worker, "nivel", 0)   # spans dos workers ficam dentro do span corrente (ciclo)
+    threads = [threading.Thread(target=_thread_filha,
+                                args=(nivel, _worker_pool, i + 1, op, dados, fila, estado, tarefa, ao_concluir, abrir),
+                                daemon=True)
+               for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    restantes = []
+    while not fila.empty():
+        restantes.append(fila.get_nowait()[1])
+    if restantes and not solicitar_finalizacao:
+        log(f"[AVISO] {len(restantes)} secretaria(s) não processada(s): todos os workers encerraram.")
+    return restantes
+
+# ==============================================================================
+# MOTOR HTTP (SEM NAVEGADOR)
+# ==============================================================================
+# Com "motor": "http" cada worker é uma sessão HTTP (requests) em vez de um Chrome: faz
+# o login pelo formulário, guarda o javax.faces.ViewState e envia direto os postbacks
+# parciais que o PrimeFaces enviaria (pesquisar, abrir secretaria/médico, selecionar
+# prestador, salvar), aplicando cada <partial-response> num DOM mínimo em memória.
+# Os parâmetros de cada postback (s/f/p/u) vêm do PrimeFaces.ab do próprio componente
+# e os elementos são achados pelos rótulos, como no Selenium. Tela fora do esperado:
+# a secretaria volta para o caminho Selenium.
+
+TAGS_VAZIAS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "wbr"}
+RE_AB = re.compile(r"PrimeFaces\.ab\(\{(.*?)\}")
+RE_AB_PARAM = re.compile(r"""(\w+)\s*:\s*(?:"([^"]*)"|'([^']*)')""")
+FALLBACK_SELENIUM = object()   # retorno de processar_secretaria_http: refazer a secretaria pelo Selenium
+
+class SessaoExpiradaJSF(Exception):
+    """Redirect para o login, ViewExpiredException ou falha de rede: refazer login e secretaria."""
+
+class ProtocoloJSFError(Exception):
+    """Tela ou resposta fora do formato esperado pelo motor HTTP."""
+
+class NoHTML:
+    """Elemento do DOM em memória: tag, atributos, filhos (NoHTML ou texto) e pai."""
+    __slots__ = ("tag", "attrs", "filhos", "pai")
+
+    def __init__(self, tag, attrs=(), pai=None):
+        self.tag = tag
+        self.attrs = {k: (v if v is not None else "") for k, v in attrs}
+        self.filhos = []
+        self.pai = pai
+
+    def get(self, nome, padrao=None):
+        return self.attrs.get(nome, padrao)
+
+    def iterar(self):
+        """Elementos da subárvore em ordem de documento (inclui o próprio)."""
+        pilha = [self]
+        while pilha:
+            no = pilha.pop()
+            yield no
+            pilha.extend(f for f in reversed(no.filhos) if isinstance(f, NoHTML))
+
+    def todos(self, tag=None, **attrs):
+        return [n for n in self.iterar()
+                if (tag is None or n.tag == tag) and all(n.attrs.get(k) == v for k, v in attrs.items())]
+
+    def ancestral(self, tag=None, classe=None):
+        no = self.pai
+        while no is not None:
+            if (tag is None or no.tag == tag) and (classe is None or classe in no.get("class", "").split()):
+                return no
+            no = no.pai
+        return None
+
+    def texto(self):
+        """Texto visível da subárvore (sem script/style), com espaços colapsados."""
+        partes, pilha = [], [self]
+        while pilha:
+            no = pilha.pop()
+            if isinstance(no, str):
+                partes.append(no)
+            elif no.tag not in ("script", "style"):
+                pilha.extend(reversed(no.filhos))
+        return " ".join(" ".join(partes).split())
+
+    def codigo(self):
+        """Conteúdo bruto de um <script>."""
+        return "".join(f for f in self.filhos if isinstance(f, str))
+
+class _ConstrutorDOM(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.raiz = self.atual = NoHTML("#documento")
+
+    def handle_starttag(self, tag, attrs):
+        no = NoHTML(tag, attrs, self.atual)
+        self.atual.filhos.append(no)
+        if tag not in TAGS_VAZIAS:
+            self.atual = no
+
+    def handle_startendtag(self, tag, attrs):
+        self.atual.filhos.append(NoHTML(tag, attrs, self.atual))
+
+    def handle_endtag(self, tag):
+        no = self.atual
+        while no.pai is not None and no.tag != tag:
+            no = no.pai
+        if no.pai is not None:   # fechamento sem abertura correspondente é ignorado
+            self.atual = no.pai
+
+    def handle_data(self, dados):
+        self.atual.filhos.append(dados)
+
+class DocumentoHTML:
+    """Página corrente do motor HTTP: árvore + índice por id, atualizada pelos <update> do JSF."""
+
+    def __init__(self, html):
+        self.raiz = self._analisar(html)
+        self._ids = {}
+        self._indexar(self.raiz)
+
+    @staticmethod
+    def _analisar(html):
+        construtor = _ConstrutorDOM()
+        construtor.feed(html)
+        construtor.close()
+        return construtor.raiz
+
+    def _indexar(self, no):
+        for n in no.iterar():
+            if n.get("id"):
+                self._ids[n.get("id")] = n
+
+    def por_id(self, id_):
+        return self._ids.get(id_) if id_ else None
+
+    def substituir(self, id_, html):
+        """Troca o elemento `id_` pelo fragmento. False se o id não está na página."""
+        alvo = self._ids.get(id_)
+        if alvo is None or alvo.pai is None:
+            return False
+        for n in alvo.iterar():
+            if self._ids.get(n.get("id")) is n:
+                del self._ids[n.get("id")]
+        novos = self._analisar(html).filhos
+        for f in novos:
+            if isinstance(f, NoHTML):
+                f.pai = alvo.pai
+                self._indexar(f)
+        i = next(k for k, f in enumerate(alvo.pai.filhos) if f is alvo)
+        alvo.pai.filhos[i:i + 1] = novos
+        return True
+
+    def substituir_linhas(self, id_, html):
+        """Troca só as linhas do <tbody> do datatable `id_` (resposta de paginação do
+        PrimeFaces, que traz apenas os <tr>). False se a tabela não está na página."""
+        alvo = self._ids.get(id_)
+        corpo = None
+        if alvo is not None:
+            corpos = alvo.todos("tbody")
+            corpo = next((t for t in corpos if "ui-datatable-data" in t.get("class", "").split()), None) or next(iter(corpos), None)
+        if corpo is None:
+            return False
+        for f in corpo.filhos:
+            if isinstance(f, NoHTML):
+                for n in f.iterar():
+                    if self._ids.get(n.get("id")) is n:
+                        del self._ids[n.get("id")]
+        corpo.filhos = self._analisar(html).filhos
+        for f in corpo.filhos:
+            if isinstance(f, NoHTML):
+                f.pai = corpo
+                self._indexar(f)
+        return True
+
+def serializar_form(form):
+    """Pares (nome, valor) que o navegador enviaria no submit do formulário."""
+    dados = []
+    for no in form.iterar():
+        nome = no.get("name")
+        if not nome or "disabled" in no.attrs:
+            continue
+        if no.tag == "input":
+            tipo = no.get("type", "text").lower()
+            if tipo in ("submit", "button", "image", "reset", "file"):
+                continue
+            if tipo in ("checkbox", "radio"):
+                if "checked" in no.attrs:
+                    dados.append((nome, no.get("value", "on")))
+                continue
+            dados.append((nome, no.get("value", "")))
+        elif no.tag == "select":
+            opcoes = no.todos("option")
+            marcadas = [o for o in opcoes if "selected" in o.attrs]
+            if not marcadas and opcoes and "multiple" not in no.attrs:
+                marcadas = opcoes[:1]
+            dados.extend((nome, o.get("value", o.texto())) for o in marcadas)
+        elif no.tag == "textarea":
+            dados.append((nome, no.texto()))
+    return dados
+
+class ClienteJSF:
+    """Sessão HTTP de um worker do motor HTTP: cookies, página corrente e ViewState.
+    Cada requisição conta como uma chamada no rastreamento e alimenta o orçamento de
+    timeouts e o disjuntor, como as esperas do #aguarde no Selenium."""
+
+    def __init__(self, url_sistema, usuario, senha):
+        self.url_sistema = url_sistema
+        self.usuario = usuario
+        self.senha = senha
+        self.http = requests.Session()
+        self.doc = None
+        self.url = url_sistema
+        self.viewstate = None
+        self.linhas_por_pagina = None   # da tabela de médicos, definido por ler_medicos_http
+
+    def _requisitar(self, metodo, url, etapa, **kwargs):
+        orcamento = orcamento_timeouts.limite(etapa)
+        _ctx_worker.chamadas = getattr(_ctx_worker, "chamadas", 0) + 1
+        t0 = time.perf_counter()
+        estourou = False
+        try:
+            resp = self.http.request(metodo, url, timeout=orcamento, **kwargs)
+        except requests.Timeout as e:
+            estourou = True
+            raise SessaoExpiradaJSF(f"sem resposta em {orcamento:.0f}s ({etapa})") from e
+        except requests.RequestException as e:
+            raise SessaoExpiradaJSF(f"falha de rede: {e}") from e
+        finally:
+            duracao = time.perf_counter() - t0
+            _registrar_espera(etapa, duracao, estourou)
+            orcamento_timeouts.registrar(etapa, duracao)
+            disjuntor.registrar(duracao, estourou)
+        if resp.status_code in (401, 403):
+            raise SessaoExpiradaJSF(f"HTTP {resp.status_code}")
+        if resp.status_code >= 400:
+            raise ProtocoloJSFError(f"HTTP {resp.status_code} em {etapa}")
+        return resp
+
+    def _carregar(self, resp):
+        self.url = resp.url
+        self.doc = DocumentoHTML(resp.text)
+        campo = next(iter(self.doc.raiz.todos("input", name="javax.faces.ViewState")), None)
+        self.viewstate = campo.get("value") if campo is not None else None
+
+    def na_tela_de_login(self):
+        return self.doc is not None and self.doc.por_id("login") is not None and self.doc.por_id("senha") is not None
+
+    @rastrear("login")
+    def entrar(self):
+        log("🔑 Iniciando Login (HTTP)...")
+        self.http.cookies.clear()
+        self._carregar(self._requisitar("GET", self.url_sistema, "http:login"))
+        campo_login, campo_senha = self.doc.por_id("login"), self.doc.por_id("senha")
+        form = campo_login.ancestral("form") if campo_login is not None else None
+        if form is None or campo_senha is None:
+            raise ProtocoloJSFError("formulário de login não reconhecido")
+        campo_login.attrs["value"] = self.usuario
+        campo_senha.attrs["value"] = self.senha
+        dados = serializar_form(form)
+        botao = self.doc.por_id("botaoEntrar")
+        if botao is not None and botao.get("name"):
+            dados.append((botao.get("name"), botao.get("value", "")))
+        self._carregar(self._requisitar("POST", urljoin(self.url, form.get("action") or self.url), "http:login", data=dados))
+        if self.na_tela_de_login():
+            raise ProtocoloJSFError("login recusado (usuário/senha?)")
+        log("✅ Login enviado!")
+
+    @rastrear("navegar_lista")
+    def abrir_lista(self):
+        """GET da lista de Funcionários (view nova, ViewState novo)."""
+        link = next((a for a in self.doc.raiz.todos("a") if CAMINHO_LISTA in a.get("href", "")), None) if self.doc else None
+        url = urljoin(self.url, link.get("href")) if link is not None else urljoin(self.url_sistema, CAMINHO_LISTA)
+        self._carregar(self._requisitar("GET", url, "http:lista"))
+        if self.na_tela_de_login():
+            raise SessaoExpiradaJSF("redirecionado para o login")
+        if not self.viewstate:
+            raise ProtocoloJSFError("lista de Funcionários sem javax.faces.ViewState")
+
+    def comportamento(self, no, evento=None):
+        """Parâmetros do PrimeFaces.ab do componente: do onclick ou, para eventos (change),
+        dos behaviors declarados nos <script> da página."""
+        id_ = no.get("id")
+        if evento is None:
+            m = RE_AB.search(no.get("onclick", ""))
+            if m:
+                return {k: a or b for k, a, b in RE_AB_PARAM.findall(m.group(1))}
+        else:
+            for script in self.doc.raiz.todos("script"):
+                for m in RE_AB.finditer(script.codigo()):
+                    cfg = {k: a or b for k, a, b in RE_AB_PARAM.findall(m.group(1))}
+                    if cfg.get("s") == id_ and cfg.get("e", evento) == evento:
+                        return cfg
+        form = no.ancestral("form")
+        return {"s": id_, "f": form.get("id") if form is not None else None, "p": id_, "u": "@form"}
+
+    def postback(self, no, etapa, evento=None):
+        """Envia o postback parcial do componente `no` com o formulário dele e aplica o
+        <partial-response>. Retorna os args da extensão do PrimeFaces (ex.: validationFailed)."""
+        cfg = self.comportamento(no, evento)
+        origem = cfg.get("s") or no.get("id")
+        form = self.doc.por_id(cfg.get("f")) or no.ancestral("form")
+        if not origem or form is None:
+            raise ProtocoloJSFError(f"componente sem id/formulário para o postback ({etapa})")
+        params = [("javax.faces.source", origem), ("javax.faces.partial.execute", cfg.get("p") or origem),
+                  ("javax.faces.partial.render", cfg.get("u") or "@form")]
+        if evento:
+            params += [("javax.faces.behavior.event", evento), ("javax.faces.partial.event", evento)]
+        else:
+            params.append((origem, origem))
+        return self._enviar(form, params, etapa)
+
+    def paginar(self, tabela, primeira, linhas, etapa="http:paginar"):
+        """Postback de paginação do DataTable, o mesmo que o widget envia ao trocar de página
+        ou de linhas por página. A resposta traz só os <tr>, que substituem o <tbody>."""
+        id_ = tabela.get("id")
+        form = tabela.ancestral("form")
+        if not id_ or form is None:
+            raise ProtocoloJSFError("datatable sem id/formulário para paginar")
+        params = [("javax.faces.source", id_), ("javax.faces.partial.execute", id_),
+                  ("javax.faces.partial.render", id_), ("javax.faces.behavior.event", "page"),
+                  ("javax.faces.partial.event", "page"), (f"{id_}_pagination", "true"),
+                  (f"{id_}_first", str(primeira)), (f"{id_}_rows", str(linhas)),
+                  (f"{id_}_skipChildren", "true"), (f"{id_}_encodeFeature", "true")]
+        return self._enviar(form, params, etapa, linhas_de=id_)
+
+    def _enviar(self, form, params, etapa, linhas_de=None):
+        dados = [(k, v) for k, v in serializar_form(form) if k != "javax.faces.ViewState"]
+        if form.get("id") and not any(k == form.get("id") for k, _ in dados):
+            dados.append((form.get("id"), form.get("id")))
+        dados += [("javax.faces.partial.ajax", "true")] + params + [("javax.faces.ViewState", self.viewstate)]
+        resp = self._requisitar("POST", urljoin(self.url, form.get("action") or self.url), etapa, data=dados,
+                                headers={"Faces-Request": "partial/ajax", "X-Requested-With": "XMLHttpRequest"})
+        return self._aplicar_parcial(resp.text, linhas_de)
+
+    def _aplicar_parcial(self, texto, linhas_de=None):
+        try:
+            raiz = ET.fromstring(texto.strip().encode("utf-8"))
+        except ET.ParseError:
+            if "senha" in texto.lower():
+                raise SessaoExpiradaJSF("postback respondido com a tela de login")
+            raise ProtocoloJSFError("resposta do postback não é um <partial-response>")
+        if raiz.tag != "partial-response":
+            raise ProtocoloJSFError(f"resposta inesperada <{raiz.tag}>")
+        redirect = raiz.find("redirect")
+        if redirect is not None:
+            raise SessaoExpiradaJSF(f"redirect para {redirect.get('url')}")
+        erro = raiz.find("error")
+        if erro is not None:
+            nome = erro.findtext("error-name", "")
+            if "ViewExpired" in nome:
+                raise SessaoExpiradaJSF("ViewState expirado")
+            raise ProtocoloJSFError(f"erro do JSF: {nome} {erro.findtext('error-message', '')}".strip())
+        args = {}
+        for el in raiz.iter():
+            if el.tag == "update":
+                id_, conteudo = el.get("id", ""), el.text or ""
+                if "javax.faces.ViewState" in id_:
+                    self.viewstate = conteudo.strip()
+                elif id_ == "javax.faces.ViewRoot":
+                    self.doc = DocumentoHTML(conteudo)
+                elif id_ == linhas_de:
+                    if not self.doc.substituir_linhas(id_, conteudo):
+                        raise ProtocoloJSFError(f"datatable {id_} sumiu da página ao paginar")
+                else:
+                    self.doc.substituir(id_, conteudo)   # id fora da página: o PrimeFaces também ignora
+            elif el.tag == "extension" and el.get("type") == "args":
+                try: args.update(json.loads(el.text or "{}"))
+                except ValueError: pass
+        return args
+
+    def quit(self):
+        self.http.close()
+
+def _clicavel(no):
+    """O próprio elemento ou o ancestral que recebe o clique (id + onclick, <a>, <button>)."""
+    while no is not None and no.tag != "#documento":
+        if no.get("id") and (no.get("onclick") or no.tag in ("a", "button")):
+            return no
+        no = no.pai
+    return None
+
+def _botao_por_texto(raiz, texto, fora_de_dialogo=False):
+    for no in raiz.iterar():
+        if no.tag not in ("button", "a") and not (no.tag == "input" and no.get("type") in ("submit", "button")):
+            continue
+        rotulo = no.get("value", "") if no.tag == "input" else no.texto()
+        if (rotulo == texto or no.get("title") == texto) and not (fora_de_dialogo and no.ancestral(classe="ui-dialog")):
+            return no
+    return None
+
+def _campo_por_rotulo(doc, texto):
+    """Input associado ao <label> `texto` (atributo for ou o primeiro input depois dele)."""
+    achou = False
+    for no in doc.raiz.iterar():
+        if no.tag == "label" and no.texto() == texto:
+            alvo = doc.por_id(no.get("for"))
+            if alvo is not None and alvo.tag == "input":
+                return alvo
+            achou = True
+        elif achou and no.tag == "input" and no.get("type", "text") == "text":
+            return no
+    return None
+
+def _mensagens_erro(raiz):
+    return [n.texto() for n in raiz.iterar()
+            if any(c in n.get("class", "").split() for c in ("ui-messages-error", "ui-message-error")) and n.texto()]
+
+def _lapis_secretaria_http(doc, login_secretaria, contem=False):
+    """Lápis da linha da secretaria nos resultados da pesquisa (regra de JS_ABRIR_SECRETARIA;
+    `contem` só logo após pesquisar pelo próprio login)."""
+    alvo = login_secretaria.upper()
+    parciais = []
+    for img in doc.raiz.todos("img", title="Alterar"):
+        tr = img.ancestral("tr")
+        if tr is None or alvo not in tr.texto().upper():
+            continue
+        if any(td.texto().upper() == alvo for td in tr.todos("td")):
+            return _clicavel(img)
+        parciais.append(img)
+    return _clicavel(parciais[0]) if contem and len(parciais) == 1 else None
+
+@rastrear("pesquisar_secretaria")
+def pesquisar_secretaria_http(cli, login_secretaria):
+    """Abre a secretaria: direto pelo lápis se ela já está nos resultados; senão pesquisa
+    pelos termos de navegacao.termos. False se não apareceu."""
+    atualizar_status(secretaria=login_secretaria, medico="—")
+    lapis = _lapis_secretaria_http(cli.doc, login_secretaria)
+    if lapis is not None:
+        log(f"↪ [NAVEGAÇÃO] {login_secretaria}: aberta direto dos resultados da pesquisa.")
+        cli.postback(lapis, "http:abrir_secretaria")
+        return True
+    for termo in navegacao.termos(login_secretaria):
+        log(f"🔍 [NAVEGAÇÃO] Pesquisando: {termo}")
+        campo = _campo_por_rotulo(cli.doc, "Login") or cli.doc.por_id("j_idt129")
+        botao = _botao_por_texto(cli.doc.raiz, "Pesquisar")
+        if campo is None or botao is None:
+            raise ProtocoloJSFError("tela de pesquisa não reconhecida")
+        campo.attrs["value"] = termo
+        cli.postback(botao, "http:pesquisar")
+        lapis = _lapis_secretaria_http(cli.doc, login_secretaria, contem=termo == login_secretaria)
+        if lapis is not None:
+            navegacao.achou(login_secretaria, termo)
+            cli.postback(lapis, "http:abrir_secretaria")
+            return True
+        navegacao.falhou(login_secretaria, termo)
+    return False
+
+@rastrear("voltar_pesquisa")
+def voltar_http(cli):
+    log("🔙 [NAVEGAÇÃO] Voltando...")
+    botao = _botao_por_texto(cli.doc.raiz, "Cancelar", fora_de_dialogo=True)
+    if botao is not None:
+        cli.postback(botao, "http:voltar")
+    else:
+        cli.abrir_lista()
+
+def _tabela_medicos_http(doc):
+    """Mesmo localizador dos JS da tabela de médicos: 1º datatable com tr[data-ri] com lápis;
+    sem datatable, a tabela do primeiro lápis."""
+    for div in doc.raiz.todos("div"):
+        if "ui-datatable" in div.get("class", "").split() and any(
+                img.ancestral("tr") is not None and img.ancestral("tr").get("data-ri") is not None
+                for img in div.todos("img", title="Alterar")):
+            return div
+    primeiro = next(iter(doc.raiz.todos("img", title="Alterar")), None)
+    return primeiro.ancestral("table") if primeiro is not None else None
+
+def linhas_medicos_http(doc):
+    """Mesmas linhas de JS_SNAPSHOT_MEDICOS (página corrente), lidas do DOM em memória,
+    mais o id do lápis ('origem')."""
+    tabela = _tabela_medicos_http(doc)
+    linhas = []
+    for i, img in enumerate(tabela.todos("img", title="Alterar") if tabela is not None else []):
+        lapis = _clicavel(img)
+        linha = {"indice": i, "nome": "", "ativo": True, "texto": "", "chave": None,
+                 "origem": lapis.get("id") if lapis is not None else None}
+        tr = img.ancestral("tr")
+        if tr is not None:
+            td = next(iter(tr.todos("td")), None)
+            linha["nome"] = td.texto() if td is not None else ""
+            linha["texto"] = tr.texto()
+            linha["chave"] = tr.get("data-rk") or tr.get("data-ri")
+            icones = [n.get("src", "") for n in tr.todos("img") if "ativar.png" in n.get("src", "")]
+            inativar = any("inativar.png" in src for src in icones)
+            ativar = any("inativar.png" not in src for src in icones)
+            linha["ativo"] = True if inativar else (False if ativar else "Sim" in linha["texto"])
+        linhas.append(linha)
+    return linhas
+
+def _linhas_por_pagina_http(tabela):
+    """(atual, maior) do select de linhas por página do paginador, como valores do select;
+    None sem paginador. Mesma regra do JS_PAGINADOR_MEDICOS: "*" (Todos) vale mais que
+    qualquer número."""
+    select = next((n for n in tabela.todos("select") if "ui-paginator-rpp-options" in n.get("class", "").split()), None)
+    if select is None:
+        return None
+    peso = lambda v: math.inf if v == "*" else int(v)
+    opcoes = [v for v in (o.get("value") or "" for o in select.todos("option")) if v == "*" or v.isdigit()]
+    if not opcoes:
+        return None
+    marcada = next((o.get("value") for o in select.todos("option") if "selected" in o.attrs), None)
+    return (marcada if marcada in opcoes else opcoes[0]), max(opcoes, key=peso)
+
+def ler_medicos_http(cli):
+    """snapshot_medicos do motor HTTP: pede o máximo de linhas por página (ou Todos) e lê todas as
+    páginas (uma requisição por página, parando na primeira incompleta). Cada linha leva
+    "pagina"; cli.linhas_por_pagina guarda o tamanho usado, para voltar à página depois."""
+    tabela = _tabela_medicos_http(cli.doc)
+    rpp = _linhas_por_pagina_http(tabela) if tabela is not None else None
+    cli.linhas_por_pagina = None
+    if rpp is None:
+        return linhas_medicos_http(cli.doc)
+    atual, maior = rpp
+    if maior == "*":   # "Todos": rows=0 traz a tabela inteira numa requisição, como o widget do PrimeFaces
+        if atual != "*":
+            cli.paginar(tabela, 0, 0)
+        return linhas_medicos_http(cli.doc)
+    atual, por_pagina = int(atual), int(maior)
+    cli.linhas_por_pagina = por_pagina
+    linhas, chaves, pagina = [], set(), 0
+    while True:
+        if pagina or atual != por_pagina:
+            cli.paginar(_tabela_medicos_http(cli.doc), pagina * por_pagina, por_pagina)
+        novas = [l for l in linhas_medicos_http(cli.doc) if l["chave"] is None or l["chave"] not in chaves]
+        for linha in novas:
+            chaves.add(linha["chave"])
+            linha["pagina"] = pagina
+            linha["indice"] = len(linhas)
+            linhas.append(linha)
+        if len(novas) < por_pagina:
+            break
+        pagina += 1
+    if pagina:
+        log(f"   [TABELA] {len(linhas)} médicos em {pagina + 1} página(s) de {por_pagina}.")
+    return linhas
+
+def _lapis_medico_http(cli, linha):
+    """Re-localiza o lápis da linha (a tabela é re-renderizada a cada Salvar): confere a
+    chave/nome na posição esperada; se mudou de lugar, procura pela chave ou pelo nome;
+    se a linha está em outra página, pagina até ela."""
+    def mesma(l):
+        return l["chave"] == linha["chave"] if linha["chave"] else l["nome"] == linha["nome"]
+    def procurar():
+        no = cli.doc.por_id(linha["origem"])
+        tr = no.ancestral("tr") if no is not None else None
+        if tr is not None:
+            td = next(iter(tr.todos("td")), None)
+            atual = {"chave": tr.get("data-rk") or tr.get("data-ri"), "nome": td.texto() if td is not None else ""}
+            if mesma(atual):
+                return no
+        for l in linhas_medicos_http(cli.doc):
+            if mesma(l):
+                return cli.doc.por_id(l["origem"])
+        return None
+    no = procurar()
+    if no is None and linha.get("pagina") is not None and cli.linhas_por_pagina:
+        tabela = _tabela_medicos_http(cli.doc)
+        if tabela is not None:
+            cli.paginar(tabela, linha["pagina"] * cli.linhas_por_pagina, cli.linhas_por_pagina)
+            no = procurar()
+    return no
+
+def _checkbox_http(doc, form, alvo):
+    padroes = [p.lower() for p in alvo["rotulo"]]
+    for label in form.todos("label"):
+        if not all(p in label.texto().lower() for p in padroes):
+            continue
+        no = doc.por_id(label.get("for"))
+        if no is None or no.get("type") != "checkbox":
+            caixa = label.ancestral("tr") or label.pai
+            no = next((n for n in caixa.todos("input") if n.get("type") == "checkbox"), None)
+        if no is not None:
+            return no
+    return None
+
+def garantir_checkboxes_http(doc, form, alvos):
+    """garantir_checkboxes sobre o formulário em memória: ajusta os inputs antes do postback.
+    Alvos sem rótulo ("Todas as transações") viram a seleção de todas as linhas (*_selection)
+    do datatable. Retorna {id: {"encontrado", "ok", "alterado"}}."""
+    res = {}
+    for a in alvos:
+        if a.get("rotulo"):
+            no = _checkbox_http(doc, form, a)
+            antes = no is not None and "checked" in no.attrs
+            if no is not None:
+                if a["marcado"]: no.attrs["checked"] = "checked"
+                else: no.attrs.pop("checked", None)
+        else:
+            no = next((n for n in form.todos("input") if n.get("name", "").endswith("_selection")), None)
+            tabela = no.ancestral(classe="ui-datatable") if no is not None else None
+            chaves = [tr.get("data-rk") for tr in tabela.todos("tr") if tr.get("data-rk")] if tabela is not None else []
+            antes = bool(chaves) and set(chaves) <= set(no.get("value", "").split(","))
+            if no is not None:
+                no.attrs["value"] = ",".join(chaves) if a["marcado"] else ""
+        res[a["id"]] = {"encontrado": no is not None, "ok": no is not None,
+                        "alterado": no is not None and antes != a["marcado"]}
+        if no is None:
+            log(f"      [AVISO] Checkbox '{a['nome']}' não encontrado.")
+        elif res[a["id"]]["alterado"]:
+            log(f"      ✅ '{a['nome']}' {'marcado' if a['marcado'] else 'desmarcado'}.")
+    return res
+
+def vincular_logins_http(form, lista_logins):
+    """vincular_logins_em_lote sobre o <select multiple> do escolherLogins em memória.
+    Retorna (houve_alteracao, [rótulos marcados, rótulos desmarcados]) ou (False, None)."""
+    select = next((n for n in form.todos("select")
+                   if (n.get("id") or n.get("name", "")).endswith("escolherLogins_input")), None)
+    if select is None:
+        log("      [AVISO] Dropdown escolherLogins não encontrado.")
+        return False, None
+    opcoes = select.todos("option")
+    houve_alt = False
+    for login in lista_logins or ["*"]:
+        casam = opcoes if login == "*" else [o for o in opcoes if login_corresponde(o.texto(), login)]
+        novas = [o for o in casam if "selected" not in o.attrs]
+        for o in novas:
+            o.attrs["selected"] = "selected"
+        nome = login if login != "*" else "todos os logins"
+        if novas:
+            houve_alt = True
+            log(f"      + Vinculado: {nome} ({len(novas)} opção(ões))")
+        if not casam and login != "*":
+            log(f"      [AVISO] Login '{login}' não encontrado no escolherLogins.")
+    return houve_alt, [[o.texto() for o in opcoes if "selected" in o.attrs],
+                       [o.texto() for o in opcoes if "selected" not in o.attrs]]
+
+def _salvar_http(cli, form, etapa="http:salvar"):
+    """Clica Salvar no formServico. Retorna None se salvou ou a mensagem de erro do NTISS."""
+    botao = _botao_por_texto(form, "Salvar")
+    if botao is None:
+        raise ProtocoloJSFError("botão Salvar não encontrado")
+    args = cli.postback(botao, etapa)
+    form = cli.doc.por_id("formServico")
+    erros = _mensagens_erro(form) if form is not None else []
+    if args.get("validationFailed") or erros:
+        return "; ".join(erros) or "validação do formulário"
+    return None
+
+def _registrar_http(feitos, modo, secretaria, medico, status, detalhe=""):
+    registrar_resultado(modo, secretaria, medico, status, detalhe)
+    if status in JournalExecucao.CONCLUIDOS:
+        feitos[(modo, medico)] = status
+
+def vincular_http(cli, lista_logins, filtro_medicos, secretaria, feitos):
+    """executar_logica_vincular_logins pelo motor HTTP. Sem alteração não há postback
+    algum (o diálogo é re-renderizado ao abrir o próximo médico).
+    Retorna os médicos do filtro não encontrados na secretaria."""
+    if filtro_medicos is not None:
+        filtro_medicos = fonte_medicos(filtro_medicos)
+        log(f"   [VINCULAR] Filtro ativo: {filtro_medicos}.")
+    linhas = ler_medicos_http(cli)
+    if not linhas: return []
+    total_proc = len(linhas)
+    log(f"   [VINCULAR] Processando {total_proc} médicos...")
+    alvos, nao_encontrados = None, []
+    if filtro_medicos is not None:
+        alvos, nao_encontrados, _ = casar_filtro(linhas, filtro_medicos, secretaria)
+
+    for i, linha in enumerate(linhas):
+        if solicitar_finalizacao:
+            log("🛑 Processo interrompido pelo usuário")
+            return []
+        if checar_pausa():
+            log("   ⏭ Secretaria pulada pelo usuário.")
+            return []
+        nome_medico = linha["nome"] or f"Médico {i+1}"
+        log(f"   --- [{i+1}/{total_proc}] {nome_medico} ---")
+        atualizar_status(medico=nome_medico)
+        if alvos is not None and i not in alvos:
+            log("   -> Pulando (não está na lista para vincular).")
+            continue
+        if ("vincular", nome_medico) in feitos or ja_concluido("vincular", secretaria, nome_medico):
+            log("   -> Já concluído (retomada).")
+            continue
+        if not linha["ativo"]:
+            log("   -> Inativo.")
+            _registrar_http(feitos, "vincular", secretaria, nome_medico, "inativo")
+            continue
+        if cache_vinculos.completo(secretaria, nome_medico, lista_logins):
+            log("   -> Já configurado (cache), sem abrir o modal.")
+            _registrar_http(feitos, "vincular", secretaria, nome_medico, "sem_alteracao", "cache")
+            continue
+        try:
+            lapis = _lapis_medico_http(cli, linha)
+            if lapis is None:
+                log("   [ERRO] Linha do médico não encontrada na tabela (re-renderizada?).")
+                _registrar_http(feitos, "vincular", secretaria, nome_medico, "erro", "linha não encontrada")
+                continue
+            with rastrear("vincular:abrir_modal"):
+                cli.postback(lapis, "http:abrir_medico")
+            form = cli.doc.por_id("formServico")
+            if form is None:
+                raise ProtocoloJSFError("formServico não abriu")
+            with rastrear("vincular:checkboxes"):
+                chks = garantir_checkboxes_http(cli.doc, form, [ALVO_VISUALIZA_OUTROS, ALVO_CANCELA_OUTROS])
+            houve_alt = any(c["alterado"] for c in chks.values())
+            with rastrear("vincular:logins"):
+                alterou_logins, estado_logins = vincular_logins_http(form, lista_logins)
+            status_final, detalhe = "sem_alteracao", ""
+            with rastrear("vincular:salvar"):
+                if houve_alt or alterou_logins:
+                    log("      💾 Salvando alterações...")
+                    detalhe = _salvar_http(cli, form) or ""
+                    status_final = "erro" if detalhe else "vinculado"
+                    if detalhe:
+                        log(f"      [ERRO] NTISS recusou o Salvar: {detalhe}")
+                else:
+                    log("      ↩ Sem alterações, nada a enviar.")
+            _registrar_http(feitos, "vincular", secretaria, nome_medico, status_final, detalhe)
+            if status_final != "erro" and estado_logins:
+                cache_vinculos.atualizar(secretaria, nome_medico, chks["visualiza"]["ok"], chks["cancela"]["ok"],
+                                         *estado_logins)
+            else:
+                cache_vinculos.invalidar(secretaria, nome_medico)
+        except (SessaoExpiradaJSF, ProtocoloJSFError):
+            cache_vinculos.invalidar(secretaria, nome_medico)
+            raise
+        except Exception as e:
+            log(f"   [ERRO] Médico {i+1}: {e}")
+            _registrar_http(feitos, "vincular", secretaria, nome_medico, "erro", e)
+            cache_vinculos.invalidar(secretaria, nome_medico)
+
+    if filtro_medicos is not None and nao_encontrados:
+        log(f"   [VINCULAR] {len(nao_encontrados)} médico(s) não encontrado(s) na secretaria.")
+    return nao_encontrados
+
+def _select_prestador(form):
+    if form is None: return None
+    return next((n for n in form.todos("select")
+                 if (n.get("id") or n.get("name", "")).endswith("prestadorFuncionario_input")), None)
+
+@rastrear("cadastrar:abrir_modal")
+def _abrir_criar_servico_http(cli):
+    botao = _botao_por_texto(cli.doc.raiz, "Criar Serviço")
+    if botao is None:
+        raise ProtocoloJSFError("botão 'Criar Serviço' não encontrado")
+    cli.postback(botao, "http:abrir_modal")
+    form = cli.doc.por_id("formServico")
+    if _select_prestador(form) is None:
+        raise ProtocoloJSFError("modal 'Criar Serviço' sem a lista de prestadores")
+    return form
+
+def cadastrar_http(cli, medicos, secretaria, feitos):
+    """executar_logica_cadastrar_servicos pelo motor HTTP: por médico, um postback de
+    'change' no prestador e um Salvar (mais a reabertura do modal, se ele fechar)."""
+    medicos = fonte_medicos(medicos)
+    log(f"   [CADASTRAR] Iniciando lista de {medicos}...")
+    cadastrados_agora = []
+    concluidos = 0
+    def _pendentes():
+        nonlocal concluidos
+        for lote in medicos.lotes(secretaria):
+            for m in lote:
+                if ("cadastrar", m) in feitos or ja_concluido("cadastrar", secretaria, m):
+                    concluidos += 1
+                else:
+                    yield m
+    pendentes = _pendentes()
+    primeiro = next(pendentes, None)
+    if primeiro is None:
+        if concluidos:
+            log(f"      -> {concluidos} já concluídos (retomada).")
+        return cadastrados_agora
+    pendentes = itertools.chain([primeiro], pendentes)
+
+    form = _abrir_criar_servico_http(cli)
+    rotulos = [o.texto() for o in _select_prestador(form).todos("option") if o.get("value")]
+    indice = IndiceNomes(rotulos)
+    fila, ja_cadastrados = [], 0
+    for nome_medico in pendentes:
+        rotulo, camada = localizar_prestador(indice, nome_medico)
+        if rotulo:
+            fila.append((nome_medico, rotulo))
+        elif IndiceNomes.revisar(camada):
+            _registrar_http(feitos, "cadastrar", secretaria, nome_medico, "erro", f"nome a revisar na lista de prestadores ({camada})")
+        else:
+            ja_cadastrados += 1
+            log(f"      [JÁ CADASTRADO] {nome_medico} não está na lista de prestadores.")
+            _registrar_http(feitos, "cadastrar", secretaria, nome_medico, "ja_cadastrado")
+    log(f"   [CADASTRAR] {len(rotulos)} prestadores na lista -> {len(fila)} a cadastrar, "
+        f"{ja_cadastrados} já cadastrados.")
+    if concluidos:
+        log(f"      -> {concluidos} já concluídos (retomada).")
+
+    for index, (nome_medico, rotulo) in enumerate(fila):
+        if solicitar_finalizacao:
+            log("🛑 Processo interrompido pelo usuário")
+            break
+        if checar_pausa():
+            log("   ⏭ Secretaria pulada pelo usuário.")
+            break
+        log(f"   --- [{index+1}/{len(fila)}] {nome_medico} ---")
+        atualizar_status(medico=nome_medico)
+        try:
+            with rastrear("cadastrar:selecionar"):
+                select = _select_prestador(cli.doc.por_id("formServico"))
+                if select is None:   # o diálogo fechou após o último Salvar
+                    select = _select_prestador(_abrir_criar_servico_http(cli))
+                opcoes = select.todos("option")
+                opcao = next((o for o in opcoes if o.texto() == rotulo), None)
+                if opcao is None:
+                    log("      [JÁ CADASTRADO] Médico não apareceu na lista.")
+                    _registrar_http(feitos, "cadastrar", secretaria, nome_medico, "ja_cadastrado")
+                    continue
+                for o in opcoes:
+                    o.attrs.pop("selected", None)
+                opcao.attrs["selected"] = "selected"
+                componente = cli.doc.por_id(select.get("id", "")[:-len("_input")]) or select
+                cli.postback(componente, "http:selecionar_prestador", evento="change")
+            form = cli.doc.por_id("formServico")
+            if form is None:
+                raise ProtocoloJSFError("formServico sumiu após selecionar o prestador")
+            with rastrear("cadastrar:checkboxes"):
+                garantir_checkboxes_http(cli.doc, form, [ALVO_VISUALIZA_OUTROS, ALVO_CANCELA_OUTROS, ALVO_TODAS_TRANSACOES])
+            with rastrear("cadastrar:salvar"):
+                erro = _salvar_http(cli, form)
+            if erro:
+                log(f"      [ERRO] NTISS recusou o Salvar: {erro}")
+                _registrar_http(feitos, "cadastrar", secretaria, nome_medico, "erro", erro)
+                continue
+            log("      -> Sucesso (Cadastrado).")
+            _registrar_http(feitos, "cadastrar", secretaria, nome_medico, "cadastrado")
+            cadastrados_agora.append(nome_medico)
+        except (SessaoExpiradaJSF, ProtocoloJSFError):
+            raise
+        except Exception as e:
+            log(f"      [ERRO INTERNO] {e}")
+            _registrar_http(feitos, "cadastrar", secretaria, nome_medico, "erro", e)
+    return cadastrados_agora
+
+def _executar_modo_http(cli, op, sec, dados, feitos):
+    """Mesmo roteiro de processar_secretaria (plano, auto-cadastro e auto-vincular)."""
+    acoes = (dados.get("plano") or {}).get(sec)
+    logins = dados.get("logins_para_vincular", [])
+    if op == '2':
+        medicos = acoes.get("cadastrar", []) if acoes is not None else dados.get("medicos_para_cadastrar", [])
+        return cadastrar_http(cli, medicos, sec, feitos)
+    if acoes is None:
+        nao_encontrados = vincular_http(cli, logins, dados.get("medicos_para_vincular") or None, sec, feitos)
+    else:
+        nao_encontrados = acoes.get("cadastrar", [])
+        if acoes.get("vincular"):
+            vincular_http(cli, logins, acoes["vincular"], sec, feitos)
+    if nao_encontrados and not solicitar_finalizacao:
+        log(f"   [AUTO-CADASTRO] {len(nao_encontrados)} médico(s) não encontrado(s) → iniciando Cadastro...")
+        cadastrados_agora = cadastrar_http(cli, nao_encontrados, sec, feitos)
+        if cadastrados_agora and not solicitar_finalizacao:
+            log(f"   [AUTO-VINCULAR] Vinculando {len(cadastrados_agora)} médico(s) recém-cadastrado(s)...")
+            vincular_http(cli, logins, cadastrados_agora, sec, feitos)
+    return None
+
+@rastrear("secretaria")
+def processar_secretaria_http(cli, op, sec, dados):
+    """processar_secretaria pelo motor HTTP. Sessão expirada: refaz o login e a secretaria
+    (no máximo SESSAO_MAX_RECUPERACOES vezes), sem repetir os médicos já registrados.
+    Tela fora do esperado: retorna FALLBACK_SELENIUM e o Selenium pula o que já foi feito."""
+    modo = MODOS[op]
+    descartar_skip_pendente()
+    resultados.iniciar_secretaria(sec)
+    _ctx_worker.pulou = False
+    feitos = {}   # {(modo, médico): status} registrados nesta visita
+    cadastrados, concluiu = None, False
+    for tentativa in range(SESSAO_MAX_RECUPERACOES + 1):
+        try:
+            if not pesquisar_secretaria_http(cli, sec):
+                log(f"   [AVISO] '{sec}' não encontrado/erro.")
+                registrar_resultado(modo, sec, None, "erro", "secretaria não encontrada")
+                return None
+            cadastrados = _executar_modo_http(cli, op, sec, dados, feitos)
+            voltar_http(cli)
+            concluiu = True
+            break
+        except SessaoExpiradaJSF as e:
+            log(f"🩺 [SESSÃO] {e} — refazendo o login (HTTP)...")
+            if tentativa == SESSAO_MAX_RECUPERACOES:
+                break
+            try:
+                cli.entrar()
+                cli.abrir_lista()
+            except (SessaoExpiradaJSF, ProtocoloJSFError) as e2:
+                log(f"   [ERRO] Falha ao recuperar a sessão: {e2}")
+                break
+        except Exception as e:
+            log(f"   [MOTOR HTTP] {e} — a secretaria volta para o Selenium.")
+            for (m, medico), status in feitos.items():
+                _execucao["retomada"][(m, sec, _chave_medico(medico))] = status
+            try: cli.abrir_lista()
+            except Exception: pass
+            return FALLBACK_SELENIUM
+    if not concluiu:
+        registrar_resultado(modo, sec, None, "erro", "sessão perdida")
+    elif not solicitar_finalizacao and not _ctx_worker.pulou:
+        concluir_secretaria(modo, sec)
+    return cadastrados
+
+def abrir_cliente_jsf():
+    """Sessão do motor HTTP para um worker do pool (login + lista de Funcionários)."""
+    cli = ClienteJSF(URL_SISTEMA, USUARIO_LOGIN, SENHA_LOGIN)
+    try:
+        cli.entrar()
+        cli.abrir_lista()
+        return cli
+    except (SessaoExpiradaJSF, ProtocoloJSFError) as e:
+        log(f"[ERRO] Motor HTTP não conseguiu abrir a lista de Funcionários: {e}")
+        cli.quit()
+        return None
+
+def executar_motor_http(op, dados, secretarias):
+    """Processa as secretarias com WORKERS_HTTP (padrão NUM_WORKERS) sessões HTTP. Retorna as que devem ser
+    refeitas pelo Selenium (tela não reconhecida ou motor indisponível)."""
+    if requests is None:
+        log("[AVISO] Motor HTTP exige o pacote 'requests' (pip install requests) — usando o Selenium.")
+        return secretarias
+    if not (USUARIO_LOGIN and SENHA_LOGIN):
+        log("[AVISO] Motor HTTP exige usuário/senha no config.json — usando o Selenium.")
+        return secretarias
+    voltar = set()
+    def ao_concluir(sec, retorno):
+        if retorno is FALLBACK_SELENIUM:
+            voltar.add(sec)
+        else:
+            _guardar_cadastrados(sec, retorno)
+    log(f"🌐 [MOTOR HTTP] {len(secretarias)} secretaria(s) por postbacks JSF, sem navegador.")
+    voltar.update(executar_pool_secretarias(op, dados, secretarias, tarefa=processar_secretaria_http,
+                                            ao_concluir=ao_concluir, abrir=abrir_cliente_jsf,
+                                            workers=WORKERS_HTTP or NUM_WORKERS))
+    return [sec for sec in secretarias if sec in voltar]
+
+# ==============================================================================
+# PLANO / APLICAR (DIFF ENTRE dados.json E O NTISS)
+# ==============================================================================
+# `plan` só lê: tabela de médicos de cada secretaria, lista de prestadores do modal e o
+# cache de estado do vínculo (checkboxes/logins não aparecem na tabela — quem não tem
+# estado conhecido entra como "vincular" e o modal decide se salva). `apply` executa
+# só as ações do plano; secretarias sem ação nem são abertas.
+
+ACOES_PLANO = ("cadastrar", "vincular", "noop", "inativos", "revisar")
+
+def planejar_vincular(driver, sec, dados):
+    linhas = snapshot_medicos(driver)
+    logins = dados.get("logins_para_vincular", [])
+    filtro = dados.get("medicos_para_vincular") or None
+    acoes = {a: [] for a in ACOES_PLANO}
+    alvos = None
+    if filtro is not None:
+        alvos, acoes["cadastrar"], acoes["revisar"] = casar_filtro(linhas, filtro, sec)
+    for i, linha in enumerate(linhas):
+        if alvos is not None and i not in alvos:
+            continue
+        nome = linha["nome"] or linha["texto"]
+        if not linha["ativo"]:
+            acoes["inativos"].append(nome)
+        elif cache_vinculos.completo(sec, nome, logins):
+            acoes["noop"].append(nome)
+        else:
+            acoes["vincular"].append(nome)
+    return acoes
+
+def planejar_cadastrar(driver, sec, dados):
+    acoes = {a: [] for a in ACOES_PLANO}
+    nomes = list(fonte_medicos(dados.get("medicos_para_cadastrar")).para(sec))
+    if not nomes:
+        return acoes
+    if not abrir_modal_servico(driver):
+        raise RuntimeError("modal Criar Serviço não abriu")
+    rotulos = ler_prestadores(driver)
+    fechar_modal_servico(driver)
+    if rotulos is None:
+        log("   [AVISO] Lista de prestadores não encontrada; todos os nomes entram no plano.")
+        acoes["cadastrar"] = nomes
+        return acoes
+    indice = IndiceNomes(rotulos)
+    for nome in nomes:
+        rotulo, camada = localizar_prestador(indice, nome)
+        acoes["cadastrar" if rotulo else "revisar" if IndiceNomes.revisar(camada) else "noop"].append(nome)
+    return acoes
+
+@rastrear("plano:secretaria")
+def planejar_secretaria(driver, op, sec, dados):
+    """Lê o estado da secretaria e devolve {ação: [médicos]}; None se não abriu."""
+    if not navegar_pesquisar_secretaria(driver, sec):
+        motivo = diagnosticar_sessao(driver)
+        if not (motivo and recuperar_sessao(driver, sec, motivo)):
+            log("   [ERRO] Secretaria não encontrada; fica fora do plano.")
+            return None
+    try:
+        acoes = (planejar_vincular if op == '1' else planejar_cadastrar)(driver, sec, dados)
+    except Exception as e:
+        log(f"   [ERRO] Falha ao planejar a secretaria: {e}")
+        acoes = None
+    voltar_para_pesquisa(driver)
+    if acoes is not None:
+        resumo = " | ".join(f"{a}: {len(acoes[a])}" for a in ACOES_PLANO if acoes[a])
+        log(f"   [PLANO] {resumo or 'Nada a fazer.'}")
+    return acoes
+
+def gerar_plano(driver, op, dados):
+    """Passada só de leitura sobre todas as secretarias (em paralelo se workers > 1)."""
+    secretarias = dados.get("secretarias_para_pesquisar", [])
+    planos = {}
+    log(f"🗺 [PLANO] Lendo {len(secretarias)} secretaria(s) para {MODOS[op]}...")
+    navegacao.preparar(secretarias)
+    if NUM_WORKERS > 1 and len(secretarias) > 1 and USUARIO_LOGIN and SENHA_LOGIN:
+        executar_pool_secretarias(op, dados, secretarias, tarefa=planejar_secretaria,
+                                  ao_concluir=lambda sec, acoes: planos.__setitem__(sec, acoes))
+    else:
+        for idx, sec in enumerate(secretarias):
+            if solicitar_finalizacao:
+                break
+            log(f"\n=== SECRETARIA [{idx+1}/{len(secretarias)}]: {sec} ===")
+            atualizar_status(secretaria=sec)
+            planos[sec] = planejar_secretaria(driver, op, sec, dados)
+    totais = Counter()
+    for acoes in planos.values():
+        for a, nomes in (acoes or {}).items():
+            totais[a] += len(nomes)
+    return {
+        "modo": MODOS[op],
+        "gerado": datetime.now().isoformat(timespec="seconds"),
+        "logins_para_vincular": list(dados.get("logins_para_vincular", [])),
+        "secretarias": {sec: planos.get(sec) for sec in secretarias},
+        "totais": dict(totais),
+        "secretarias_sem_leitura": [sec for sec in secretarias if planos.get(sec) is None],
+        "interrompido": solicitar_finalizacao,
+    }
+
+def gravar_plano(caminho, plano):
+    os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+    tmp = caminho + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(plano, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, caminho)
+
+def dados_do_plano(plano):
+    """Monta o `dados` de executar_ciclo com só as secretarias que têm ação no plano."""
+    com_acao = [sec for sec, acoes in plano["secretarias"].items()
+                if acoes and (acoes.get("cadastrar") or acoes.get("vincular"))]
+    return {"secretarias_para_pesquisar": com_acao,
+            "logins_para_vincular": plano.get("logins_para_vincular", []),
+            "plano": {sec: plano["secretarias"][sec] for sec in com_acao}}
+
+# ==============================================================================
+# MAIN
+# ==============================================================================
+
+def vincular_pos_cadastro(driver, dados):
+    """Executa o Vincular apenas nos médicos cadastrados nesta sessão (modo 2)."""
+    log(f"[VINCULAR PÓS-CADASTRO] {len(medicos_cadastrados_sessao)} secretaria(s).")
+    secs_com_cadastro = list(medicos_cadastrados_sessao.keys())
+    for idx, sec in enumerate(secs_com_cadastro):
+        if solicitar_finalizacao:
+            log("🛑 Execução finalizada pelo usuário!")
+            break
+        descartar_skip_pendente()
+        filtro = medicos_cadastrados_sessao[sec]
+        log(f"\n=== SECRETARIA [{idx+1}/{len(secs_com_cadastro)}]: {sec} ({len(filtro)} médico(s)) ===")
+        if navegar_pesquisar_secretaria(driver, sec):
+            executar_logica_vincular_logins(driver, dados.get("logins_para_vincular", []), filtro_medicos=filtro, secretaria=sec)
+            voltar_para_pesquisa(driver)
+            if solicitar_finalizacao:
+                break
+    log("✅ VINCULAR PÓS-CADASTRO FINALIZADO!")
+
+@rastrear("ciclo")
+def executar_ciclo(driver, op, dados, retomar=False):
+    """Executa um ciclo completo do modo `op` ('1' Vincular / '2' Cadastrar) sobre `dados`.
+    Retorna o resumo da execução (dicionário serializável em JSON)."""
+    global medicos_cadastrados_sessao
+    medicos_cadastrados_sessao = {}
+    inicio = time.time()
+    secretarias = dados.get("secretarias_para_pesquisar", [])
+
+    iniciar_execucao(MODOS[op], retomar=retomar)
+    descartar_skip_pendente()
+    if op == '1':
+        cache_vinculos.iniciar_passada()
+    if retomar:
+        concluidas = [s for s in secretarias if ja_concluido(MODOS[op], s)]
+        if concluidas:
+            log(f"♻ [RETOMADA] Pulando {len(concluidas)} secretaria(s) já concluída(s).")
+            secretarias = [s for s in secretarias if s not in concluidas]
+
+    total_secs = len(secretarias)
+    log(f"🚀 Iniciando: {total_secs} secretaria(s) | {fonte_medicos(dados.get('medicos_para_cadastrar'))}")
+    navegacao.preparar(secretarias)
+
+    if MOTOR == "http" and secretarias:
+        secretarias = executar_motor_http(op, dados, secretarias)
+        if secretarias and not solicitar_finalizacao:
+            log(f"[MOTOR HTTP] {len(secretarias)} secretaria(s) seguem pelo Selenium.")
+    if solicitar_finalizacao:
+        secretarias = []
+
+    usar_pool = NUM_WORKERS > 1 and len(secretarias) > 1
+    if usar_pool and not (USUARIO_LOGIN and SENHA_LOGIN):
+        log("[AVISO] Pool de workers exige usuário/senha no config.json — executando em sessão única.")
+        usar_pool = False
+    if usar_pool:
+        executar_pool_secretarias(op, dados, secretarias)
+    elif secretarias:
+        proprio = driver is None   # motor http no modo lote: Chrome só para o fallback
+        if proprio:
+            driver = abrir_chrome()
+        try:
+            for idx, sec in enumerate(secretarias if driver else []):
+                if solicitar_finalizacao:
+                    log("🛑 Execução finalizada pelo usuário!")
+                    break
+                log(f"\n=== SECRETARIA [{idx+1}/{len(secretarias)}]: {sec} ===")
+                atualizar_status(secretaria=sec)
+                cadastrados = processar_secretaria(driver, op, sec, dados)
+                if cadastrados:
+                    medicos_cadastrados_sessao[sec] = cadastrados
+                if solicitar_finalizacao:
+                    break
+        finally:
+            if proprio and driver:
+                driver.quit()
+
+    if not solicitar_finalizacao:
+        log("✅ CICLO FINALIZADO!")
+    else:
+        log("🛑 Processo encerrado.")
+    return resumo_execucao(op, inicio, total_secs)
+
+def resumo_execucao(op, inicio, total_secs):
+    """Resumo do ciclo (stdout do modo lote); também grava os relatórios CSV/JSON da execução."""
+    with _contagem_lock:
+        contagem = dict(_execucao["contagem"])
+    resumo = {
+        "modo": MODOS[op],
+        "execucao": _execucao["id"],
+        "inicio": datetime.fromtimestamp(inicio).isoformat(timespec="seconds"),
+        "duracao_s": round(time.time() - inicio, 1),
+        "secretarias": total_secs,
+        "resultados": contagem,
+        "interrompido": solicitar_finalizacao,
+        "disjuntor_aberturas": disjuntor.total_aberturas,
+    }
+    arquivos = resultados.exportar(resumo)
+    if arquivos:
+        resumo["relatorios"] = list(arquivos)
+    return resumo
+
+def finalizar_ciclo():
+    journal.sincronizar()
+    rastreador.sincronizar()
+    cache_vinculos.salvar()
+    localizadores.salvar()
+    navegacao.salvar()
+    log_estatisticas_espera()
 
 def executar_robo_completo(driver):
-    global solicitar_finalizacao, medicos_cadastrados_sessao, _menu_escolha
+    global solicitar_finalizacao, _menu_escolha, _retomar_escolha
     while True:
         solicitar_finalizacao = False
         _pause_event.set()
         if ui:
             ui.habilitar_menu()
             log("⏳ Aguardando escolha no painel flutuante...")
+            _menu_event.clear()
+            _menu_event.wait()
         else:
             print("\n" + "="*60)
             print(" 1 - Vincular Logins")
@@ -918,9 +4261,8 @@ def executar_robo_completo(driver):
             print(" 0 - Sair")
             print("="*60)
             _menu_escolha = input(">>> Escolha: ").strip()
-
-        _menu_event.clear()
-        _menu_event.wait()
+            if _menu_escolha in ('1', '2'):
+                _retomar_escolha = input(">>> Retomar a última execução deste modo? (s/n): ").strip().lower() == 's'
         op = _menu_escolha
 
         if solicitar_finalizacao or op == '0':
@@ -930,44 +4272,12 @@ def executar_robo_completo(driver):
             log("[AVISO] Opção inválida.")
             continue
 
-        medicos_cadastrados_sessao = {}
-        dados = carregar_json(ARQUIVO_DADOS)
-        secretarias = dados.get("secretarias_para_pesquisar", [])
-        if not secretarias:
+        dados = carregar_dados(ARQUIVO_DADOS)
+        if not dados or not dados.get("secretarias_para_pesquisar"):
             log("[ERRO] Lista de secretarias vazia!")
             continue
 
-        total_secs = len(secretarias)
-        log(f"🚀 Iniciando: {total_secs} secretaria(s) | {len(dados.get('medicos_para_cadastrar', []))} médico(s)")
-
-        for idx, sec in enumerate(secretarias):
-            if solicitar_finalizacao:
-                log("🛑 Execução finalizada pelo usuário!")
-                break
-            log(f"\n=== SECRETARIA [{idx+1}/{total_secs}]: {sec} ===")
-            if ui: ui.status(secretaria=sec)
-            if navegar_pesquisar_secretaria(driver, sec):
-                if op == '1':
-                    filtro_json = dados.get("medicos_para_vincular") or None
-                    nao_encontrados = executar_logica_vincular_logins(driver, dados.get("logins_para_vincular", []), filtro_medicos=filtro_json)
-                    if nao_encontrados and not solicitar_finalizacao:
-                        log(f"   [AUTO-CADASTRO] {len(nao_encontrados)} médico(s) não encontrado(s) → iniciando Cadastro...")
-                        cadastrados_agora = executar_logica_cadastrar_servicos(driver, nao_encontrados)
-                        if cadastrados_agora and not solicitar_finalizacao:
-                            log(f"   [AUTO-VINCULAR] Vinculando {len(cadastrados_agora)} médico(s) recém-cadastrado(s)...")
-                            executar_logica_vincular_logins(driver, dados.get("logins_para_vincular", []), filtro_medicos=cadastrados_agora)
-                elif op == '2':
-                    cadastrados = executar_logica_cadastrar_servicos(driver, dados.get("medicos_para_cadastrar", []))
-                    if cadastrados:
-                        medicos_cadastrados_sessao[sec] = cadastrados
-                voltar_para_pesquisa(driver)
-                if solicitar_finalizacao:
-                    break
-
-        if not solicitar_finalizacao:
-            log("✅ CICLO FINALIZADO!")
-        else:
-            log("🛑 Processo encerrado.")
+        executar_ciclo(driver, op, dados, retomar=_retomar_escolha)
 
         # Após modo 2, oferece vincular logins apenas nos médicos cadastrados
         if op == '2' and medicos_cadastrados_sessao and not solicitar_finalizacao:
@@ -982,42 +4292,239 @@ def executar_robo_completo(driver):
             )
             if resp:
                 solicitar_finalizacao = False
-                log(f"[VINCULAR PÓS-CADASTRO] {len(medicos_cadastrados_sessao)} secretaria(s).")
-                secs_com_cadastro = list(medicos_cadastrados_sessao.keys())
-                for idx, sec in enumerate(secs_com_cadastro):
-                    if solicitar_finalizacao:
-                        log("🛑 Execução finalizada pelo usuário!")
-                        break
-                    filtro = medicos_cadastrados_sessao[sec]
-                    log(f"\n=== SECRETARIA [{idx+1}/{len(secs_com_cadastro)}]: {sec} ({len(filtro)} médico(s)) ===")
-                    if navegar_pesquisar_secretaria(driver, sec):
-                        executar_logica_vincular_logins(driver, dados.get("logins_para_vincular", []), filtro_medicos=filtro)
-                        voltar_para_pesquisa(driver)
-                        if solicitar_finalizacao:
-                            break
-                log("✅ VINCULAR PÓS-CADASTRO FINALIZADO!")
+                vincular_pos_cadastro(driver, dados)
+                resultados.exportar()
 
-if __name__ == "__main__":
-    # Inicia o browser
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()))
-    driver.maximize_window()
-    driver.get(URL_SISTEMA)
+        finalizar_ciclo()
 
-    if USUARIO_LOGIN and SENHA_LOGIN:
-        realizar_login_automatico(driver)
+# ==============================================================================
+# CLI / MODO LOTE (sem Tkinter)
+# ==============================================================================
+
+def carregar_configuracao(caminho):
+    """Relê o config (CLI --config) e recria os objetos de estado que dependem dele."""
+    global journal, cache_vinculos, rastreador, orcamento_timeouts, disjuntor, localizadores, resultados, navegacao
+    conf = carregar_json(caminho)
+    if not conf:
+        return False
+    aplicar_configuracao(conf)
+    configurar_log()
+    journal = JournalExecucao(ARQUIVO_JOURNAL)
+    rastreador = RastreadorSpans(ARQUIVO_TRACE, RASTREAMENTO_ATIVO)
+    orcamento_timeouts = OrcamentoTimeouts(TIMEOUT_FATOR, TIMEOUT_MINIMO, TIMEOUT_AGUARDE)
+    disjuntor = DisjuntorNTISS(DISJUNTOR_LENTAS, DISJUNTOR_LENTO_S, DISJUNTOR_BACKOFF_S, DISJUNTOR_BACKOFF_MAX_S)
+    cache_vinculos = CacheEstadoVinculo(ARQUIVO_CACHE_VINCULOS, CACHE_TTL_HORAS, CACHE_VERIFICAR_A_CADA)
+    localizadores = RegistroLocalizadores(ARQUIVO_LOCALIZADORES)
+    navegacao = CacheNavegacao(ARQUIVO_NAVEGACAO)
+    resultados = ResultadosExecucao(PASTA_RESULTADOS, RELATORIOS_ATIVOS)
+    return True
+
+def executar_lote(args):
+    """Execução não interativa: sem painel, resumo JSON no stdout, logs no stderr.
+    `run` executa o modo; `plan` só lê e grava o plano; `apply` executa o plano.
+    Código de saída: 0 ok, 1 houve erros, 2 configuração/inicialização, 130 interrompido."""
+    global _saida_log, solicitar_finalizacao, WORKERS_HEADLESS, SEM_CSS, NUM_WORKERS, MOTOR
+    _saida_log = sys.stderr
+    if args.config and not carregar_configuracao(args.config):
+        log(f"[ERRO] Config inválido: {args.config}")
+        return 2
+    if not CONF or not URL_SISTEMA:
+        log("[ERRO] Arquivo config.json não encontrado ou inválido.")
+        return 2
+    caminho_plano = getattr(args, "plano", None) or ARQUIVO_PLANO
+    if args.comando == "apply":
+        plano = carregar_json(caminho_plano)
+        if not plano or plano.get("modo") not in MODOS.values() or "secretarias" not in plano:
+            log(f"[ERRO] Plano inválido: {caminho_plano}")
+            return 2
+        args.mode = plano["modo"]
+        dados = dados_do_plano(plano)
+        log(f"🗺 [APPLY] Plano de {plano.get('gerado', '?')}: {len(dados['secretarias_para_pesquisar'])} secretaria(s) com ação.")
+        if not dados["secretarias_para_pesquisar"]:
+            resumo = {"modo": args.mode, "plano": caminho_plano, "resultados": {}, "interrompido": False}
+            print(json.dumps(resumo, ensure_ascii=False))
+            return 0
     else:
-        print(">>> [AVISO] Usuário/Senha não configurados no JSON. Faça login manual.")
+        dados = carregar_dados(args.dados)
+        if not dados or not dados.get("secretarias_para_pesquisar"):
+            log(f"[ERRO] Arquivo de dados inválido ou sem secretarias: {args.dados}")
+            return 2
+    if args.workers:
+        NUM_WORKERS = max(1, args.workers)
+    if args.headless:
+        WORKERS_HEADLESS = True
+    if args.sem_css:
+        SEM_CSS = True
 
-    navegar_para_lista_funcionarios(driver)
+    if getattr(args, "motor", None):
+        MOTOR = args.motor
 
-    # Cria a janela flutuante no thread principal (obrigatório para Tkinter)
-    root = tk.Tk()
-    ui = FloatingUI(root)
+    op = {"vincular": '1', "cadastrar": '2'}[args.mode]
+    driver = None
+    resumo = None
+    iniciado = False   # config e Chrome/login prontos: daqui em diante a falha é da execução
+    falha = None
+    try:
+        if not (USUARIO_LOGIN and SENHA_LOGIN):
+            log("[ERRO] Modo lote exige usuário/senha no config.json.")
+            return 2
+        if MOTOR != "http" or args.comando == "plan":   # o plan sempre lê pelo Selenium
+            tempos = TemposInicio()
+            driver = abrir_chrome(headless=args.headless, tempos=tempos)
+            if driver is None:
+                return 2
+            tempos.resumo()
+        iniciado = True
+        inicio = time.time()
+        if args.comando == "plan":
+            resumo = gerar_plano(driver, op, dados)
+            gravar_plano(caminho_plano, resumo)
+            log(f"🗺 [PLANO] Gravado em {caminho_plano}: " + ", ".join(f"{k}={v}" for k, v in resumo["totais"].items()))
+            resumo = {k: resumo[k] for k in ("modo", "gerado", "totais", "secretarias_sem_leitura", "interrompido")}
+            resumo["plano"] = caminho_plano
+            resumo["resultados"] = {"secretarias_erro": len(resumo["secretarias_sem_leitura"])}
+        else:
+            resumo = executar_ciclo(driver, op, dados, retomar=getattr(args, "retomar", False))
+        if op == '2' and getattr(args, "vincular_cadastrados", False) and medicos_cadastrados_sessao and not solicitar_finalizacao:
+            driver = driver or abrir_chrome(headless=args.headless)
+            vincular_pos_cadastro(driver, dados)
+            resumo = resumo_execucao(op, inicio, resumo["secretarias"])
+    except KeyboardInterrupt:
+        solicitar_finalizacao = True
+        log("🛑 Interrompido (Ctrl+C).")
+    except Exception as e:
+        if not iniciado:
+            log(f"❌ Falha na inicialização do modo lote: {e}")
+            return 2
+        falha = e
+        log(f"❌ Falha durante a execução do modo lote: {e}")
+    finally:
+        finalizar_ciclo()
+        if driver:
+            try: driver.quit()
+            except: pass
+
+    if resumo is None:   # parcial: o que foi registrado até a interrupção/falha
+        resumo = {"modo": args.mode, "execucao": _execucao["id"], "resultados": dict(_execucao["contagem"]),
+                  "interrompido": falha is None}
+    if falha is not None:
+        resumo["falha"] = str(falha)[:300]
+    texto = json.dumps(resumo, ensure_ascii=False)
+    print(texto)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+    if resumo.get("interrompido"):
+        return 130
+    if falha is not None:
+        return 1
+    return 1 if resumo["resultados"].get("erro") or resumo["resultados"].get("secretarias_erro") else 0
+
+def _parser_cli():
+    parser = argparse.ArgumentParser(prog="autotiss", description="Automação NTISS (Vincular / Cadastrar).")
+    sub = parser.add_subparsers(dest="comando")
+    run = sub.add_parser("run", help="Execução em lote, sem painel (servidor/cron).")
+    plan = sub.add_parser("plan", help="Só lê o NTISS e grava o plano de ações (nada é alterado).")
+    apply = sub.add_parser("apply", help="Executa apenas as ações de um plano gerado por 'plan'.")
+    for p in (run, plan):
+        p.add_argument("--mode", required=True, choices=("vincular", "cadastrar"))
+        p.add_argument("--dados", default=ARQUIVO_DADOS, help="arquivo de dados (padrão: dados.json)")
+    for p in (plan, apply):
+        p.add_argument("--plano", help="arquivo do plano (padrão: <pasta_estado>/plano.json)")
+    for p in (run, plan, apply):
+        p.add_argument("--config", help="arquivo de configuração (padrão: config.json)")
+        p.add_argument("--headless", action="store_true", help="Chrome sem janela, sem carregar imagens")
+        p.add_argument("--sem-css", action="store_true", help="também bloqueia CSS (use com cuidado)")
+        p.add_argument("--workers", type=int, help="sobrescreve 'workers' do config")
+        p.add_argument("--saida", help="grava também o resumo JSON neste arquivo")
+    for p in (run, apply):
+        p.add_argument("--motor", choices=("selenium", "http"), help="sobrescreve 'motor' do config")
+        p.add_argument("--retomar", action="store_true", help="retoma a última execução do modo (journal)")
+        p.add_argument("--vincular-cadastrados", action="store_true",
+                       help="no modo cadastrar, vincula logins nos médicos cadastrados ao final")
+    rel = sub.add_parser("relatorio", help="Perfil de uma execução a partir do trace (p50/p95/máx por etapa).")
+    rel.add_argument("--config", help="arquivo de configuração (define a pasta_estado)")
+    rel.add_argument("--trace", help="arquivo de trace (padrão: <pasta_estado>/trace.jsonl)")
+    rel.add_argument("--sessao", help="sessão do trace (padrão: a última)")
+    rel.add_argument("--exec", dest="execucao", help="filtra por id de execução do journal")
+    rel.add_argument("--json", action="store_true", help="imprime o relatório em JSON")
+    return parser
+
+def executar_relatorio(args):
+    """Imprime o perfil agregado por etapa. Código de saída 1 se não houver spans."""
+    if args.config and not carregar_configuracao(args.config):
+        print(f"[ERRO] Config inválido: {args.config}", file=sys.stderr)
+        return 2
+    caminho = args.trace or ARQUIVO_TRACE
+    rel = relatorio_spans(caminho, sessao=args.sessao, execucao=args.execucao)
+    if not rel:
+        print(f"[AVISO] Nenhum span encontrado em {caminho}.", file=sys.stderr)
+        return 1
+    if args.json:
+        print(json.dumps(rel, ensure_ascii=False, indent=2))
+        return 0
+    t = rel["totais"]
+    print(f"Sessão {rel['sessao']}" + (f" · execução {rel['exec']}" if rel["exec"] else "")
+          + f" · {t['medicos']} médico(s) · {t['spans']} spans")
+    print(f"{'etapa':<28} {'n':>6} {'p50 (s)':>8} {'p95 (s)':>8} {'máx (s)':>8} {'total (s)':>10} "
+          f"{'calls':>7} {'calls/n':>8} {'sono (s)':>9} {'falhas':>7}")
+    for etapa, e in sorted(rel["etapas"].items(), key=lambda kv: kv[1]["total"], reverse=True):
+        print(f"{etapa:<28} {e['n']:>6} {e['p50']:>8.3f} {e['p95']:>8.3f} {e['max']:>8.3f} {e['total']:>10.2f} "
+              f"{e['calls']:>7} {e['calls_por_span']:>8} {e['sono']:>9.2f} {e['falhas']:>7}")
+    print(f"Total (spans de 1º nível): {t['tempo_somado_s']}s · {t['calls']} chamadas WebDriver · {t['sono_s']}s dormindo")
+    return 0
+
+def _iniciar_navegador(tempos, painel_pronto, sessao):
+    """Thread do bot: abre o Chrome, loga e vai à lista enquanto o painel é montado;
+    só então libera o menu (executar_robo_completo)."""
+    try:
+        driver = criar_driver(tempos=tempos)
+        sessao["driver"] = driver
+        entrou = entrar_no_sistema(driver, tempos)
+    except Exception as e:
+        log(f"[ERRO] Não foi possível abrir o Chrome ou entrar no NTISS: {e}")
+        painel_pronto.wait()
+        if ui:   # sem isso o painel ficaria com os botões desabilitados para sempre
+            ui.falha_inicio((str(e).strip().splitlines() or [type(e).__name__])[0])
+        return
+    painel_pronto.wait()
+    if not entrou:
+        if USUARIO_LOGIN and SENHA_LOGIN:
+            log("[ERRO] Não foi possível entrar no NTISS: login falhou ou a lista de Funcionários não abriu.")
+            if ui:
+                ui.falha_inicio("Não foi possível entrar no NTISS")
+            return
+        # login manual: o menu só é liberado com o aviso explícito
+        log("[AVISO] Faça login no Chrome e abra a lista de Funcionários antes de clicar em Vincular ou Cadastrar.")
+        if ui:
+            ui.status(ntiss="🟡 faça login manual")
+    tempos.resumo()
     log("🏥 Painel iniciado! Clique em Vincular ou Cadastrar para começar.")
+    executar_robo_completo(driver)
+
+def executar_interativo():
+    """Modo padrão: Chrome visível + painel flutuante. O Chrome abre (e loga) em paralelo
+    com a montagem do painel; os botões só habilitam quando os dois estão prontos."""
+    global ui, solicitar_finalizacao
+    if not CONF:
+        raise RuntimeError("Arquivo config.json não encontrado ou inválido. Configure antes de rodar.")
+    if tk is None:
+        raise RuntimeError("Tkinter indisponível — use o modo lote: python -m autotiss run --help")
 
-    # Bot roda em thread separado
-    bot_thread = threading.Thread(target=executar_robo_completo, args=(driver,), daemon=True)
+    tempos = TemposInicio()
+    painel_pronto = threading.Event()
+    sessao = {}
+
+    # Bot roda em thread separado, começando pelo browser
+    bot_thread = threading.Thread(target=_iniciar_navegador, args=(tempos, painel_pronto, sessao), daemon=True)
     bot_thread.start()
+    log("🌐 Abrindo o Chrome e fazendo login...")
+
+    # Cria a janela flutuante no thread principal (obrigatório para Tkinter)
+    with tempos.medir("painel"):
+        root = tk.Tk()
+        ui = FloatingUI(root)
+    painel_pronto.set()
 
     # Tkinter mainloop no thread principal
     root.mainloop()
@@ -1027,4 +4534,13 @@ if __name__ == "__main__":
     _pause_event.set()
     _menu_event.set()
     bot_thread.join(timeout=5)
-    driver.quit()
\ No newline at end of file
+    if sessao.get("driver"):
+        sessao["driver"].quit()
+
+if __name__ == "__main__":
+    args = _parser_cli().parse_args()
+    if args.comando in ("run", "plan", "apply"):
+        sys.exit(executar_lote(args))
+    if args.comando == "relatorio":
+        sys.exit(executar_relatorio(args))
+    executar_interativo()
@@ -0,0 +1,170 @@
+"""
+⏱ BENCHMARK - autotiss contra o mock local do NTISS
+---------------------------------------------------
+Descrição: Sobe o mock_ntiss.py com datasets sintéticos (10/100/1000 médicos),
+           roda os fluxos reais do autotiss.py (Vincular e/ou Cadastrar) em Chrome
+           headless (ou pelo motor HTTP, --motor http) e mede: médicos/minuto,
+           p50/p95 por médico e round-trips (WebDriver ou HTTP) por médico.
+
+Uso:
+    python benchmark_ntiss.py --tamanhos 10,100 --modo ambos --latencia 50 --saida bench.json
+    python benchmark_ntiss.py --tamanhos 100,1000 --motor http
+"""
+
+import json
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import mock_ntiss
+from autotiss import percentil
+
+
+class Medidor:
+    """Conta chamadas de WebDriver e registra o instante/contagem de cada resultado por médico."""
+
+    def __init__(self):
+        self.chamadas = 0
+        self.marcas = []   # (instante, chamadas acumuladas, status)
+
+    def instrumentar(self, driver):
+        original = driver.execute
+
+        def execute(*args, **kwargs):
+            self.chamadas += 1
+            return original(*args, **kwargs)
+
+        driver.execute = execute   # WebElement também passa por driver.execute
+
+    def instrumentar_http(self, autotiss):
+        """Conta as requisições do motor HTTP; devolve a função que desfaz a instrumentação."""
+        original = autotiss.ClienteJSF._requisitar
+
+        def _requisitar(cliente, *args, **kwargs):
+            self.chamadas += 1
+            return original(cliente, *args, **kwargs)
+
+        autotiss.ClienteJSF._requisitar = _requisitar
+        return lambda: setattr(autotiss.ClienteJSF, "_requisitar", original)
+
+    def zerar(self):
+        self.marcas = []
+        self.inicio = time.perf_counter()
+        self.chamadas_inicio = self.chamadas
+
+    def marcar(self, medico, status):
+        if medico:
+            self.marcas.append((time.perf_counter(), self.chamadas, status))
+
+    def metricas(self):
+        tempos, chamadas = [], []
+        t_ant, c_ant = self.inicio, self.chamadas_inicio
+        for t, c, _ in self.marcas:
+            tempos.append(t - t_ant)
+            chamadas.append(c - c_ant)
+            t_ant, c_ant = t, c
+        total = (self.marcas[-1][0] - self.inicio) if self.marcas else 0.0
+        status = {}
+        for _, _, st in self.marcas:
+            status[st] = status.get(st, 0) + 1
+        return {
+            "medicos": len(self.marcas),
+            "duracao_s": round(total, 2),
+            "medicos_por_minuto": round(len(self.marcas) / total * 60, 1) if total else 0.0,
+            "p50_s": round(percentil(tempos, 50), 3),
+            "p95_s": round(percentil(tempos, 95), 3),
+            "chamadas_webdriver_por_medico": round(sum(chamadas) / len(chamadas), 1) if chamadas else 0.0,
+            "status": status,
+        }
+
+
+def rodar_cenario(autotiss, tamanho, modo, latencia_ms, headless, pasta, motor="selenium"):
+    """Executa um modo ('vincular'/'cadastrar') para um dataset de `tamanho` médicos."""
+    if modo == "vincular":
+        srv, base = mock_ntiss.iniciar_mock(latencia_ms=latencia_ms, medicos=tamanho, a_cadastrar=0)
+    else:
+        srv, base = mock_ntiss.iniciar_mock(latencia_ms=latencia_ms, medicos=0, a_cadastrar=tamanho)
+    try:
+        sec = next(iter(srv.estado.secretarias))
+        conf = {"url_sistema": f"{base}/ntiss/login.jsf", "usuario": "bench", "senha": "bench",
+                "timeout_aguarde": 20, "pasta_estado": os.path.join(pasta, f"{modo}-{tamanho}"),
+                "cache_ttl_horas": 0, "motor": motor, "workers_http": 1}
+        caminho_conf = os.path.join(pasta, "config.json")
+        with open(caminho_conf, "w", encoding="utf-8") as f:
+            json.dump(conf, f)
+        autotiss.carregar_configuracao(caminho_conf)
+        dados = {"secretarias_para_pesquisar": [sec], "logins_para_vincular": ["77.hu"],
+                 "medicos_para_vincular": [], "medicos_para_cadastrar": srv.estado.nomes_a_cadastrar(sec)}
+
+        medidor = Medidor()
+        registrar_original = autotiss.registrar_resultado
+
+        def registrar(modo_r, secretaria, medico, status, detalhe=""):
+            medidor.marcar(medico, status)
+            return registrar_original(modo_r, secretaria, medico, status, detalhe)
+
+        autotiss.registrar_resultado = registrar
+        driver, desfazer = None, None
+        try:
+            if motor == "http":   # login e lista entram na medição (cada worker HTTP faz os seus)
+                desfazer = medidor.instrumentar_http(autotiss)
+                medidor.zerar()
+            else:
+                driver = autotiss.criar_driver(headless=headless)
+                medidor.instrumentar(driver)
+                driver.get(conf["url_sistema"])
+                autotiss.realizar_login_automatico(driver)
+                autotiss.navegar_para_lista_funcionarios(driver)
+                medidor.zerar()
+            autotiss.executar_ciclo(driver, "1" if modo == "vincular" else "2", dados)
+            autotiss.finalizar_ciclo()
+        finally:
+            autotiss.registrar_resultado = registrar_original
+            if desfazer:
+                desfazer()
+            if driver:
+                driver.quit()
+        resultado = medidor.metricas()
+        resultado.update(modo=modo, motor=motor, tamanho=tamanho, latencia_ms=latencia_ms, mock=srv.estado.resumo())
+        return resultado
+    finally:
+        srv.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do autotiss contra o mock local do NTISS.")
+    parser.add_argument("--tamanhos", default="10,100,1000", help="quantidades de médicos, separadas por vírgula")
+    parser.add_argument("--modo", choices=("vincular", "cadastrar", "ambos"), default="ambos")
+    parser.add_argument("--latencia", type=int, default=50, help="latência média do mock por requisição (ms)")
+    parser.add_argument("--com-janela", action="store_true", help="roda o Chrome visível (padrão: headless)")
+    parser.add_argument("--motor", choices=("selenium", "http"), default="selenium",
+                        help="http: postbacks JSF direto, sem navegador")
+    parser.add_argument("--saida", help="grava os resultados em JSON")
+    args = parser.parse_args()
+
+    import autotiss
+    autotiss._saida_log = open(os.devnull, "w", encoding="utf-8")   # só a tabela final no console
+
+    modos = ("vincular", "cadastrar") if args.modo == "ambos" else (args.modo,)
+    tamanhos = [int(t) for t in args.tamanhos.split(",") if t.strip()]
+    resultados = []
+    with tempfile.TemporaryDirectory(prefix="autotiss-bench-") as pasta:
+        for modo in modos:
+            for tamanho in tamanhos:
+                print(f"→ {modo} / {tamanho} médicos ...", file=sys.stderr, flush=True)
+                resultados.append(rodar_cenario(autotiss, tamanho, modo, args.latencia, not args.com_janela, pasta,
+                                                args.motor))
+
+    print(f"{'modo':<10} {'médicos':>8} {'méd/min':>9} {'p50 (s)':>8} {'p95 (s)':>8} {'calls/méd':>10}")
+    for r in resultados:
+        print(f"{r['modo']:<10} {r['medicos']:>8} {r['medicos_por_minuto']:>9} {r['p50_s']:>8} "
+              f"{r['p95_s']:>8} {r['chamadas_webdriver_por_medico']:>10}")
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
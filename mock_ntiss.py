@@ -0,0 +1,829 @@
+"""
+🧪 MOCK NTISS - servidor local para testes e benchmark
+------------------------------------------------------
+Descrição: Reproduz os contratos de DOM dos quais o autotiss.py depende
+           (#aguarde, img[title='Alterar'], formServico, prestadorFuncionario,
+           escolherLogins/ui-selectcheckboxmenu) com latência configurável, e a
+           mesma tela como postbacks parciais do PrimeFaces (ViewState por sessão)
+           para o motor HTTP. Só usa a biblioteca padrão.
+
+Uso:
+    python mock_ntiss.py --porta 8099 --medicos 100 --a-cadastrar 10 --latencia 50
+    -> config.json com "url_sistema": "http://127.0.0.1:8099/ntiss/login.jsf"
+"""
+
+import html
+import json
+import random
+import secrets
+import threading
+import time
+import argparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+# PNG 1x1 transparente (ícones inativar/ativar/editar)
+PNG_1X1 = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000100e527d4a20000000049454e44ae426082"
+)
+
+NOMES = ["JOSÉ", "MARIA", "ANA", "JOÃO", "CONCEIÇÃO", "PAULO", "LÚCIA", "CARLOS", "FERNANDA", "ANTÔNIO",
+         "BEATRIZ", "RAFAEL", "CRISTINA", "MÁRCIO", "PATRÍCIA", "GUSTAVO", "HELENA", "SÉRGIO", "LUÍSA", "ANDRÉ"]
+SOBRENOMES = ["SILVA", "SANTOS", "OLIVEIRA", "SOUZA", "LIMA", "PEREIRA", "COSTA", "RODRIGUES", "ALMEIDA",
+              "NASCIMENTO", "ARAÚJO", "FACIOLI", "ROCHA", "GONÇALVES", "MELO", "BARBOSA", "CARDOSO", "TEIXEIRA"]
+
+
+def gerar_nomes(qtd, seed=1):
+    """Gera `qtd` nomes únicos de médicos (com acentos, como no NTISS real)."""
+    rnd = random.Random(seed)
+    nomes, vistos = [], set()
+    while len(nomes) < qtd:
+        nome = f"{rnd.choice(NOMES)} {rnd.choice(SOBRENOMES)} {rnd.choice(SOBRENOMES)}"
+        if nome in vistos:
+            nome = f"{nome} {len(nomes)}"
+        vistos.add(nome)
+        nomes.append(nome)
+    return nomes
+
+
+class EstadoMock:
+    """Estado em memória das secretarias, médicos vinculados e prestadores disponíveis."""
+
+    def __init__(self, secretarias=1, medicos=100, a_cadastrar=0, inativos=0.1, configurados=0.0,
+                 logins=20, seed=1):
+        rnd = random.Random(seed)
+        self.lock = threading.Lock()
+        self.logins = [f"77.hu_login{j:02d}" for j in range(logins)] + [f"88.outro_{j:02d}" for j in range(logins // 4)]
+        self.secretarias = {}
+        self.prestadores = {}
+        nomes = gerar_nomes(secretarias * (medicos + a_cadastrar), seed)
+        for k in range(secretarias):
+            login = f"77.hu_sec{k + 1:03d}"
+            bloco = nomes[k * (medicos + a_cadastrar):(k + 1) * (medicos + a_cadastrar)]
+            meds = []
+            for i, nome in enumerate(bloco[:medicos]):
+                cfg = rnd.random() < configurados
+                meds.append({"id": f"{k + 1}-{i + 1}", "nome": nome, "ativo": rnd.random() >= inativos,
+                             "viz": cfg, "ce": cfg, "logins": list(self.logins) if cfg else []})
+            self.secretarias[login] = {"nome": f"SECRETARIA {k + 1}", "medicos": meds}
+            # Prestadores selecionáveis no "Criar Serviço": todos os ainda não cadastrados
+            self.prestadores[login] = list(bloco[medicos:])
+        self.contadores = {"salvar": 0, "requisicoes": 0}
+
+    def salvar(self, d):
+        """Aplica um Salvar do formServico (chamar com self.lock). Retorna a secretaria ou None."""
+        self.contadores["salvar"] += 1
+        sec = self.secretarias.get(d.get("login"))
+        if sec is None:
+            return None
+        if d.get("modo") == "criar":
+            nome = d.get("nome")
+            if nome in self.prestadores[d["login"]]:
+                self.prestadores[d["login"]].remove(nome)
+                sec["medicos"].append({"id": f"n{len(sec['medicos']) + 1}", "nome": nome, "ativo": True,
+                                       "viz": d.get("viz"), "ce": d.get("ce"), "logins": d.get("logins", []),
+                                       "todas": d.get("todas")})
+        else:
+            med = next((m for m in sec["medicos"] if m["id"] == d.get("id")), None)
+            if med:
+                med.update(viz=d.get("viz"), ce=d.get("ce"), logins=d.get("logins", []))
+        return sec
+
+    def nomes_a_cadastrar(self, login):
+        return list(self.prestadores.get(login, []))
+
+    def resumo(self):
+        with self.lock:
+            out = {}
+            for login, sec in self.secretarias.items():
+                ativos = [m for m in sec["medicos"] if m["ativo"]]
+                out[login] = {
+                    "medicos": len(sec["medicos"]),
+                    "ativos": len(ativos),
+                    "configurados": sum(1 for m in ativos if m["viz"] and m["ce"] and m["logins"]),
+                    "prestadores_restantes": len(self.prestadores[login]),
+                }
+            return {"secretarias": out, "contadores": dict(self.contadores)}
+
+
+PAGINA_LOGIN = """<!DOCTYPE html><html><head><meta charset="utf-8"><title>NTISS (mock) - Login</title></head>
+<body><form method="post" action="/ntiss/login.jsf">
+<label for="login">Login</label> <input id="login" name="login" type="text">
+<label for="senha">Senha</label> <input id="senha" name="senha" type="password">
+<button id="botaoEntrar" type="submit"><span>Entrar</span></button>
+</form></body></html>"""
+
+PAGINA_HOME = """<!DOCTYPE html><html><head><meta charset="utf-8"><title>NTISS (mock)</title>
+<style>.submenu{display:none}</style></head><body>
+<ul><li>Cadastros<ul class="submenu">
+<li><a href="/ntiss/cadastros/funcionario/lista.jsf">Funcionário</a></li>
+</ul></li></ul></body></html>"""
+
+PAGINA_LISTA = r"""<!DOCTYPE html><html><head><meta charset="utf-8"><title>NTISS (mock) - Funcionários</title>
+<style>
+body{font-family:sans-serif;font-size:13px;min-height:1200px}
+img{width:16px;height:16px;cursor:pointer}
+#aguarde{position:fixed;top:0;left:0;right:0;bottom:0;background:rgba(0,0,0,.15);display:none;z-index:1000}
+.oculto{display:none}
+.ui-dialog{position:fixed;top:30px;left:30px;right:30px;max-height:85vh;overflow:auto;background:#fff;border:1px solid #888;display:none;z-index:500;padding:8px}
+.ui-selectonemenu-panel,.ui-selectcheckboxmenu-panel{position:fixed;top:120px;left:60px;width:420px;max-height:320px;overflow:auto;background:#fff;border:1px solid #555;display:none;z-index:800}
+.ui-chkbox-box{display:inline-block;width:14px;height:14px;border:1px solid #333;cursor:pointer;vertical-align:middle}
+.ui-chkbox-box.ui-state-active{background:#1e66f5}
+li{list-style:none;padding:2px}
+</style></head><body>
+<div id="aguarde">Aguarde...</div>
+
+<div id="viewPesquisa"><form id="formPesquisa" name="formPesquisa" onsubmit="return false">
+  <input type="hidden" name="formPesquisa" value="formPesquisa">
+  <label for="j_idt129">Login</label> <input id="j_idt129" name="j_idt129" type="text">
+  <button type="button" id="btnPesquisar" title="Pesquisar"
+          onclick="PrimeFaces.ab({s:&quot;btnPesquisar&quot;,f:&quot;formPesquisa&quot;,p:&quot;formPesquisa&quot;,u:&quot;viewPesquisa&quot;});return false;"><span>Pesquisar</span></button>
+  <table id="resultado"><tbody></tbody></table>
+  <input type="hidden" name="javax.faces.ViewState" id="j_id1:javax.faces.ViewState:0" value="{{VIEWSTATE}}">
+</form></div>
+
+<div id="viewEdicao" class="oculto">
+  <h3 id="tituloSecretaria"></h3>
+  <button type="button" id="btnCriarServico"><span>Criar Serviço</span></button>
+  <div class="ui-datatable" id="tabelaMedicos"><table><tbody class="ui-datatable-data"></tbody></table><div id="paginadorMedicos"></div></div>
+  <table id="dadosSecretaria"><tbody></tbody></table>
+  <button type="button" id="j_idt221"><span>Cancelar</span></button>
+</div>
+
+<div class="ui-dialog" id="dlgServico">
+  <form id="formServico" onsubmit="return false">
+    <div id="formServico:prestadorFuncionario" class="ui-selectonemenu">
+      <label id="formServico:prestadorFuncionario_label">Selecione...</label>
+      <span class="ui-selectonemenu-trigger">&#9660;</span>
+    </div>
+    <div id="nomeMedicoEdicao"></div>
+    <div class="ui-datatable" id="formServico:transacoes" style="display:none">
+      <div class="ui-datatable-scrollable-header">
+        <div class="ui-chkbox"><div class="ui-chkbox-box ui-state-default" id="chkTodas"></div></div> Todas as transações
+      </div>
+    </div>
+    <table id="formServico:opcoes"><tbody>
+      <tr><td><div class="ui-chkbox"><div class="ui-chkbox-box ui-state-default" id="chkViz"></div></div></td>
+          <td><label>Visualiza transações de outros logins?</label></td></tr>
+      <tr><td><div class="ui-chkbox"><div class="ui-chkbox-box ui-state-default" id="chkCe"></div></div></td>
+          <td><label>Cancela/Exclui transações de outros logins?</label></td></tr>
+    </tbody></table>
+    <div id="formServico:escolherLogins" class="ui-selectcheckboxmenu">
+      <span>Escolher Logins</span> <span class="ui-selectcheckboxmenu-trigger">&#9660;</span>
+    </div>
+    <button type="button" id="btnSalvar"><span>Salvar</span></button>
+    <button type="button" id="btnCancelarDlg"><span>Cancelar</span></button>
+  </form>
+</div>
+
+<div id="formServico:prestadorFuncionario_panel" class="ui-selectonemenu-panel">
+  <div class="ui-selectonemenu-filter-container"><input type="text" id="filtroPrestador"></div>
+  <ul class="ui-selectonemenu-items"></ul>
+</div>
+
+<div id="formServico:escolherLogins_panel" class="ui-selectcheckboxmenu-panel">
+  <div class="ui-selectcheckboxmenu-header">
+    <div class="ui-chkbox"><div class="ui-chkbox-box ui-state-default" id="chkLoginsTodos"></div></div>
+    <div class="ui-selectcheckboxmenu-filter-container"><input type="text" id="filtroLogins"></div>
+    <a class="ui-selectcheckboxmenu-close" href="#">&#10005;</a>
+  </div>
+  <ul class="ui-selectcheckboxmenu-items"></ul>
+</div>
+
+<script>
+var LATENCIA_CLIENTE = 0;
+var Q = {requests: [], isEmpty: function () { return this.requests.length === 0; }};
+window.PrimeFaces = {ajax: {Queue: Q}, ab: function () {}};   // ab: postbacks JSF (motor HTTP)
+var POR_PAGINA = {{POR_PAGINA}}, OPCOES_POR_PAGINA = {{OPCOES_POR_PAGINA}};   // 0 = tabela sem paginador
+var est = {login: null, resultados: [], medicos: [], logins: [], modo: null, id: null, prestador: null,
+           pagina: 0, rpp: POR_PAGINA};
+function $(id) { return document.getElementById(id); }
+function esc(t) { return String(t).replace(/[&<>"]/g, function (c) { return {'&':'&amp;','<':'&lt;','>':'&gt;','"':'&quot;'}[c]; }); }
+
+function ajax(url, corpo, cb) {
+  var token = {};
+  Q.requests.push(token);
+  $('aguarde').style.display = 'block';
+  var opts = corpo ? {method: 'POST', headers: {'Content-Type': 'application/json'}, body: JSON.stringify(corpo)} : {};
+  fetch(url, opts)
+    .then(function (r) {
+      if (r.status === 401) { location.href = '/ntiss/login.jsf'; throw new Error('sessao expirada'); }
+      return r.json();
+    })
+    .then(function (d) { if (cb) cb(d); })
+    .catch(function (e) { console.log(e); })
+    .finally(function () {
+      Q.requests.splice(Q.requests.indexOf(token), 1);
+      if (Q.isEmpty()) $('aguarde').style.display = 'none';
+    });
+}
+
+function mostrarView(edicao) {
+  $('viewPesquisa').className = edicao ? 'oculto' : '';
+  $('viewEdicao').className = edicao ? '' : 'oculto';
+  renderResultados(edicao ? [] : est.resultados);   // JSF re-renderiza: a view oculta não fica no DOM
+  if (!edicao) {
+    $('tabelaMedicos').querySelector('tbody').innerHTML = ''; $('paginadorMedicos').innerHTML = '';
+    $('dadosSecretaria').querySelector('tbody').innerHTML = '';
+  }
+}
+
+function renderResultados(rows) {
+  $('resultado').querySelector('tbody').innerHTML = rows.map(function (r) {
+    return '<tr><td>' + esc(r.login) + '</td><td>' + esc(r.nome) + '</td>' +
+           '<td><img title="Alterar" src="/img/editar.png" data-sec="' + esc(r.login) + '"></td></tr>';
+  }).join('');
+}
+
+function totalPaginas() { return est.rpp ? Math.max(1, Math.ceil(est.medicos.length / est.rpp)) : 1; }
+
+// Paginador no formato do PrimeFaces (first/prev/links/next/last + select de linhas por página)
+function renderPaginador() {
+  if (!est.rpp) { $('paginadorMedicos').innerHTML = ''; return; }
+  var paginas = totalPaginas(), p = est.pagina;
+  function botao(cls, txt, off) {
+    return '<a href="#" class="' + cls + ' ui-state-default' + (off ? ' ui-state-disabled' : '') + '">' + txt + '</a>';
+  }
+  var ini = Math.max(0, Math.min(p - 2, paginas - 5)), links = '';
+  for (var i = ini; i < Math.min(paginas, ini + 5); i++)
+    links += '<a href="#" class="ui-paginator-page ui-state-default' + (i === p ? ' ui-state-active' : '') + '">' + (i + 1) + '</a>';
+  var opcoes = OPCOES_POR_PAGINA.map(function (n) {
+    return '<option value="' + n + '"' + (n === est.rpp ? ' selected' : '') + '>' + (n === '*' ? 'Todos' : n) + '</option>';
+  }).join('');
+  $('paginadorMedicos').innerHTML = '<div class="ui-paginator ui-paginator-bottom">' +
+    '<span class="ui-paginator-current">(' + (p + 1) + ' de ' + paginas + ')</span>' +
+    botao('ui-paginator-first', '&laquo;', p === 0) + botao('ui-paginator-prev', '&lsaquo;', p === 0) +
+    '<span class="ui-paginator-pages">' + links + '</span>' +
+    botao('ui-paginator-next', '&rsaquo;', p >= paginas - 1) + botao('ui-paginator-last', '&raquo;', p >= paginas - 1) +
+    '<select class="ui-paginator-rpp-options">' + opcoes + '</select></div>';
+}
+
+function renderMedicos() {
+  est.pagina = Math.min(est.pagina, totalPaginas() - 1);
+  var ini = est.rpp ? est.pagina * est.rpp : 0, fim = est.rpp ? ini + est.rpp : est.medicos.length;
+  $('tabelaMedicos').querySelector('tbody').innerHTML = est.medicos.slice(ini, fim).map(function (m, k) {
+    var icone = m.ativo ? '<img src="/img/inativar.png" title="Inativar">' : '<img src="/img/ativar.png" title="Ativar">';
+    return '<tr data-ri="' + (ini + k) + '" data-rk="' + esc(m.id) + '"><td>' + esc(m.nome) + '</td><td>' + (m.ativo ? 'Sim' : 'Não') +
+           '</td><td>' + icone + '</td><td><img title="Alterar" src="/img/editar.png" data-med="' + esc(m.id) + '"></td></tr>';
+  }).join('');
+  renderPaginador();
+  $('dadosSecretaria').querySelector('tbody').innerHTML =
+    '<tr><td>Dados da secretaria</td><td><img title="Alterar" src="/img/editar.png" data-dados="1"></td></tr>';
+}
+
+function setChk(el, ativo) { el.classList.toggle('ui-state-active', !!ativo); }
+
+function renderLogins(marcados) {
+  $('formServico:escolherLogins_panel').querySelector('ul').innerHTML = est.logins.map(function (l) {
+    var ativo = marcados.indexOf(l) >= 0 ? ' ui-state-active' : '';
+    return '<li class="ui-selectcheckboxmenu-item" data-label="' + esc(l) + '"><div class="ui-chkbox">' +
+           '<div class="ui-chkbox-box ui-state-default' + ativo + '"></div></div><label>' + esc(l) + '</label></li>';
+  }).join('');
+  atualizarHeaderLogins();
+}
+
+function itensVisiveis(painel) {
+  return Array.prototype.filter.call(painel.querySelectorAll('li'), function (li) { return li.style.display !== 'none'; });
+}
+
+function atualizarHeaderLogins() {
+  var vis = itensVisiveis($('formServico:escolherLogins_panel'));
+  setChk($('chkLoginsTodos'), vis.length > 0 && vis.every(function (li) {
+    return li.querySelector('.ui-chkbox-box').classList.contains('ui-state-active');
+  }));
+}
+
+function abrirDialogo(modo, dados) {
+  est.modo = modo; est.prestador = null; est.id = dados.id || null;
+  $('formServico:prestadorFuncionario').style.display = modo === 'criar' ? '' : 'none';
+  $('formServico:prestadorFuncionario_label').textContent = 'Selecione...';
+  $('nomeMedicoEdicao').textContent = modo === 'editar' ? dados.nome : '';
+  $('formServico:transacoes').style.display = modo === 'criar' ? 'none' : '';
+  setChk($('chkViz'), dados.viz); setChk($('chkCe'), dados.ce); setChk($('chkTodas'), false);
+  renderLogins(dados.logins || []);
+  if (modo === 'criar') {
+    $('formServico:prestadorFuncionario_panel').querySelector('ul').innerHTML = dados.prestadores.map(function (n) {
+      return '<li class="ui-selectonemenu-item" data-label="' + esc(n) + '">' + esc(n) + '</li>';
+    }).join('');
+  }
+  $('dlgServico').style.display = 'block';
+}
+
+function fecharPaineis() {
+  $('formServico:prestadorFuncionario_panel').style.display = 'none';
+  $('formServico:escolherLogins_panel').style.display = 'none';
+}
+function fecharDialogo() { fecharPaineis(); $('dlgServico').style.display = 'none'; }
+
+function filtrar(painel, termo, inicio) {
+  termo = termo.toUpperCase();
+  painel.querySelectorAll('li').forEach(function (li) {
+    var t = li.textContent.toUpperCase();
+    li.style.display = (inicio ? t.indexOf(termo) === 0 : t.indexOf(termo) >= 0) ? '' : 'none';
+  });
+}
+
+$('filtroPrestador').addEventListener('input', function () { filtrar($('formServico:prestadorFuncionario_panel'), this.value, false); });
+$('filtroLogins').addEventListener('input', function () {
+  filtrar($('formServico:escolherLogins_panel'), this.value, true);   // PrimeFaces: filterMatchMode startsWith
+  atualizarHeaderLogins();
+});
+
+document.addEventListener('keydown', function (e) { if (e.key === 'Escape') fecharDialogo(); });
+
+// Troca de página / linhas por página: uma ida ao servidor, como o AJAX do datatable
+document.addEventListener('change', function (e) {
+  if (!e.target.matches('#tabelaMedicos select.ui-paginator-rpp-options')) return;
+  var n = e.target.value === '*' ? 0 : parseInt(e.target.value, 10);   // "Todos": sem paginador
+  ajax('/mock/api/ping', null, function () { est.rpp = n; est.pagina = 0; renderMedicos(); });
+});
+
+document.addEventListener('click', function (e) {
+  var t = e.target, el;
+  if ((el = t.closest('#tabelaMedicos .ui-paginator a'))) {
+    e.preventDefault();
+    if (el.classList.contains('ui-state-disabled') || el.classList.contains('ui-state-active')) return;
+    var ultima = totalPaginas() - 1, p = est.pagina;
+    var alvo = el.classList.contains('ui-paginator-first') ? 0 : el.classList.contains('ui-paginator-prev') ? p - 1 :
+               el.classList.contains('ui-paginator-next') ? p + 1 : el.classList.contains('ui-paginator-last') ? ultima :
+               parseInt(el.textContent, 10) - 1;
+    ajax('/mock/api/ping', null, function () { est.pagina = Math.max(0, Math.min(alvo, ultima)); renderMedicos(); });
+  } else if (t.closest('#btnPesquisar')) {
+    var login = $('j_idt129').value;
+    ajax('/mock/api/pesquisar?login=' + encodeURIComponent(login), null, function (rows) {
+      est.resultados = rows; renderResultados(rows);
+    });
+  } else if ((el = t.closest('img[data-sec]'))) {
+    var sec = el.getAttribute('data-sec');
+    ajax('/mock/api/secretaria?login=' + encodeURIComponent(sec), null, function (d) {
+      est.login = sec; est.medicos = d.medicos; est.logins = d.logins; est.pagina = 0;
+      $('tituloSecretaria').textContent = d.nome + ' (' + sec + ')';
+      mostrarView(true); renderMedicos();
+    });
+  } else if ((el = t.closest('img[data-med]'))) {
+    ajax('/mock/api/medico?login=' + encodeURIComponent(est.login) + '&id=' + encodeURIComponent(el.getAttribute('data-med')),
+         null, function (m) { abrirDialogo('editar', m); });
+  } else if (t.closest('#btnCriarServico')) {
+    ajax('/mock/api/prestadores?login=' + encodeURIComponent(est.login), null, function (lista) {
+      abrirDialogo('criar', {prestadores: lista, viz: false, ce: false, logins: []});
+    });
+  } else if (t.closest('#j_idt221')) {
+    ajax('/mock/api/ping', null, function () { mostrarView(false); });
+  } else if (t.closest('#formServico\\:prestadorFuncionario .ui-selectonemenu-trigger') || t.closest('#formServico\\:prestadorFuncionario_label')) {
+    var p = $('formServico:prestadorFuncionario_panel');
+    p.style.display = p.style.display === 'block' ? 'none' : 'block';
+  } else if ((el = t.closest('li.ui-selectonemenu-item'))) {
+    var nome = el.getAttribute('data-label');
+    $('formServico:prestadorFuncionario_panel').style.display = 'none';
+    ajax('/mock/api/ping', null, function () {
+      est.prestador = nome;
+      $('formServico:prestadorFuncionario_label').textContent = nome;
+      $('formServico:transacoes').style.display = '';
+    });
+  } else if (t.closest('#formServico\\:escolherLogins')) {
+    var pl = $('formServico:escolherLogins_panel');
+    $('filtroLogins').value = ''; filtrar(pl, '', true);
+    pl.style.display = 'block'; atualizarHeaderLogins();
+  } else if (t.closest('a.ui-selectcheckboxmenu-close')) {
+    e.preventDefault(); $('formServico:escolherLogins_panel').style.display = 'none';
+  } else if (t.closest('#chkLoginsTodos')) {
+    var vis = itensVisiveis($('formServico:escolherLogins_panel'));
+    var marcar = !$('chkLoginsTodos').classList.contains('ui-state-active');
+    vis.forEach(function (li) { setChk(li.querySelector('.ui-chkbox-box'), marcar); });
+    atualizarHeaderLogins();
+  } else if ((el = t.closest('li.ui-selectcheckboxmenu-item'))) {
+    var box = el.querySelector('.ui-chkbox-box');
+    setChk(box, !box.classList.contains('ui-state-active'));
+    atualizarHeaderLogins();
+  } else if ((el = t.closest('#formServico .ui-chkbox-box'))) {
+    setChk(el, !el.classList.contains('ui-state-active'));
+  } else if (t.closest('#btnSalvar')) {
+    if (est.modo === 'criar' && !est.prestador) return;
+    var marcados = Array.prototype.filter.call(
+      $('formServico:escolherLogins_panel').querySelectorAll('li'),
+      function (li) { return li.querySelector('.ui-chkbox-box').classList.contains('ui-state-active'); }
+    ).map(function (li) { return li.getAttribute('data-label'); });
+    ajax('/mock/api/salvar', {
+      login: est.login, modo: est.modo, id: est.id, nome: est.prestador,
+      viz: $('chkViz').classList.contains('ui-state-active'), ce: $('chkCe').classList.contains('ui-state-active'),
+      todas: $('chkTodas').classList.contains('ui-state-active'), logins: marcados
+    }, function (d) { est.medicos = d.medicos; renderMedicos(); fecharDialogo(); });
+  } else if (t.closest('#btnCancelarDlg')) {
+    fecharDialogo();
+  }
+});
+</script>
+</body></html>"""
+
+
+# ------------------------------------------------------------------------------
+# Superfície JSF do motor HTTP do autotiss: as mesmas telas renderizadas no servidor
+# e trocadas por postbacks parciais do PrimeFaces (<partial-response>). Os botões
+# trazem o PrimeFaces.ab({s, f, p, u}) no onclick, como no NTISS real.
+# ------------------------------------------------------------------------------
+
+TRANSACOES = ["Consulta", "SP/SADT", "Internação", "Honorários", "Odontologia"]
+OPCOES_POR_PAGINA = (10, 25, 50, 100)   # rowsPerPageTemplate do datatable de médicos
+ROTULOS_CHK = (("viz", "Visualiza transações de outros logins?"), ("ce", "Cancela/Exclui transações de outros logins?"))
+
+
+def _campo(campos, nome):
+    return (campos.get(nome) or [""])[0]
+
+
+def _ab(origem, form, processar, atualizar, evento=None):
+    cfg = f's:"{origem}",f:"{form}",p:"{processar}",u:"{atualizar}"' + (f',e:"{evento}"' if evento else "")
+    return "PrimeFaces.ab({" + cfg + "});return false;"
+
+
+def _botao(id_, texto, form, atualizar, processar=None):
+    return (f'<button type="button" id="{id_}" name="{id_}" onclick="{html.escape(_ab(id_, form, processar or id_, atualizar))}">'
+            f'<span>{texto}</span></button>')
+
+
+def _lapis(id_, form, atualizar):
+    return (f'<a id="{id_}" href="#" onclick="{html.escape(_ab(id_, form, id_, atualizar))}">'
+            f'<img title="Alterar" src="/img/editar.png"></a>')
+
+
+def jsf_pesquisa(resultados, termo=""):
+    linhas = "".join(f'<tr><td>{html.escape(l)}</td><td>{html.escape(nome)}</td>'
+                     f'<td>{_lapis(f"resultado:{i}:alterar", "formPesquisa", "viewPesquisa viewEdicao dlgServico")}</td></tr>'
+                     for i, (l, nome) in enumerate(resultados))
+    return ('<div id="viewPesquisa"><form id="formPesquisa" name="formPesquisa">'
+            '<input type="hidden" name="formPesquisa" value="formPesquisa">'
+            f'<label for="j_idt129">Login</label> <input id="j_idt129" name="j_idt129" type="text" value="{html.escape(termo)}">'
+            + _botao("btnPesquisar", "Pesquisar", "formPesquisa", "viewPesquisa", "formPesquisa")
+            + f'<table id="resultado"><tbody>{linhas}</tbody></table></form></div>')
+
+
+def opcoes_por_pagina(por_pagina, todas=False):
+    """Opções do select de linhas por página; `todas` acrescenta "*" ({ShowAll} do PrimeFaces)."""
+    if not por_pagina:
+        return []
+    return sorted(set(OPCOES_POR_PAGINA) | {por_pagina}) + (["*"] if todas else [])
+
+
+def jsf_linhas_medicos(medicos, primeira=0, por_pagina=0):
+    """Só os <tr> da página (é o que a paginação do DataTable devolve no <update>)."""
+    fim = min(len(medicos), primeira + por_pagina) if por_pagina else len(medicos)
+    linhas = []
+    for i in range(primeira, fim):
+        m = medicos[i]
+        icone = '<img src="/img/inativar.png" title="Inativar">' if m["ativo"] else '<img src="/img/ativar.png" title="Ativar">'
+        linhas.append(f'<tr data-ri="{i}" data-rk="{html.escape(m["id"])}"><td>{html.escape(m["nome"])}</td>'
+                      f'<td>{"Sim" if m["ativo"] else "Não"}</td><td>{icone}</td>'
+                      f'<td>{_lapis(f"tabelaMedicos:{i}:alterar", "formEdicao", "dlgServico")}</td></tr>')
+    return "".join(linhas)
+
+
+def jsf_paginador(total, primeira, por_pagina, todas=False):
+    paginas, pagina = max(1, -(-total // por_pagina)), primeira // por_pagina
+
+    def botao(cls, txt, desabilitado):
+        return f'<a href="#" class="{cls} ui-state-default{" ui-state-disabled" if desabilitado else ""}">{txt}</a>'
+
+    ini = max(0, min(pagina - 2, paginas - 5))
+    links = "".join(f'<a href="#" class="ui-paginator-page ui-state-default{" ui-state-active" if p == pagina else ""}">{p + 1}</a>'
+                    for p in range(ini, min(paginas, ini + 5)))
+    opcoes = "".join(f'<option value="{n}"{" selected" if n == por_pagina else ""}>{"Todos" if n == "*" else n}</option>'
+                     for n in opcoes_por_pagina(por_pagina, todas))
+    return ('<div id="tabelaMedicos_paginator_bottom" class="ui-paginator ui-paginator-bottom">'
+            f'<span class="ui-paginator-current">({pagina + 1} de {paginas})</span>'
+            + botao("ui-paginator-first", "&laquo;", pagina == 0) + botao("ui-paginator-prev", "&lsaquo;", pagina == 0)
+            + f'<span class="ui-paginator-pages">{links}</span>'
+            + botao("ui-paginator-next", "&rsaquo;", pagina >= paginas - 1) + botao("ui-paginator-last", "&raquo;", pagina >= paginas - 1)
+            + f'<select id="tabelaMedicos_rppDD" name="tabelaMedicos_rppDD" class="ui-paginator-rpp-options">{opcoes}</select></div>')
+
+
+def jsf_tabela_medicos(medicos, primeira=0, por_pagina=0, todas=False):
+    """Datatable inteiro (abrir secretaria / depois do Salvar) + script do widget, como o PrimeFaces.
+    por_pagina 0 = todas as linhas, sem paginador (também depois de escolher "Todos")."""
+    paginador = jsf_paginador(len(medicos), primeira, por_pagina, todas) if por_pagina else ""
+    pagina = primeira // por_pagina if por_pagina else 0
+    return ('<div class="ui-datatable" id="tabelaMedicos"><table><tbody class="ui-datatable-data">'
+            f'{jsf_linhas_medicos(medicos, primeira, por_pagina)}</tbody></table>{paginador}</div>'
+            '<script id="tabelaMedicos_s">PrimeFaces.cw("DataTable","widget_tabelaMedicos",{id:"tabelaMedicos",'
+            f'paginator:{{rows:{por_pagina},rowCount:{len(medicos)},page:{pagina}}}}});</script>')
+
+
+def jsf_edicao(est, login, visao):
+    sec = est.secretarias[login]
+    return ('<div id="viewEdicao"><form id="formEdicao" name="formEdicao">'
+            '<input type="hidden" name="formEdicao" value="formEdicao">'
+            f'<h3>{html.escape(sec["nome"])} ({html.escape(login)})</h3>'
+            + _botao("btnCriarServico", "Criar Serviço", "formEdicao", "dlgServico")
+            + jsf_tabela_medicos(sec["medicos"], visao["first"], visao["rows"], visao["todas"])
+            + '<table id="dadosSecretaria"><tbody><tr><td>Dados da secretaria</td>'
+            f'<td>{_lapis("dadosSecretaria:alterar", "formEdicao", "dlgServico")}</td></tr></tbody></table>'
+            + _botao("j_idt221", "Cancelar", "formEdicao", "viewPesquisa viewEdicao dlgServico")
+            + '</form></div>')
+
+
+def jsf_dialogo(est, login=None, dlg=None, aviso=""):
+    if not dlg:
+        return '<div id="dlgServico" class="ui-dialog"></div>'
+    partes = []
+    if dlg["modo"] == "criar":
+        opcoes = ['<option value="">Selecione...</option>']
+        for nome in est.prestadores[login]:
+            sel = " selected" if nome == dlg.get("prestador") else ""
+            opcoes.append(f'<option value="{html.escape(nome)}"{sel}>{html.escape(nome)}</option>')
+        comportamento = _ab("formServico:prestadorFuncionario", "formServico", "formServico:prestadorFuncionario",
+                            "dlgServico", "change").replace("return false;", "")
+        partes.append('<div id="formServico:prestadorFuncionario" class="ui-selectonemenu">'
+                      '<select id="formServico:prestadorFuncionario_input" name="formServico:prestadorFuncionario_input">'
+                      + "".join(opcoes) + '</select></div>'
+                      '<script>PrimeFaces.cw("SelectOneMenu","widget_prestador",{id:"formServico:prestadorFuncionario",'
+                      'behaviors:{change:function(ext,event){' + comportamento + '}}});</script>')
+        if dlg.get("prestador"):
+            linhas = "".join(f'<tr data-ri="{i}" data-rk="t{i}"><td>{html.escape(t)}</td></tr>' for i, t in enumerate(TRANSACOES))
+            partes.append('<div class="ui-datatable" id="formServico:transacoes">'
+                          '<div class="ui-datatable-scrollable-header"><div class="ui-chkbox ui-chkbox-all">'
+                          '<div class="ui-chkbox-box ui-state-default"></div></div> Todas as transações</div>'
+                          f'<table><tbody>{linhas}</tbody></table>'
+                          '<input type="hidden" id="formServico:transacoes_selection" name="formServico:transacoes_selection" value="">'
+                          '</div>')
+        med = {"viz": False, "ce": False, "logins": []}
+    else:
+        med = dlg["medico"]
+        partes.append(f'<div id="nomeMedicoEdicao">{html.escape(med["nome"])}</div>')
+    partes.append('<table id="formServico:opcoes"><tbody>')
+    for cid, rotulo in ROTULOS_CHK:
+        marcado = " checked" if med.get(cid) else ""
+        partes.append(f'<tr><td><div class="ui-chkbox"><div class="ui-helper-hidden-accessible">'
+                      f'<input type="checkbox" id="formServico:{cid}_input" name="formServico:{cid}_input"{marcado}></div>'
+                      f'<div class="ui-chkbox-box ui-state-default{" ui-state-active" if marcado else ""}"></div></div></td>'
+                      f'<td><label for="formServico:{cid}_input">{rotulo}</label></td></tr>')
+    partes.append('</tbody></table>')
+    opcoes = "".join(f'<option value="{html.escape(l)}"{" selected" if l in med.get("logins", []) else ""}>{html.escape(l)}</option>'
+                     for l in est.logins)
+    partes.append('<div id="formServico:escolherLogins" class="ui-selectcheckboxmenu">'
+                  f'<select id="formServico:escolherLogins_input" name="formServico:escolherLogins_input" multiple>{opcoes}</select></div>')
+    if aviso:
+        partes.append(f'<div class="ui-messages-error">{html.escape(aviso)}</div>')
+    partes.append(_botao("formServico:salvar", "Salvar", "formServico", "dlgServico tabelaMedicos", "formServico"))
+    partes.append(_botao("formServico:cancelar", "Cancelar", "formServico", "dlgServico"))
+    return ('<div id="dlgServico" class="ui-dialog"><form id="formServico" name="formServico">'
+            '<input type="hidden" name="formServico" value="formServico">' + "".join(partes) + '</form></div>')
+
+
+def acao_jsf(est, visao, origem, campos):
+    """Executa o postback de `origem` na view (chamar com est.lock). Retorna [(id, html)]."""
+    login = visao["sec"]
+    if origem == "btnPesquisar":
+        termo = _campo(campos, "j_idt129").strip()
+        visao["resultados"] = [(l, s["nome"]) for l, s in est.secretarias.items() if termo and termo.lower() in l.lower()]
+        return [("viewPesquisa", jsf_pesquisa(visao["resultados"], termo))]
+    if origem.startswith("resultado:"):
+        visao["sec"], visao["dlg"], visao["first"] = visao["resultados"][int(origem.split(":")[1])][0], None, 0
+        return [("viewPesquisa", '<div id="viewPesquisa"></div>'), ("viewEdicao", jsf_edicao(est, visao["sec"], visao)),
+                ("dlgServico", jsf_dialogo(est))]
+    if origem == "j_idt221":
+        visao["sec"], visao["dlg"] = None, None
+        return [("viewPesquisa", jsf_pesquisa(visao["resultados"])), ("viewEdicao", '<div id="viewEdicao"></div>'),
+                ("dlgServico", jsf_dialogo(est))]
+    if login is None:
+        return []
+    sec = est.secretarias[login]
+    if origem == "tabelaMedicos" and _campo(campos, "tabelaMedicos_pagination") == "true":
+        visao["first"] = int(_campo(campos, "tabelaMedicos_first") or 0)
+        visao["rows"] = int(_campo(campos, "tabelaMedicos_rows") or visao["rows"])
+        return [("tabelaMedicos", jsf_linhas_medicos(sec["medicos"], visao["first"], visao["rows"]))]
+    if origem.startswith("tabelaMedicos:"):
+        visao["dlg"] = {"modo": "editar", "medico": sec["medicos"][int(origem.split(":")[1])]}
+    elif origem == "btnCriarServico":
+        visao["dlg"] = {"modo": "criar", "prestador": None}
+    elif origem == "formServico:prestadorFuncionario" and visao["dlg"]:
+        nome = _campo(campos, "formServico:prestadorFuncionario_input")
+        visao["dlg"]["prestador"] = nome if nome in est.prestadores[login] else None
+    elif origem == "formServico:salvar" and visao["dlg"]:
+        dlg = visao["dlg"]
+        if dlg["modo"] == "criar" and not dlg.get("prestador"):
+            visao["validacao_falhou"] = True
+            return [("dlgServico", jsf_dialogo(est, login, dlg, "Prestador: valor obrigatório."))]
+        todas = {f"t{i}" for i in range(len(TRANSACOES))}
+        est.salvar({"login": login, "modo": dlg["modo"], "nome": dlg.get("prestador"),
+                    "id": dlg.get("medico", {}).get("id"),
+                    "viz": "formServico:viz_input" in campos, "ce": "formServico:ce_input" in campos,
+                    "todas": set(_campo(campos, "formServico:transacoes_selection").split(",")) >= todas,
+                    "logins": list(campos.get("formServico:escolherLogins_input", []))})
+        visao["dlg"] = None
+        return [("dlgServico", jsf_dialogo(est)),
+                ("tabelaMedicos", jsf_tabela_medicos(sec["medicos"], visao["first"], visao["rows"], visao["todas"]))]
+    elif origem == "formServico:cancelar":
+        visao["dlg"] = None
+    return [("dlgServico", jsf_dialogo(est, login, visao["dlg"]))]
+
+
+class ManipuladorNTISS(BaseHTTPRequestHandler):
+    """Rotas do mock. `self.server.estado` é o EstadoMock; `self.server.latencia` em segundos."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):  # silencioso (o benchmark mede, não loga)
+        pass
+
+    # ------------------------------------------------------------- utilidades
+    def _responder(self, status, corpo, tipo="text/html; charset=utf-8", extra=None):
+        dados = corpo if isinstance(corpo, bytes) else corpo.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(dados)))
+        for k, v in (extra or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def _json(self, obj, status=200):
+        self._responder(status, json.dumps(obj, ensure_ascii=False), "application/json; charset=utf-8")
+
+    def _redirecionar(self, destino, extra=None):
+        cab = {"Location": destino}
+        cab.update(extra or {})
+        self._responder(302, b"", extra=cab)
+
+    def _sessao_valida(self):
+        """Token da sessão (JSESSIONID) se ainda válido, senão None."""
+        cookie = self.headers.get("Cookie", "")
+        for parte in cookie.split(";"):
+            nome, _, valor = parte.strip().partition("=")
+            if nome == "JSESSIONID" and valor in self.server.sessoes:
+                return valor
+        return None
+
+    def _latencia(self):
+        lat = self.server.latencia
+        if lat:
+            time.sleep(lat * random.uniform(0.7, 1.3))
+
+    # ------------------------------------------------------------------ GET
+    def do_GET(self):
+        url = urlparse(self.path)
+        q = {k: v[0] for k, v in parse_qs(url.query).items()}
+        est = self.server.estado
+        if url.path.startswith("/img/"):
+            return self._responder(200, PNG_1X1, "image/png")
+        if url.path in ("/", "/ntiss/login.jsf"):
+            return self._responder(200, PAGINA_LOGIN)
+        if url.path == "/mock/api/estado":
+            return self._json(est.resumo())
+        if url.path == "/mock/api/expirar":   # derruba todas as sessões (teste de re-login)
+            self.server.sessoes.clear()
+            return self._json({})
+        token = self._sessao_valida()
+        if not token:
+            if url.path.startswith("/mock/api/"):
+                return self._json({"erro": "sessao"}, 401)
+            return self._redirecionar("/ntiss/login.jsf")
+        if url.path == "/ntiss/home.jsf":
+            return self._responder(200, PAGINA_HOME)
+        if url.path == "/ntiss/cadastros/funcionario/lista.jsf":
+            with est.lock:   # cada GET cria uma view nova (ViewState próprio)
+                visao = self.server.visoes[token] = {"vs": secrets.token_hex(6), "resultados": [], "sec": None, "dlg": None,
+                                                     "first": 0, "rows": self.server.linhas_por_pagina,
+                                                     "todas": self.server.opcao_todas}
+            pagina = (PAGINA_LISTA.replace("{{VIEWSTATE}}", visao["vs"])
+                      .replace("{{POR_PAGINA}}", str(self.server.linhas_por_pagina))
+                      .replace("{{OPCOES_POR_PAGINA}}", json.dumps(opcoes_por_pagina(self.server.linhas_por_pagina, self.server.opcao_todas))))
+            return self._responder(200, pagina)
+
+        if url.path.startswith("/mock/api/"):
+            self._latencia()
+            with est.lock:
+                est.contadores["requisicoes"] += 1
+                rota = url.path[len("/mock/api/"):]
+                if rota == "ping":
+                    return self._json({})
+                if rota == "pesquisar":
+                    termo = q.get("login", "").strip().lower()
+                    rows = [{"login": l, "nome": s["nome"]} for l, s in est.secretarias.items()
+                            if termo and termo in l.lower()]
+                    return self._json(rows)
+                sec = est.secretarias.get(q.get("login", ""))
+                if sec is None:
+                    return self._json({"erro": "secretaria"}, 404)
+                if rota == "secretaria":
+                    return self._json({"nome": sec["nome"], "logins": est.logins,
+                                       "medicos": [{k: m[k] for k in ("id", "nome", "ativo")} for m in sec["medicos"]]})
+                if rota == "medico":
+                    med = next((m for m in sec["medicos"] if m["id"] == q.get("id")), None)
+                    return self._json(med) if med else self._json({"erro": "medico"}, 404)
+                if rota == "prestadores":
+                    return self._json(est.prestadores[q["login"]])
+        self._responder(404, "nao encontrado")
+
+    # ----------------------------------------------------------------- POST
+    def do_POST(self):
+        url = urlparse(self.path)
+        tamanho = int(self.headers.get("Content-Length") or 0)
+        corpo = self.rfile.read(tamanho).decode("utf-8") if tamanho else ""
+        est = self.server.estado
+        if url.path == "/ntiss/login.jsf":
+            campos = {k: v[0] for k, v in parse_qs(corpo).items()}
+            if campos.get("login") and campos.get("senha"):
+                token = secrets.token_hex(8)
+                self.server.sessoes.add(token)
+                return self._redirecionar("/ntiss/home.jsf", {"Set-Cookie": f"JSESSIONID={token}; Path=/"})
+            return self._responder(200, PAGINA_LOGIN)
+        if url.path == "/mock/api/salvar":
+            if not self._sessao_valida():
+                return self._json({"erro": "sessao"}, 401)
+            self._latencia()
+            d = json.loads(corpo or "{}")
+            with est.lock:
+                est.contadores["requisicoes"] += 1
+                sec = est.salvar(d)
+                self._expirar_se_preciso()
+                if sec is None:
+                    return self._json({"erro": "secretaria"}, 404)
+                return self._json({"medicos": [{k: m[k] for k in ("id", "nome", "ativo")} for m in sec["medicos"]]})
+        if url.path == "/ntiss/cadastros/funcionario/lista.jsf":
+            return self._postback_jsf(corpo)
+        self._responder(404, "nao encontrado")
+
+    def _expirar_se_preciso(self):
+        est = self.server.estado
+        if self.server.expirar_a_cada and est.contadores["salvar"] % self.server.expirar_a_cada == 0:
+            self.server.sessoes.clear()   # simula timeout de sessão logo após este salvar
+
+    # ------------------------------------------------------- postbacks JSF
+    def _parcial(self, conteudo):
+        corpo = f'<?xml version="1.0" encoding="UTF-8"?><partial-response id="j_id1">{conteudo}</partial-response>'
+        self._responder(200, corpo, "text/xml; charset=utf-8")
+
+    def _postback_jsf(self, corpo):
+        """Requisição parcial do PrimeFaces (javax.faces.partial.ajax): valida sessão e ViewState,
+        executa a ação de `javax.faces.source` e devolve os fragmentos re-renderizados."""
+        token = self._sessao_valida()
+        if not token:
+            return self._parcial('<redirect url="/ntiss/login.jsf"></redirect>')
+        campos = parse_qs(corpo, keep_blank_values=True)
+        est = self.server.estado
+        self._latencia()
+        with est.lock:
+            est.contadores["requisicoes"] += 1
+            visao = self.server.visoes.get(token)
+            if visao is None or _campo(campos, "javax.faces.ViewState") != visao["vs"]:
+                atualizacoes = None
+            else:
+                salvos = est.contadores["salvar"]
+                atualizacoes = acao_jsf(est, visao, _campo(campos, "javax.faces.source"), campos)
+                if est.contadores["salvar"] != salvos:
+                    self._expirar_se_preciso()
+                visao["vs"] = secrets.token_hex(6)   # o ViewState muda a cada postback
+            vs = visao["vs"] if visao else ""
+            falhou = bool(visao and visao.pop("validacao_falhou", False))
+        if atualizacoes is None:
+            return self._parcial('<error><error-name>javax.faces.application.ViewExpiredException</error-name>'
+                                 '<error-message><![CDATA[View expirada]]></error-message></error>')
+        partes = "".join(f'<update id="{i}"><![CDATA[{frag}]]></update>' for i, frag in atualizacoes)
+        partes += f'<update id="j_id1:javax.faces.ViewState:0"><![CDATA[{vs}]]></update>'
+        if falhou:
+            partes += '<extension ln="primefaces" type="args">{"validationFailed":true}</extension>'
+        self._parcial(f'<changes>{partes}</changes>')
+
+
+def iniciar_mock(porta=0, latencia_ms=50, expirar_a_cada=0, linhas_por_pagina=10, opcao_todas=False, **kwargs_estado):
+    """Sobe o mock em background. Retorna (servidor, url_base); encerre com servidor.shutdown().
+    `expirar_a_cada` > 0 derruba as sessões a cada N salvamentos (teste de re-login).
+    `linhas_por_pagina` é a página inicial do datatable de médicos (0 = sem paginador);
+    `opcao_todas` acrescenta a opção "Todos" ("*") ao select de linhas por página."""
+    servidor = ThreadingHTTPServer(("127.0.0.1", porta), ManipuladorNTISS)
+    servidor.daemon_threads = True
+    servidor.estado = EstadoMock(**kwargs_estado)
+    servidor.latencia = latencia_ms / 1000.0
+    servidor.sessoes = set()
+    servidor.visoes = {}   # {JSESSIONID: estado da view JSF (ViewState, secretaria e diálogo abertos)}
+    servidor.expirar_a_cada = expirar_a_cada
+    servidor.linhas_por_pagina = linhas_por_pagina
+    servidor.opcao_todas = opcao_todas
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f"http://127.0.0.1:{servidor.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor mock do NTISS para testes/benchmark.")
+    parser.add_argument("--porta", type=int, default=8099)
+    parser.add_argument("--latencia", type=int, default=50, help="latência média por requisição AJAX (ms)")
+    parser.add_argument("--secretarias", type=int, default=1)
+    parser.add_argument("--medicos", type=int, default=100, help="médicos já vinculados por secretaria")
+    parser.add_argument("--a-cadastrar", type=int, default=10, help="prestadores ainda não cadastrados por secretaria")
+    parser.add_argument("--inativos", type=float, default=0.1, help="fração de médicos inativos")
+    parser.add_argument("--configurados", type=float, default=0.0, help="fração de médicos já vinculados")
+    parser.add_argument("--expirar-a-cada", type=int, default=0, help="derruba as sessões a cada N salvamentos")
+    parser.add_argument("--linhas-por-pagina", type=int, default=10, help="página inicial da tabela de médicos (0 = sem paginador)")
+    parser.add_argument("--opcao-todas", action="store_true", help='acrescenta "Todos" ao select de linhas por página')
+    args = parser.parse_args()
+    srv, base = iniciar_mock(args.porta, args.latencia, expirar_a_cada=args.expirar_a_cada,
+                             linhas_por_pagina=args.linhas_por_pagina, opcao_todas=args.opcao_todas,
+                             secretarias=args.secretarias, medicos=args.medicos,
+                             a_cadastrar=args.a_cadastrar, inativos=args.inativos, configurados=args.configurados)
+    print(f"Mock NTISS em {base}/ntiss/login.jsf  (Ctrl+C para sair)")
+    print(f"Secretarias: {', '.join(srv.estado.secretarias)}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        srv.shutdown()
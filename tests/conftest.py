@@ -0,0 +1,37 @@
+import io
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import autotiss
+import mock_ntiss
+
+
+@pytest.fixture
+def ntiss(tmp_path, monkeypatch):
+    """Sobe o mock do NTISS e aponta o autotiss para ele (estado em tmp_path).
+    Uso: srv = ntiss(motor="http", secretarias=2, medicos=30, ...)."""
+    servidores = []
+    monkeypatch.setattr(autotiss, "_saida_log", io.StringIO())
+
+    def iniciar(motor="http", conf=None, **kwargs_mock):
+        kwargs_mock.setdefault("latencia_ms", 0)
+        srv, base = mock_ntiss.iniciar_mock(**kwargs_mock)
+        servidores.append(srv)
+        config = {"url_sistema": f"{base}/ntiss/login.jsf", "usuario": "teste", "senha": "teste",
+                  "pasta_estado": str(tmp_path / "estado"), "motor": motor, "cache_ttl_horas": 0,
+                  "log_arquivo": False, "relatorios": False, "rastreamento": False}
+        config.update(conf or {})
+        caminho = tmp_path / "config.json"
+        caminho.write_text(json.dumps(config), encoding="utf-8")
+        assert autotiss.carregar_configuracao(str(caminho))
+        return srv
+
+    yield iniciar
+    autotiss.finalizar_ciclo()
+    for srv in servidores:
+        srv.shutdown()
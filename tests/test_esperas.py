@@ -0,0 +1,19 @@
+"""esperar_condicao: espera adaptativa com estatística por etapa."""
+
+import time
+
+import autotiss
+
+
+def test_timeout_retorna_sem_dormir(monkeypatch):
+    monkeypatch.setattr(autotiss, "dormir", lambda s: (_ for _ in ()).throw(AssertionError("dormiu")))
+    t0 = time.perf_counter()
+    assert autotiss.esperar_condicao(object(), lambda d: False, "teste:timeout", timeout=0.2) is None
+    assert time.perf_counter() - t0 < 0.5
+    assert autotiss.ESTATISTICAS_ESPERA["teste:timeout"]["timeouts"] == 1
+    autotiss.ESTATISTICAS_ESPERA.pop("teste:timeout")
+
+
+def test_condicao_atingida_retorna_o_valor():
+    assert autotiss.esperar_condicao(object(), lambda d: "ok", "teste:ok", timeout=1.0) == "ok"
+    autotiss.ESTATISTICAS_ESPERA.pop("teste:ok")
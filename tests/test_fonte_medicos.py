@@ -0,0 +1,13 @@
+"""FonteMedicos: nomes do dados.json ou de arquivo CSV/JSONL."""
+
+from autotiss import FonteMedicos
+
+
+def test_coluna_secretaria_ignora_caixa_e_espacos(tmp_path):
+    arquivo = tmp_path / "medicos.csv"
+    arquivo.write_text("nome;secretaria\nANA;77.HU_Sec001 \nBIA;77.hu_sec002\nCAIO;\n", encoding="utf-8")
+    fonte = FonteMedicos(str(arquivo))
+
+    assert list(fonte.para("77.hu_sec001")) == ["ANA", "CAIO"]
+    assert list(fonte.para("77.HU_SEC002")) == ["BIA", "CAIO"]
+    assert list(fonte.para()) == ["ANA", "BIA", "CAIO"]
@@ -0,0 +1,65 @@
+"""DocumentoHTML e serializar_form do motor HTTP."""
+
+from autotiss import DocumentoHTML, serializar_form
+
+PAGINA = """<html><body>
+<div id="painel"><span id="velho">antes</span></div>
+<p id="fora">fixo</p>
+<div class="ui-datatable" id="tabela"><table>
+  <thead><tr id="cab"><th>Nome</th></tr></thead>
+  <tbody id="tabela_data" class="ui-datatable-data ui-widget-content">
+    <tr data-ri="0" id="l0"><td>ANA</td></tr><tr data-ri="1" id="l1"><td>BIA</td></tr>
+  </tbody>
+</table></div>
+</body></html>"""
+
+
+def test_substituir_troca_o_elemento_e_reindexa():
+    doc = DocumentoHTML(PAGINA)
+    assert doc.substituir("painel", '<div id="painel"><em id="novo">depois</em></div>')
+
+    assert doc.por_id("velho") is None
+    novo = doc.por_id("novo")
+    assert novo.texto() == "depois"
+    assert novo.ancestral("div") is doc.por_id("painel")
+    assert doc.por_id("painel").pai.tag == "body"
+    assert doc.por_id("fora").texto() == "fixo"
+
+
+def test_substituir_id_inexistente():
+    doc = DocumentoHTML(PAGINA)
+    assert not doc.substituir("nao_existe", "<div></div>")
+
+
+def test_substituir_linhas_troca_so_o_tbody():
+    doc = DocumentoHTML(PAGINA)
+    assert doc.substituir_linhas("tabela", '<tr data-ri="2" id="l2"><td>CAIO</td></tr>'
+                                           '<tr data-ri="3" id="l3"><td>DANI</td></tr>')
+
+    assert doc.por_id("l0") is None and doc.por_id("l1") is None
+    assert [tr.texto() for tr in doc.por_id("tabela_data").todos("tr")] == ["CAIO", "DANI"]
+    assert doc.por_id("l2").pai is doc.por_id("tabela_data")
+    assert doc.por_id("cab") is not None   # cabeçalho intacto
+    assert not doc.substituir_linhas("fora", "<tr></tr>")   # sem <tbody>
+
+
+def test_serializar_form_como_o_navegador():
+    doc = DocumentoHTML("""<form id="f">
+      <input type="hidden" name="f" value="f">
+      <input type="text" name="login" value="77.hu">
+      <input type="text" name="vazio">
+      <input type="checkbox" name="viz" checked>
+      <input type="checkbox" name="ce" value="sim">
+      <input type="text" name="desligado" value="x" disabled>
+      <input type="submit" name="enviar" value="Enviar">
+      <select name="unico"><option value="a">A</option><option value="b">B</option></select>
+      <select name="varios" multiple><option value="1" selected>1</option><option value="2">2</option>
+        <option value="3" selected>3</option></select>
+      <select name="nenhum" multiple><option value="z">Z</option></select>
+      <textarea name="obs">texto livre</textarea>
+    </form>""")
+
+    assert serializar_form(doc.por_id("f")) == [
+        ("f", "f"), ("login", "77.hu"), ("vazio", ""), ("viz", "on"),
+        ("unico", "a"), ("varios", "1"), ("varios", "3"), ("obs", "texto livre"),
+    ]
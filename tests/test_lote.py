@@ -0,0 +1,42 @@
+"""Modo lote (run): resumo JSON e códigos de saída."""
+
+import io
+import json
+import sys
+
+import autotiss
+
+
+def _run(ntiss, tmp_path, capsys, monkeypatch, **kwargs_mock):
+    monkeypatch.setattr(sys, "stderr", io.StringIO())   # logs do modo lote (a thread de log segue viva)
+    srv = ntiss(**kwargs_mock)
+    dados = tmp_path / "dados.json"
+    dados.write_text(json.dumps({"secretarias_para_pesquisar": list(srv.estado.secretarias),
+                                 "logins_para_vincular": ["77.hu"]}), encoding="utf-8")
+    args = autotiss._parser_cli().parse_args(
+        ["run", "--mode", "vincular", "--dados", str(dados), "--config", str(tmp_path / "config.json")])
+    codigo = autotiss.executar_lote(args)
+    return codigo, json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+
+
+def test_run_sem_erros_sai_com_zero(ntiss, tmp_path, capsys, monkeypatch):
+    codigo, resumo = _run(ntiss, tmp_path, capsys, monkeypatch, secretarias=1, medicos=3, a_cadastrar=0, inativos=0.0)
+    assert codigo == 0
+    assert resumo["resultados"]["vinculado"] == 3
+
+
+def test_falha_no_meio_da_execucao_nao_e_de_inicializacao(ntiss, tmp_path, capsys, monkeypatch):
+    def quebrar(*args, **kwargs):   # depois das secretarias processadas, fora do pool
+        raise RuntimeError("tela inesperada")
+    monkeypatch.setattr(autotiss, "resumo_execucao", quebrar)
+    finalizados = []
+    finalizar = autotiss.finalizar_ciclo
+    monkeypatch.setattr(autotiss, "finalizar_ciclo", lambda: finalizados.append(1) or finalizar())
+
+    codigo, resumo = _run(ntiss, tmp_path, capsys, monkeypatch, secretarias=2, medicos=3, a_cadastrar=0, inativos=0.0)
+
+    assert codigo == 1
+    assert resumo["falha"] == "tela inesperada"
+    assert resumo["resultados"]["vinculado"] == 6   # parcial: o que foi registrado antes da falha
+    assert not resumo["interrompido"]
+    assert finalizados
@@ -0,0 +1,101 @@
+"""Motor HTTP de ponta a ponta contra o mock_ntiss: confere o estado final do mock."""
+
+import autotiss
+
+
+def _dados(srv, **extra):
+    dados = {"secretarias_para_pesquisar": list(srv.estado.secretarias), "logins_para_vincular": ["77.hu"],
+             "medicos_para_vincular": [], "medicos_para_cadastrar": []}
+    dados.update(extra)
+    return dados
+
+
+def _logins_esperados(srv):
+    return sorted(l for l in srv.estado.logins if l.startswith("77.hu"))
+
+
+def test_vincular_configura_todos_os_ativos(ntiss):
+    srv = ntiss(secretarias=2, medicos=25, a_cadastrar=0, inativos=0.2)
+    resumo = autotiss.executar_ciclo(None, "1", _dados(srv))
+
+    ativos = 0
+    for sec in srv.estado.secretarias.values():
+        for m in sec["medicos"]:
+            if m["ativo"]:
+                ativos += 1
+                assert m["viz"] and m["ce"]
+                assert sorted(m["logins"]) == _logins_esperados(srv)
+            else:
+                assert m["logins"] == []   # inativo não é aberto
+    assert resumo["resultados"]["vinculado"] == ativos
+    assert resumo["resultados"]["secretarias_concluidas"] == 2
+
+
+def test_vincular_segunda_passada_nao_salva_nada(ntiss):
+    srv = ntiss(secretarias=1, medicos=15, a_cadastrar=0, inativos=0.0)
+    autotiss.executar_ciclo(None, "1", _dados(srv))
+    salvos = srv.estado.contadores["salvar"]
+
+    resumo = autotiss.executar_ciclo(None, "1", _dados(srv))
+
+    assert srv.estado.contadores["salvar"] == salvos
+    assert resumo["resultados"]["sem_alteracao"] == 15
+
+
+def test_vincular_percorre_todas_as_paginas(ntiss):
+    srv = ntiss(secretarias=1, medicos=130, a_cadastrar=0, inativos=0.0, linhas_por_pagina=10)
+    resumo = autotiss.executar_ciclo(None, "1", _dados(srv))
+
+    medicos = next(iter(srv.estado.secretarias.values()))["medicos"]
+    assert all(m["viz"] and m["ce"] and m["logins"] for m in medicos)
+    assert resumo["resultados"]["vinculado"] == 130
+
+
+def test_cadastrar_cria_servico_para_cada_prestador(ntiss):
+    srv = ntiss(secretarias=1, medicos=5, a_cadastrar=6)
+    login = next(iter(srv.estado.secretarias))
+    nomes = srv.estado.nomes_a_cadastrar(login)
+
+    resumo = autotiss.executar_ciclo(None, "2", _dados(srv, medicos_para_cadastrar=nomes + ["ZEZINHO DE TAL"]))
+
+    assert srv.estado.prestadores[login] == []
+    novos = [m for m in srv.estado.secretarias[login]["medicos"] if m["nome"] in nomes]
+    assert len(novos) == 6
+    assert all(m["viz"] and m["ce"] and m["todas"] for m in novos)
+    assert resumo["resultados"]["cadastrado"] == 6
+    assert resumo["resultados"]["ja_cadastrado"] == 1   # fora da lista de prestadores
+
+
+def test_cadastrar_nao_usa_nome_aproximado(ntiss):
+    srv = ntiss(secretarias=1, medicos=0, a_cadastrar=3)
+    login = next(iter(srv.estado.secretarias))
+    alvo = srv.estado.nomes_a_cadastrar(login)[0]
+    com_erro = alvo[:-1] + ("X" if alvo[-1] != "X" else "Y")   # erro de digitação na última letra
+
+    resumo = autotiss.executar_ciclo(None, "2", _dados(srv, medicos_para_cadastrar=[com_erro]))
+
+    assert alvo in srv.estado.prestadores[login]
+    assert resumo["resultados"]["erro"] == 1
+    assert "secretarias_concluidas" not in resumo["resultados"]   # fica para a retomada
+
+
+def test_vincular_inicia_pela_pesquisa_do_prefixo(ntiss):
+    srv = ntiss(secretarias=3, medicos=3, a_cadastrar=0, inativos=0.0)
+    resumo = autotiss.executar_ciclo(None, "1", _dados(srv))
+
+    assert resumo["resultados"]["secretarias_concluidas"] == 3
+    assert autotiss.navegacao.prefixo == "77.hu_sec00"
+
+
+def test_opcao_todos_le_a_tabela_numa_requisicao(ntiss, monkeypatch):
+    srv = ntiss(secretarias=1, medicos=130, a_cadastrar=0, inativos=0.0, linhas_por_pagina=10, opcao_todas=True)
+    paginas = []
+    paginar = autotiss.ClienteJSF.paginar
+    monkeypatch.setattr(autotiss.ClienteJSF, "paginar",
+                        lambda self, tabela, primeira, linhas, **kw: paginas.append((primeira, linhas))
+                        or paginar(self, tabela, primeira, linhas, **kw))
+
+    resumo = autotiss.executar_ciclo(None, "1", _dados(srv))
+
+    assert paginas == [(0, 0)]   # mesma escolha do Selenium: "Todos" vence o maior número
+    assert resumo["resultados"]["vinculado"] == 130
@@ -0,0 +1,44 @@
+"""Casamento de nomes (IndiceNomes / localizar_prestador)."""
+
+import autotiss
+from autotiss import IndiceNomes, localizar_prestador
+
+NOMES = ["JOAO PEREIRA DA SILVA", "MARIA SILVIA", "ANA PAULA SOUZA", "JOSÉ CONCEIÇÃO"]
+
+
+def test_camadas_confiaveis():
+    indice = IndiceNomes(NOMES)
+    assert indice.correspondencia("joao pereira da silva") == ([0], 1.0, "exato")
+    assert indice.correspondencia("JOAO PEREIRA")[2] == "contem"
+    assert indice.correspondencia("SILVA JOAO PEREIRA DA")[2] == "ordem"
+    assert indice.correspondencia("JOSE CONCEICAO")[2] == "exato"   # sem acentos
+    assert localizar_prestador(indice, "JOAO PEREIRA") == ("JOAO PEREIRA DA SILVA", "contem")
+
+
+def test_aproximado_e_abreviado_vao_para_revisao():
+    indice = IndiceNomes(NOMES)
+    assert localizar_prestador(indice, "MARIA SILVA") == (None, "aproximado")
+    assert localizar_prestador(indice, "ANA SOUZA") == (None, "abreviado")
+    assert IndiceNomes.revisar("aproximado") and IndiceNomes.revisar("abreviado")
+    assert not IndiceNomes.revisar("contem")
+
+
+def test_aproximado_com_opt_in(monkeypatch):
+    monkeypatch.setattr(autotiss, "ACEITAR_NOMES_APROXIMADOS", True)
+    indice = IndiceNomes(NOMES)
+    assert localizar_prestador(indice, "MARIA SILVA") == ("MARIA SILVIA", "aproximado")
+
+
+def test_ambiguo_nunca_e_usado(monkeypatch):
+    monkeypatch.setattr(autotiss, "ACEITAR_NOMES_APROXIMADOS", True)
+    indice = IndiceNomes(["MARIA SILVIA", "MARIA SILVIE"])
+    assert localizar_prestador(indice, "MARIA SILVIO") == (None, "ambiguo")
+
+
+def test_casar_filtro_separa_os_nomes_a_revisar():
+    linhas = [{"nome": n, "texto": n} for n in NOMES]
+    alvos, nao_encontrados, revisar = autotiss.casar_filtro(
+        linhas, ["JOAO PEREIRA", "MARIA SILVA", "ANA SOUZA", "ZEZINHO DE TAL"])
+    assert alvos == {0: "JOAO PEREIRA"}
+    assert revisar == ["MARIA SILVA", "ANA SOUZA"]
+    assert nao_encontrados == ["ZEZINHO DE TAL"]
@@ -0,0 +1,87 @@
+"""Início do modo interativo (thread do bot) sem Tk: o painel é um dublê."""
+
+import threading
+
+import autotiss
+
+
+class PainelFalso:
+    def __init__(self):
+        self.falhas = []
+        self.progresso = []
+        self.ntiss = []
+
+    def falha_inicio(self, mensagem):
+        self.falhas.append(mensagem)
+
+    def status(self, progresso=None, ntiss=None, **campos):
+        if progresso is not None:
+            self.progresso.append(progresso)
+        if ntiss is not None:
+            self.ntiss.append(ntiss)
+
+
+def test_falha_ao_abrir_o_chrome_aparece_no_painel(monkeypatch):
+    def criar_driver(**kwargs):
+        raise RuntimeError("session not created\nStacktrace: ...")
+    painel = PainelFalso()
+    monkeypatch.setattr(autotiss, "criar_driver", criar_driver)
+    monkeypatch.setattr(autotiss, "ui", painel)
+    monkeypatch.setattr(autotiss, "executar_robo_completo", lambda driver: None)
+    pronto = threading.Event()
+    pronto.set()
+
+    autotiss._iniciar_navegador(autotiss.TemposInicio(), pronto, {})
+
+    assert painel.falhas == ["session not created"]
+
+
+def _iniciar_sem_entrar(monkeypatch, usuario, senha):
+    """_iniciar_navegador com o Chrome aberto mas entrar_no_sistema devolvendo False."""
+    painel, menus = PainelFalso(), []
+    monkeypatch.setattr(autotiss, "criar_driver", lambda **kwargs: object())
+    monkeypatch.setattr(autotiss, "entrar_no_sistema", lambda driver, tempos=None: False)
+    monkeypatch.setattr(autotiss, "USUARIO_LOGIN", usuario)
+    monkeypatch.setattr(autotiss, "SENHA_LOGIN", senha)
+    monkeypatch.setattr(autotiss, "ui", painel)
+    monkeypatch.setattr(autotiss, "executar_robo_completo", menus.append)
+    pronto = threading.Event()
+    pronto.set()
+    autotiss._iniciar_navegador(autotiss.TemposInicio(), pronto, {})
+    return painel, menus
+
+
+def test_login_que_falha_nao_libera_o_menu(monkeypatch):
+    painel, menus = _iniciar_sem_entrar(monkeypatch, "usuario", "senha")
+    assert painel.falhas == ["Não foi possível entrar no NTISS"]
+    assert menus == []
+
+
+def test_sem_credenciais_avisa_do_login_manual(monkeypatch):
+    painel, menus = _iniciar_sem_entrar(monkeypatch, "", "")
+    assert painel.falhas == []
+    assert painel.ntiss == ["🟡 faça login manual"]
+    assert len(menus) == 1
+
+
+def test_progresso_do_pool_chega_ao_painel(ntiss, monkeypatch):
+    srv = ntiss(secretarias=4, medicos=2, a_cadastrar=0, inativos=0.0, conf={"workers": 2})
+    painel = PainelFalso()
+    monkeypatch.setattr(autotiss, "ui", painel)
+    dados = {"secretarias_para_pesquisar": list(srv.estado.secretarias), "logins_para_vincular": ["77.hu"],
+             "medicos_para_vincular": [], "medicos_para_cadastrar": []}
+
+    autotiss.executar_ciclo(None, "1", dados)
+
+    pool = [p for p in painel.progresso if "secretarias" in p]
+    assert pool[0].startswith("0 / 4")
+    assert any(p.startswith("4 / 4") for p in pool)
+
+
+def test_proximo_clicado_no_pool_nao_pula_o_ciclo_seguinte(monkeypatch):
+    monkeypatch.setattr(autotiss._ctx_worker, "skip_visto", autotiss._skip_geracao, raising=False)
+    monkeypatch.setattr(autotiss, "_skip_geracao", autotiss._skip_geracao + 1)   # clique consumido só pelos workers
+
+    autotiss.descartar_skip_pendente()
+
+    assert not autotiss.checar_pausa()
@@ -0,0 +1,18 @@
+"""relatorio_spans: totais do trace com o pool de workers."""
+
+import autotiss
+
+
+def test_pool_nao_conta_o_tempo_dos_workers_duas_vezes(ntiss):
+    srv = ntiss(secretarias=4, medicos=3, a_cadastrar=0, inativos=0.0,
+                conf={"rastreamento": True, "workers": 2})
+    dados = {"secretarias_para_pesquisar": list(srv.estado.secretarias), "logins_para_vincular": ["77.hu"],
+             "medicos_para_vincular": [], "medicos_para_cadastrar": []}
+    autotiss.executar_ciclo(None, "1", dados)
+    autotiss.rastreador.sincronizar()
+
+    rel = autotiss.relatorio_spans(autotiss.ARQUIVO_TRACE)
+
+    assert rel["etapas"]["worker"]["n"] == 2
+    assert rel["totais"]["tempo_somado_s"] <= rel["etapas"]["ciclo"]["total"] + 0.01
+    assert rel["totais"]["calls"] >= rel["etapas"]["worker"]["calls"] > 0
@@ -0,0 +1,52 @@
+"""Motor Selenium contra o mock_ntiss (precisa do Chrome; sem ele os testes são pulados)."""
+
+import pytest
+
+import autotiss
+
+
+@pytest.fixture
+def chrome(ntiss):
+    """Sobe o mock e um Chrome headless já na lista de Funcionários: (srv, driver)."""
+    def iniciar(**kwargs_mock):
+        srv = ntiss(motor="selenium", conf={"perfil_chrome": False}, **kwargs_mock)
+        if autotiss._versao_chrome_local() is None:
+            pytest.skip("Chrome não instalado")
+        try:
+            driver = autotiss.criar_driver(headless=True)
+        except Exception as e:
+            pytest.skip(f"Chrome não abriu: {e}")
+        drivers.append(driver)
+        assert autotiss.entrar_no_sistema(driver)
+        return srv, driver
+
+    drivers = []
+    yield iniciar
+    for driver in drivers:
+        driver.quit()
+
+
+@pytest.mark.parametrize("linhas_por_pagina", [0, 10])
+def test_snapshot_le_todas_as_paginas_sem_o_lapis_da_secretaria(chrome, linhas_por_pagina):
+    srv, driver = chrome(secretarias=1, medicos=35, a_cadastrar=0, inativos=0.0,
+                         linhas_por_pagina=linhas_por_pagina)
+    login = next(iter(srv.estado.secretarias))
+    assert autotiss.navegar_pesquisar_secretaria(driver, login)
+
+    linhas = autotiss.snapshot_medicos(driver)
+
+    # o lápis de "Dados da secretaria" fica fora de #tabelaMedicos e não entra
+    assert [l["nome"] for l in linhas] == [m["nome"] for m in srv.estado.secretarias[login]["medicos"]]
+    assert [l["indice"] for l in linhas] == list(range(35))
+
+
+def test_vincular_selenium_percorre_todas_as_paginas(chrome):
+    srv, driver = chrome(secretarias=1, medicos=130, a_cadastrar=0, inativos=0.0, linhas_por_pagina=10)
+    dados = {"secretarias_para_pesquisar": list(srv.estado.secretarias), "logins_para_vincular": ["77.hu"],
+             "medicos_para_vincular": [], "medicos_para_cadastrar": []}
+
+    resumo = autotiss.executar_ciclo(driver, "1", dados)
+
+    medicos = next(iter(srv.estado.secretarias.values()))["medicos"]
+    assert all(m["viz"] and m["ce"] and m["logins"] for m in medicos)
+    assert resumo["resultados"]["vinculado"] == 130
@@ -0,0 +1,50 @@
+"""VigiaSessao: recuperação da sessão e refazer dos médicos que falharam."""
+
+import autotiss
+
+
+def _percorrer(monkeypatch, falham, motivo="tela de login"):
+    """Roda a fila 0..4; os itens em `falham` dão erro só na primeira vez."""
+    recuperacoes = []
+    monkeypatch.setattr(autotiss._ctx_worker, "vigia", None, raising=False)   # VigiaSessao se registra aqui
+    monkeypatch.setattr(autotiss, "diagnosticar_sessao", lambda driver: motivo)
+    monkeypatch.setattr(autotiss, "recuperar_sessao", lambda *a: recuperacoes.append(a) or True)
+    vigia = autotiss.VigiaSessao(None, "77.hu_sec001")
+    vistos = []
+    for item in vigia.percorrer(range(5)):
+        vistos.append(item)
+        vigia.resultado("erro" if item in falham and vistos.count(item) == 1 else "vinculado")
+    return vigia, vistos, recuperacoes
+
+
+def test_erro_no_ultimo_medico_tambem_e_refeito(monkeypatch):
+    vigia, vistos, recuperacoes = _percorrer(monkeypatch, falham={4})
+    assert vistos == [0, 1, 2, 3, 4, 4]
+    assert len(recuperacoes) == 1
+    assert not vigia.abandonou
+
+
+def test_erro_no_meio_refaz_no_fim_da_fila(monkeypatch):
+    _, vistos, recuperacoes = _percorrer(monkeypatch, falham={1})
+    assert vistos == [0, 1, 2, 3, 4, 1]
+    assert len(recuperacoes) == 1
+
+
+def test_sem_erros_nao_verifica_a_sessao(monkeypatch):
+    _, vistos, recuperacoes = _percorrer(monkeypatch, falham=set())
+    assert vistos == [0, 1, 2, 3, 4]
+    assert recuperacoes == []
+
+
+def test_gerador_e_consumido_sob_demanda(monkeypatch):
+    monkeypatch.setattr(autotiss._ctx_worker, "vigia", None, raising=False)
+    lidos = []
+    def fonte():
+        for i in range(3):
+            lidos.append(i)
+            yield i
+    vigia = autotiss.VigiaSessao(None, "77.hu_sec001")
+    for item in vigia.percorrer(fonte()):
+        assert lidos[-1] == item   # nada lido antes da hora
+        assert vigia.progresso(item) == str(item + 1)
+    assert lidos == [0, 1, 2]